@@ -17,6 +17,12 @@ sys.path.append(str(Path(__file__).parent))
 
 from config import config
 from managers.user_manager import user_manager
+from managers.content_filter import content_filter
+from managers.queue_manager import danmaku_queue
+from managers.status_monitor import status_monitor
+from managers.storage import storage
+from clients.danmaku_client import danmaku_client
+from clients.tmdb_client import tmdb_client
 from handlers.commands import (
     start_command, help_command, status_command, admin_command, 
     unknown_command, handle_text_message
@@ -144,6 +150,9 @@ class DanmakuBot:
             # 设置应用程序
             await self.setup_application()
             
+            # 启动服务器状态监控
+            status_monitor.start(danmaku_client)
+            
             # 启动机器人
             logger.info("机器人启动成功！等待用户消息...")
             await self.application.run_polling(
@@ -159,15 +168,56 @@ class DanmakuBot:
         finally:
             if self.application:
                 await self.application.shutdown()
+            await self.cleanup_resources()
             logger.info("机器人已停止")
     
+    async def cleanup_resources(self):
+        """释放后台任务和缓冲数据"""
+        try:
+            await status_monitor.stop()
+        except Exception as e:
+            logger.error(f"停止服务器状态监控失败: {e}")
+        
+        try:
+            # 停止队列处理并将日志合并为快照
+            await danmaku_queue.stop_processing()
+            danmaku_queue.close()
+        except Exception as e:
+            logger.error(f"关闭弹幕队列失败: {e}")
+        
+        try:
+            # 写入缓冲中的审核记录
+            await content_filter.close()
+        except Exception as e:
+            logger.error(f"关闭内容过滤器失败: {e}")
+        
+        try:
+            # 关闭用户数据库连接池
+            await user_manager.close()
+        except Exception as e:
+            logger.error(f"关闭用户数据库连接池失败: {e}")
+        
+        try:
+            # 关闭 HTTP 连接池（TMDB 缓存的访问时间需在存储层关闭前写回）
+            await tmdb_client.cleanup()
+            await danmaku_client.cleanup()
+        except Exception as e:
+            logger.error(f"关闭 HTTP 连接池失败: {e}")
+        
+        try:
+            # 等待存储写线程完成并关闭全部 SQLite 连接
+            await asyncio.to_thread(storage.close)
+        except Exception as e:
+            logger.error(f"关闭数据库执行器失败: {e}")
+    
     async def stop_bot(self):
         """停止机器人"""
         if self.application:
             logger.info("正在停止机器人...")
             await self.application.stop()
             await self.application.shutdown()
-            logger.info("机器人已停止")
+        await self.cleanup_resources()
+        logger.info("机器人已停止")
 
 
 async def main():
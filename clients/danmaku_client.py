@@ -1,13 +1,220 @@
 import aiohttp
 import asyncio
-<<<<<<< HEAD
 import time
-from typing import Dict, Any, Optional, Union
+from collections import OrderedDict, deque
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Optional, Union
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from config import config
 import json
 from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+
+class APIStatusError(aiohttp.ClientResponseError):
+    """API 返回的错误状态码（抛出前已计入请求统计）"""
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """网络错误、超时、429 和 5xx 可重试，其余 4xx 重试也不会成功"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+class AsyncTokenBucket:
+    """协程安全的令牌桶限速器
+    
+    令牌按 rate 个/秒连续（小数）补充，最多积累 capacity 个。
+    等待者通过 asyncio.Lock 按到达顺序（FIFO）依次取令牌，不会出现同时放行或同时惊醒。
+    收到 429 时调用 penalize()：在 Retry-After 期间暂停发放并将速率减半，
+    之后每次成功请求按基准速率的 10% 逐步恢复。
+    """
+    
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.1):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min(min_rate, rate)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self._stats = {
+            'acquired': 0,
+            'throttled': 0,        # 需要等待才拿到令牌的次数
+            'total_wait_time': 0.0,
+            'rate_limited': 0      # 收到 429 的次数
+        }
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def _wait_time(self) -> float:
+        """距离可以取到令牌还需等待的秒数"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+    
+    async def acquire(self):
+        """取一个令牌，不足时按排队顺序等待"""
+        self._waiting += 1
+        start = time.monotonic()
+        try:
+            async with self._lock:
+                waited = False
+                while True:
+                    wait_time = self._wait_time()
+                    if wait_time <= 0:
+                        break
+                    waited = True
+                    # 醒来后重新计算，期间速率或暂停时间可能已被调整
+                    await asyncio.sleep(wait_time)
+                self._tokens -= 1
+        finally:
+            self._waiting -= 1
+        
+        self._stats['acquired'] += 1
+        if waited:
+            self._stats['throttled'] += 1
+            self._stats['total_wait_time'] += time.monotonic() - start
+    
+    def penalize(self, retry_after: float):
+        """服务端限流：暂停发放令牌并降低速率"""
+        now = time.monotonic()
+        self._refill(now)
+        self._blocked_until = max(self._blocked_until, now + max(0.0, retry_after))
+        self._tokens = 0.0
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._stats['rate_limited'] += 1
+        logger.warning(f"API 限速调整: 暂停 {retry_after:.1f}s，速率降为 {self.rate:.2f}/s")
+    
+    def on_success(self):
+        """请求成功后逐步恢复速率"""
+        if self.rate < self.base_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+    
+    def set_rate(self, rate: float, capacity: Optional[float] = None):
+        """运行时修改基准速率"""
+        self._refill(time.monotonic())
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min(self.min_rate, rate)
+        if capacity is not None:
+            self.capacity = capacity
+            self._tokens = min(self._tokens, capacity)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限速器状态"""
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            'rate': round(self.rate, 3),
+            'base_rate': self.base_rate,
+            'capacity': self.capacity,
+            'available_tokens': round(self._tokens, 3),
+            'waiting': self._waiting,
+            'blocked_for': round(max(0.0, self._blocked_until - now), 3),
+            **self._stats
+        }
+
+
+class ResponseCache:
+    """API 响应缓存（LRU + 按接口 TTL + 单飞合并）
+    
+    键由请求方法、接口和规范化后的参数 JSON 组成，跨进程稳定。
+    同一个键的并发未命中只会发出一次上游请求，其余调用等待同一结果。
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, max_size: int = 256, default_ttl: float = 60, endpoint_ttls: Optional[Dict[str, float]] = None):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.endpoint_ttls = endpoint_ttls or {}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+    
+    @staticmethod
+    def make_key(method: str, endpoint: str, params: Optional[Dict[str, Any]] = None, body: Any = None) -> str:
+        """生成稳定的缓存键"""
+        canonical = json.dumps(
+            {'params': params or {}, 'json': body or {}},
+            sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str
+        )
+        return f"{method.upper()} {endpoint} {canonical}"
+    
+    def ttl_for(self, endpoint: str) -> float:
+        """接口对应的缓存时间"""
+        return self.endpoint_ttls.get(endpoint, self.default_ttl)
+    
+    def get(self, key: str):
+        """返回缓存数据，未命中或已过期时返回 ResponseCache._MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._MISSING
+        
+        data, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return self._MISSING
+        
+        self._entries.move_to_end(key)
+        return data
+    
+    def set(self, key: str, data: Any, ttl: float):
+        """写入缓存"""
+        self._entries[key] = (data, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    async def get_or_fetch(self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """命中直接返回；未命中时同一个键只执行一次 fetch"""
+        data = self.get(key)
+        if data is not self._MISSING:
+            self.stats['hits'] += 1
+            return data
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+        else:
+            self.stats['misses'] += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            
+            def _on_done(t: asyncio.Task):
+                self._inflight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.set(key, t.result(), ttl)
+            
+            task.add_done_callback(_on_done)
+        
+        # shield：单个调用方被取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = self.stats.copy()
+        stats['size'] = len(self._entries)
+        stats['inflight'] = len(self._inflight)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
 
 
 class DanmakuAPIClient:
@@ -39,45 +246,24 @@ class DanmakuAPIClient:
             'last_error': None,
             'last_success': None
         }
-        self._rate_limiter = {
-            'requests_per_second': 10,
-            'last_request_time': 0,
-            'request_count': 0,
-            'window_start': time.time()
+        # 各类接口默认共用一个限速预算，可通过 configure_rate_pool 为某类接口单独设置
+        self._rate_limiters: Dict[str, AsyncTokenBucket] = {
+            'default': AsyncTokenBucket(config.DANMAKU_RATE_LIMIT, config.DANMAKU_RATE_BURST)
         }
-        self._cache = {}
-        self._cache_ttl = 60  # 缓存1分钟
+        self._cache = ResponseCache(
+            max_size=256,
+            default_ttl=60,
+            endpoint_ttls={'/api/control/status': 10}  # 状态变化较快，缓存10秒
+        )
         self._initialized = True
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
         await self._ensure_session()
-=======
-from typing import Dict, Any, Optional
-from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
-from config import config
-
-
-class DanmakuAPIClient:
-    """弹幕API客户端"""
-    
-    def __init__(self):
-        self.base_url = config.DANMAKU_BASE_URL
-        self.api_key = config.DANMAKU_API_KEY
-        self.session: Optional[aiohttp.ClientSession] = None
-    
-    async def __aenter__(self):
-        """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30)
-        )
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器退出"""
-<<<<<<< HEAD
         # 不在这里关闭 session，由连接池管理
         self._last_activity = time.time()
     
@@ -131,10 +317,6 @@ class DanmakuAPIClient:
         )
         
         logger.info("创建新的 API 连接池")
-=======
-        if self.session:
-            await self.session.close()
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
     
     def _build_url(self, endpoint: str) -> str:
         """构建完整的API URL"""
@@ -145,56 +327,47 @@ class DanmakuAPIClient:
             url += f"?api_key={self.api_key}"
         return url
     
-<<<<<<< HEAD
-    async def _rate_limit_check(self):
-        """检查速率限制"""
-        current_time = time.time()
-        
-        # 重置窗口计数
-        if current_time - self._rate_limiter['window_start'] >= 1.0:
-            self._rate_limiter['request_count'] = 0
-            self._rate_limiter['window_start'] = current_time
-        
-        # 检查是否超过限制
-        if self._rate_limiter['request_count'] >= self._rate_limiter['requests_per_second']:
-            sleep_time = 1.0 - (current_time - self._rate_limiter['window_start'])
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
-                self._rate_limiter['request_count'] = 0
-                self._rate_limiter['window_start'] = time.time()
-        
-        self._rate_limiter['request_count'] += 1
-        self._rate_limiter['last_request_time'] = current_time
-    
-    def _get_cache_key(self, method: str, endpoint: str, **kwargs) -> str:
-        """生成缓存键"""
-        cache_data = {
-            'method': method,
-            'endpoint': endpoint,
-            'params': kwargs.get('params', {}),
-            'json': kwargs.get('json', {})
-        }
-        return f"{method}:{endpoint}:{hash(str(sorted(cache_data.items())))}"
-    
-    def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """从缓存获取数据"""
-        if cache_key in self._cache:
-            cached_data, timestamp = self._cache[cache_key]
-            if time.time() - timestamp < self._cache_ttl:
-                return cached_data
-            else:
-                del self._cache[cache_key]
-        return None
+    def configure_rate_pool(self, endpoint_class: str, rate: float, burst: float):
+        """为某类接口（send/control/status）设置独立的限速预算"""
+        limiter = self._rate_limiters.get(endpoint_class)
+        if limiter is None or endpoint_class == 'default':
+            self._rate_limiters[endpoint_class] = AsyncTokenBucket(rate, burst)
+        else:
+            limiter.set_rate(rate, burst)
     
-    def _set_cache(self, cache_key: str, data: Dict[str, Any]):
-        """设置缓存数据"""
-        self._cache[cache_key] = (data, time.time())
-        
-        # 限制缓存大小
-        if len(self._cache) > 100:
-            # 删除最旧的缓存
-            oldest_key = min(self._cache.keys(), key=lambda k: self._cache[k][1])
-            del self._cache[oldest_key]
+    def _get_rate_limiter(self, endpoint_class: str) -> AsyncTokenBucket:
+        """获取接口类别对应的限速器，未单独配置的共用默认预算"""
+        return self._rate_limiters.get(endpoint_class, self._rate_limiters['default'])
+    
+    @staticmethod
+    def _parse_retry_after(value: Optional[str], default: float = 5.0) -> float:
+        """解析 Retry-After（秒数或 HTTP 日期）"""
+        if not value:
+            return default
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+    
+    async def _cached_request(
+        self,
+        method: str,
+        endpoint: str,
+        endpoint_class: str = 'default',
+        **kwargs
+    ) -> Dict[str, Any]:
+        """带缓存的请求，命中时不占用限速预算，并发未命中合并为一次请求"""
+        cache_key = ResponseCache.make_key(method, endpoint, kwargs.get('params'), kwargs.get('json'))
+        return await self._cache.get_or_fetch(
+            cache_key,
+            self._cache.ttl_for(endpoint),
+            lambda: self._make_request(method, endpoint, endpoint_class=endpoint_class, **kwargs)
+        )
     
     def _update_stats(self, success: bool, response_time: float, error: Optional[str] = None):
         """更新请求统计"""
@@ -217,36 +390,32 @@ class DanmakuAPIClient:
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError))
-=======
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
+        retry=retry_if_exception(_is_retryable)
     )
     async def _make_request(
         self, 
         method: str, 
-<<<<<<< HEAD
         endpoint: str,
-        use_cache: bool = False,
+        endpoint_class: str = 'default',
         **kwargs
     ) -> Dict[str, Any]:
-        """发送HTTP请求（优化版）"""
+        """发送HTTP请求，网络错误、429 和 5xx 时退避重试"""
+        return await self._request_once(method, endpoint, endpoint_class, **kwargs)
+    
+    async def _request_once(
+        self, 
+        method: str, 
+        endpoint: str,
+        endpoint_class: str = 'default',
+        **kwargs
+    ) -> Dict[str, Any]:
+        """发送HTTP请求（单次尝试，不重试）"""
         start_time = time.time()
         
         try:
-            # 速率限制检查
-            await self._rate_limit_check()
-            
-            # 缓存检查（仅对 GET 请求）
-            cache_key = None
-            if use_cache and method.upper() == 'GET':
-                cache_key = self._get_cache_key(method, endpoint, **kwargs)
-                cached_data = self._get_from_cache(cache_key)
-                if cached_data:
-                    logger.debug(f"命中缓存: {method} {endpoint}")
-                    return cached_data
+            # 速率限制
+            limiter = self._get_rate_limiter(endpoint_class)
+            await limiter.acquire()
             
             # 确保 session 存在
             await self._ensure_session()
@@ -266,10 +435,7 @@ class DanmakuAPIClient:
                         
                         # 更新统计
                         self._update_stats(True, response_time)
-                        
-                        # 设置缓存
-                        if cache_key:
-                            self._set_cache(cache_key, data)
+                        limiter.on_success()
                         
                         logger.debug(f"API请求成功: {method} {endpoint} ({response_time:.3f}s)")
                         return data
@@ -281,10 +447,12 @@ class DanmakuAPIClient:
                         return {'success': True, 'data': error_text, 'raw_response': True}
                         
                 elif response.status == 429:  # Rate Limited
-                    retry_after = int(response.headers.get('Retry-After', 5))
-                    logger.warning(f"被速率限制，{retry_after}秒后重试")
-                    await asyncio.sleep(retry_after)
-                    raise aiohttp.ClientResponseError(
+                    # 暂停整个预算而不是只让当前请求休眠，其余请求也会一起退避
+                    retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+                    logger.warning(f"被速率限制，{retry_after:.1f}秒后重试")
+                    limiter.penalize(retry_after)
+                    self._update_stats(False, response_time, f"{response.status}: Rate limited")
+                    raise APIStatusError(
                         request_info=response.request_info,
                         history=response.history,
                         status=response.status,
@@ -294,7 +462,8 @@ class DanmakuAPIClient:
                 elif response.status >= 500:  # Server Error
                     error_text = await response.text()
                     logger.error(f"服务器错误: {response.status} - {error_text}")
-                    raise aiohttp.ClientResponseError(
+                    self._update_stats(False, response_time, f"{response.status}: {error_text}")
+                    raise APIStatusError(
                         request_info=response.request_info,
                         history=response.history,
                         status=response.status,
@@ -305,33 +474,16 @@ class DanmakuAPIClient:
                     error_text = await response.text()
                     logger.error(f"API请求失败: {response.status} - {error_text}")
                     self._update_stats(False, response_time, f"{response.status}: {error_text}")
-=======
-        endpoint: str, 
-        **kwargs
-    ) -> Dict[str, Any]:
-        """发送HTTP请求"""
-        if not self.session:
-            raise RuntimeError("Session not initialized. Use async context manager.")
-        
-        url = self._build_url(endpoint)
-        
-        try:
-            async with self.session.request(method, url, **kwargs) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"API请求成功: {method} {endpoint}")
-                    return data
-                else:
-                    error_text = await response.text()
-                    logger.error(f"API请求失败: {response.status} - {error_text}")
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
-                    raise aiohttp.ClientResponseError(
+                    raise APIStatusError(
                         request_info=response.request_info,
                         history=response.history,
                         status=response.status,
                         message=error_text
                     )
-<<<<<<< HEAD
+        
+        except APIStatusError:
+            # 错误状态码在上面已计入统计
+            raise
                     
         except aiohttp.ClientError as e:
             response_time = time.time() - start_time
@@ -357,11 +509,9 @@ class DanmakuAPIClient:
     def get_stats(self) -> Dict[str, Any]:
         """获取请求统计信息"""
         stats = self._request_stats.copy()
-        stats['cache_size'] = len(self._cache)
+        stats['cache'] = self._cache.get_stats()
         stats['rate_limit_status'] = {
-            'requests_per_second': self._rate_limiter['requests_per_second'],
-            'current_window_requests': self._rate_limiter['request_count'],
-            'last_request_time': self._rate_limiter['last_request_time']
+            name: limiter.get_stats() for name, limiter in self._rate_limiters.items()
         }
         if stats['last_success']:
             stats['last_success'] = stats['last_success'].isoformat()
@@ -392,29 +542,18 @@ class DanmakuAPIClient:
         self.clear_cache()
         logger.info("已清理 API 客户端资源")
     
-    async def get_status(self) -> Dict[str, Any]:
+    async def get_status(self, use_cache: bool = True) -> Dict[str, Any]:
         """获取服务器状态（支持缓存）"""
         try:
-            data = await self._make_request('GET', '/api/control/status', use_cache=True)
-=======
-        except aiohttp.ClientError as e:
-            logger.error(f"网络请求错误: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"未知错误: {e}")
-            raise
-    
-    async def get_status(self) -> Dict[str, Any]:
-        """获取服务器状态"""
-        try:
-            data = await self._make_request('GET', '/api/control/status')
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
+            if use_cache:
+                data = await self._cached_request('GET', '/api/control/status', endpoint_class='status')
+            else:
+                data = await self._make_request('GET', '/api/control/status', endpoint_class='status')
             return {
                 'success': True,
                 'data': data,
                 'message': '状态获取成功'
             }
-<<<<<<< HEAD
         except aiohttp.ClientResponseError as e:
             error_msg = f'API错误 [{e.status}]: {e.message}'
             logger.error(f"获取状态失败: {error_msg}")
@@ -441,14 +580,6 @@ class DanmakuAPIClient:
                 'data': None,
                 'message': error_msg,
                 'error_type': 'unknown_error'
-=======
-        except Exception as e:
-            logger.error(f"获取状态失败: {e}")
-            return {
-                'success': False,
-                'data': None,
-                'message': f'获取状态失败: {str(e)}'
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
             }
     
     async def control_danmaku(
@@ -468,6 +599,7 @@ class DanmakuAPIClient:
             data = await self._make_request(
                 'POST', 
                 '/api/control/danmaku',
+                endpoint_class='control',
                 json=payload
             )
             return {
@@ -511,7 +643,6 @@ class DanmakuAPIClient:
         """
         return await self.control_danmaku('set_opacity', {'opacity': opacity})
     
-<<<<<<< HEAD
     async def send_danmaku(
         self, 
         text: str, 
@@ -521,33 +652,23 @@ class DanmakuAPIClient:
         duration: int = 5,
         **kwargs
     ) -> Dict[str, Any]:
-=======
-    async def send_danmaku(self, text: str, **kwargs) -> Dict[str, Any]:
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
         """发送弹幕
         
         Args:
             text: 弹幕内容
-<<<<<<< HEAD
             color: 弹幕颜色 (十六进制，如 #FF0000)
             position: 弹幕位置 (scroll/top/bottom)
             font_size: 字体大小 (12-48)
             duration: 显示时长 (秒)
             **kwargs: 其他弹幕参数
-=======
-            **kwargs: 其他弹幕参数（颜色、位置等）
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
         """
         payload = {
             'action': 'send',
             'text': text,
-<<<<<<< HEAD
             'color': color,
             'position': position,
             'font_size': max(12, min(48, font_size)),  # 限制字体大小范围
             'duration': max(1, min(30, duration)),     # 限制显示时长范围
-=======
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
             **kwargs
         }
         
@@ -555,6 +676,7 @@ class DanmakuAPIClient:
             data = await self._make_request(
                 'POST',
                 '/api/control/danmaku',
+                endpoint_class='send',
                 json=payload
             )
             return {
@@ -569,7 +691,6 @@ class DanmakuAPIClient:
                 'data': None,
                 'message': f'弹幕发送失败: {str(e)}'
             }
-<<<<<<< HEAD
     
     async def send_styled_danmaku(
         self,
@@ -618,34 +739,78 @@ class DanmakuAPIClient:
         config = style_configs.get(style_preset, style_configs["normal"])
         return await self.send_danmaku(text, **config)
     
+    async def iter_bulk_danmaku(
+        self,
+        messages: list,
+        concurrency: int = 5,
+        interval: float = 0.0
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流水线批量发送弹幕，按提交顺序逐条产出结果
+        
+        最多同时保持 concurrency 个请求，实际发送速率由限速器控制；
+        interval > 0 时相邻两条的发起时间至少间隔 interval 秒。
+        请求按提交顺序依次取令牌发起，失败时按客户端的退避策略重试；同时在途多条时，
+        重试或网络抖动都可能让后面的弹幕先上屏，需要严格的上屏顺序时使用 concurrency=1。
+        机器人的批量发送走弹幕队列（优先级、持久化、暂停和发送速率预算），不使用本方法。
+        调用方提前退出迭代时，尚未完成的请求会被取消。
+        
+        Args:
+            messages: 弹幕消息列表 [{'text': str, 'color': str, ...}, ...] 或字符串列表
+            concurrency: 最大并发请求数
+            interval: 发起间隔 (秒)
+        """
+        concurrency = max(1, concurrency)
+        pending: deque = deque()
+        items = iter(enumerate(messages))
+        
+        def launch_next() -> bool:
+            item = next(items, None)
+            if item is None:
+                return False
+            index, message = item
+            if isinstance(message, str):
+                message = {'text': message}
+            task = asyncio.create_task(self.send_danmaku(**message))
+            pending.append((index, message, task))
+            return True
+        
+        try:
+            while len(pending) < concurrency and launch_next():
+                if interval > 0:
+                    await asyncio.sleep(interval)
+            
+            while pending:
+                index, message, task = pending.popleft()
+                result = await task
+                # 队首完成后补充一个新请求，保持窗口内的并发数
+                if launch_next() and interval > 0:
+                    await asyncio.sleep(interval)
+                yield {'index': index, 'text': message.get('text'), **result}
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+    
     async def send_bulk_danmaku(
         self,
         messages: list,
-        interval: float = 1.0
+        interval: float = 0.0,
+        concurrency: int = 5
     ) -> Dict[str, Any]:
         """批量发送弹幕
         
         Args:
             messages: 弹幕消息列表 [{'text': str, 'color': str, ...}, ...]
-            interval: 发送间隔 (秒)
+            interval: 发起间隔 (秒)
+            concurrency: 最大并发请求数
         """
         results = []
         success_count = 0
         
         try:
-            for i, message in enumerate(messages):
-                if isinstance(message, str):
-                    message = {'text': message}
-                
-                result = await self.send_danmaku(**message)
+            async for result in self.iter_bulk_danmaku(messages, concurrency, interval):
                 results.append(result)
-                
                 if result['success']:
                     success_count += 1
-                
-                # 最后一条消息不需要等待
-                if i < len(messages) - 1:
-                    await asyncio.sleep(interval)
             
             return {
                 'success': success_count > 0,
@@ -665,8 +830,6 @@ class DanmakuAPIClient:
                 'data': None,
                 'message': f'批量发送失败: {str(e)}'
             }
-=======
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
 
 
 # 全局客户端实例
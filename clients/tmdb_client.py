@@ -1,31 +1,373 @@
 import aiohttp
 import asyncio
-from typing import Dict, Any, List, Optional
+import json
+import re
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
 from loguru import logger
 from tenacity import retry, stop_after_attempt, wait_exponential
 from config import config
+from managers.storage import storage
+
+
+class TMDBResponseCache:
+    """TMDB 响应缓存（内存 LRU + SQLite 持久化）
+    
+    按接口分级设置 TTL。过期条目不会立即删除：读取时先返回旧数据，
+    同时在后台重新请求（stale-while-revalidate），TMDB 不可用时也能继续使用旧数据。
+    数据库条目数超过 max_entries 时按最近访问时间淘汰；命中时只在内存中记录访问时间，
+    随下一次写入或攒够一批后在存储层写线程中批量写回。
+    同一个键的上游请求由所有等待者共享，等待者全部被取消时（如用户离开后取消预取）请求随之取消。
+    """
+    
+    # (接口模式, TTL 秒数)，按顺序匹配
+    TTL_TIERS: List[Tuple[re.Pattern, float]] = [
+        (re.compile(r'^/movie/\d+/credits$'), 30 * 86400),
+        (re.compile(r'^/movie/\d+$'), 7 * 86400),
+        (re.compile(r'^/movie/popular$'), 6 * 3600),
+        (re.compile(r'^/search/'), 3600),
+    ]
+    DEFAULT_TTL = 3600
+    ACCESS_FLUSH_SIZE = 100   # 访问时间积累到多少条时写回一次
+    
+    def __init__(self, db_file: str = "data/tmdb_cache.db", max_entries: int = 5000, memory_size: int = 512):
+        self.db_file = Path(db_file)
+        self.max_entries = max_entries
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()  # 键 -> (数据, 过期时间)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}   # 键 -> 等待上游请求的调用数
+        self._writes_since_trim = 0
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stale_served': 0,
+            'revalidations': 0,
+            'coalesced': 0,
+            'abandoned': 0,
+            'evictions': 0,
+            'access_flushes': 0
+        }
+        self._pending_access: Dict[str, float] = {}   # 键 -> 尚未写回的最近访问时间
+        self._flush_task: Optional[asyncio.Task] = None
+        self._init_database()
+    
+    def _init_database(self):
+        """打开缓存数据库并执行迁移"""
+        try:
+            self._db = storage.open(self.db_file, [(1, self._create_schema)])
+        except Exception as e:
+            logger.error(f"初始化 TMDB 缓存失败: {e}")
+            raise
+    
+    @staticmethod
+    def _create_schema(conn):
+        """创建缓存表"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tmdb_cache (
+                cache_key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tmdb_cache_access ON tmdb_cache (last_access)')
+    
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """生成稳定的缓存键"""
+        canonical = json.dumps(params or {}, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        return f"{endpoint} {canonical}"
+    
+    def ttl_for(self, endpoint: str) -> float:
+        """接口对应的缓存时间"""
+        for pattern, ttl in self.TTL_TIERS:
+            if pattern.match(endpoint):
+                return ttl
+        return self.DEFAULT_TTL
+    
+    def _remember(self, key: str, data: Any, expires_at: float):
+        """写入内存层"""
+        self._memory[key] = (data, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+    
+    def _touch(self, key: str):
+        """记录一次访问；访问时间先缓冲在内存中，攒够一批后再写回"""
+        self._pending_access[key] = time.time()
+        if len(self._pending_access) >= self.ACCESS_FLUSH_SIZE and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = asyncio.ensure_future(self.flush())
+    
+    def _take_pending_access(self) -> List[Tuple[float, str]]:
+        """取出缓冲的访问时间，作为 UPDATE 参数"""
+        touched = [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+        self._pending_access.clear()
+        return touched
+            
+    @staticmethod
+    def _read_row(conn, key: str) -> Optional[Tuple[str, float]]:
+        """在读线程中读取一条缓存"""
+        return conn.execute(
+            'SELECT data, expires_at FROM tmdb_cache WHERE cache_key = ?', (key,)
+        ).fetchone()
+    
+    @staticmethod
+    def _touch_rows(conn, touched: List[Tuple[float, str]]):
+        """在写线程中批量更新最近访问时间"""
+        conn.executemany('UPDATE tmdb_cache SET last_access = ? WHERE cache_key = ?', touched)
+    
+    def _write_row(
+        self,
+        conn,
+        key: str,
+        endpoint: str,
+        data: str,
+        expires_at: float,
+        trim: bool,
+        touched: List[Tuple[float, str]]
+    ) -> int:
+        """在写线程中写入一条缓存（顺带写回缓冲的访问时间），必要时淘汰最久未访问的条目，返回淘汰数"""
+        self._touch_rows(conn, touched)
+        conn.execute('''
+            INSERT OR REPLACE INTO tmdb_cache (cache_key, endpoint, data, expires_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, endpoint, data, expires_at, time.time()))
+        
+        evicted = 0
+        if trim:
+            count = conn.execute('SELECT COUNT(*) FROM tmdb_cache').fetchone()[0]
+            if count > self.max_entries:
+                # 一次多淘汰 10%，避免每次写入都触发
+                evicted = count - int(self.max_entries * 0.9)
+                conn.execute('''
+                    DELETE FROM tmdb_cache WHERE cache_key IN (
+                        SELECT cache_key FROM tmdb_cache ORDER BY last_access LIMIT ?
+                    )
+                ''', (evicted,))
+        return evicted
+    
+    async def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """先查内存再查数据库"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self._touch(key)
+            self.stats['memory_hits'] += 1
+            return entry
+        
+        try:
+            row = await self._db.read(self._read_row, key)
+        except Exception as e:
+            logger.error(f"读取 TMDB 缓存失败: {e}")
+            return None
+        
+        if row is None:
+            return None
+        
+        entry = (json.loads(row[0]), row[1])
+        self._remember(key, *entry)
+        self._touch(key)
+        self.stats['disk_hits'] += 1
+        return entry
+    
+    async def is_fresh(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        """是否已有未过期的缓存（只检查，不计入命中统计也不记录访问）"""
+        key = self.make_key(endpoint, params)
+        entry = self._memory.get(key)
+        if entry is not None:
+            return entry[1] > time.time()
+        
+        try:
+            row = await self._db.read(self._read_row, key)
+        except Exception as e:
+            logger.error(f"读取 TMDB 缓存失败: {e}")
+            return False
+        return row is not None and row[1] > time.time()
+    
+    async def _store(self, key: str, endpoint: str, data: Any):
+        """写入内存层和数据库"""
+        expires_at = time.time() + self.ttl_for(endpoint)
+        self._remember(key, data, expires_at)
+        
+        self._writes_since_trim += 1
+        trim = self._writes_since_trim >= 50
+        if trim:
+            self._writes_since_trim = 0
+        
+        try:
+            evicted = await self._db.write(
+                self._write_row, key, endpoint, json.dumps(data, ensure_ascii=False), expires_at, trim,
+                self._take_pending_access()
+            )
+            self.stats['evictions'] += evicted
+        except Exception as e:
+            logger.error(f"写入 TMDB 缓存失败: {e}")
+    
+    async def flush(self):
+        """写回缓冲的最近访问时间"""
+        touched = self._take_pending_access()
+        if not touched:
+            return
+        try:
+            await self._db.write(self._touch_rows, touched)
+            self.stats['access_flushes'] += 1
+        except Exception as e:
+            logger.error(f"写回 TMDB 缓存访问时间失败: {e}")
+    
+    def _fetch(self, key: str, endpoint: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """同一个键只发起一次上游请求"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            return task
+        
+        async def run():
+            try:
+                data = await fetch()
+                await self._store(key, endpoint, data)
+                return data
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+        
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+    
+    def _revalidate_done(self, task: asyncio.Task):
+        """后台刷新结束（失败时保留旧数据）"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"后台刷新 TMDB 缓存失败，继续使用旧数据: {task.exception()}")
+    
+    async def get_or_fetch(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """读取缓存；过期时返回旧数据并在后台刷新，未命中时请求上游"""
+        key = self.make_key(endpoint, params)
+        entry = await self._lookup(key)
+        
+        if entry is not None:
+            data, expires_at = entry
+            if time.time() >= expires_at:
+                self.stats['stale_served'] += 1
+                if key not in self._inflight:
+                    self.stats['revalidations'] += 1
+                    self._fetch(key, endpoint, fetch).add_done_callback(self._revalidate_done)
+            return data
+        
+        self.stats['misses'] += 1
+        task = self._fetch(key, endpoint, fetch)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # 单个等待者被取消不影响共享的上游请求
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                # 没有人再等待结果，不再继续占用 TMDB 配额
+                if not task.done():
+                    task.cancel()
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]
+                    self.stats['abandoned'] += 1
+    
+    async def clear(self):
+        """清空缓存"""
+        self._memory.clear()
+        self._pending_access.clear()
+        try:
+            await self._db.execute('DELETE FROM tmdb_cache')
+        except Exception as e:
+            logger.error(f"清空 TMDB 缓存失败: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = self.stats.copy()
+        stats['memory_size'] = len(self._memory)
+        stats['inflight'] = len(self._inflight)
+        return stats
 
 
 class TMDBAPIClient:
-    """TMDB API客户端"""
+    """TMDB API客户端
+    
+    所有请求共用一个长期存在的连接池（keep-alive + DNS 缓存），
+    async with 只确保连接池可用而不会关闭它，由 cleanup() 在机器人退出时统一关闭。
+    """
     
     def __init__(self):
         self.base_url = config.TMDB_BASE_URL
         self.image_url = config.TMDB_IMAGE_URL
         self.api_key = config.TMDB_API_KEY
         self.session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+        self._last_activity: Optional[float] = None
+        self._cache = TMDBResponseCache()
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30)
-        )
+        await self._ensure_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器退出"""
-        if self.session:
+        # 不在这里关闭 session，其他并发请求可能仍在使用
+        self._last_activity = time.time()
+    
+    async def _ensure_session(self):
+        """确保 session 存在且有效"""
+        if self.session is not None and not self.session.closed:
+            self._last_activity = time.time()
+            return
+        
+        # 加锁避免并发请求各自创建连接池
+        async with self._session_lock:
+            if self.session is None or self.session.closed:
+                self.session = self._create_session()
+                logger.info("创建新的 TMDB 连接池")
+            self._last_activity = time.time()
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """创建带连接复用的 session"""
+        connector = aiohttp.TCPConnector(
+            limit=20,  # 总连接数限制
+            limit_per_host=10,  # 单个主机连接数限制
+            ttl_dns_cache=300,  # DNS 缓存时间
+            use_dns_cache=True,
+            keepalive_timeout=60,  # 保持连接时间
+            enable_cleanup_closed=True
+        )
+        
+        timeout = aiohttp.ClientTimeout(
+            total=30,
+            connect=10,
+            sock_read=20
+        )
+        
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={'Accept': 'application/json'}
+        )
+    
+    async def cleanup(self):
+        """关闭连接池并写回缓存访问时间"""
+        if self.session and not self.session.closed:
             await self.session.close()
+        self.session = None
+        await self._cache.flush()
+        logger.info("已关闭 TMDB 连接池")
     
     def _build_url(self, endpoint: str) -> str:
         """构建完整的API URL"""
@@ -50,8 +392,7 @@ class TMDBAPIClient:
         params: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """发送HTTP请求"""
-        if not self.session:
-            raise RuntimeError("Session not initialized. Use async context manager.")
+        await self._ensure_session()
         
         url = self._build_url(endpoint)
         
@@ -82,6 +423,84 @@ class TMDBAPIClient:
             logger.error(f"TMDB未知错误: {e}")
             raise
     
+    async def _cached_request(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """带缓存的请求"""
+        return await self._cache.get_or_fetch(
+            endpoint, params, lambda: self._make_request(endpoint, params)
+        )
+    
+    async def is_cached(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> bool:
+        """请求是否已有未过期的缓存"""
+        return await self._cache.is_fresh(endpoint, params)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return self._cache.get_stats()
+    
+    def _parse_movie_details(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """整理电影详情"""
+        return {
+            'id': data.get('id'),
+            'title': data.get('title'),
+            'original_title': data.get('original_title'),
+            'overview': data.get('overview'),
+            'release_date': data.get('release_date'),
+            'runtime': data.get('runtime'),
+            'vote_average': data.get('vote_average'),
+            'vote_count': data.get('vote_count'),
+            'popularity': data.get('popularity'),
+            'budget': data.get('budget'),
+            'revenue': data.get('revenue'),
+            'poster_path': data.get('poster_path'),
+            'backdrop_path': data.get('backdrop_path'),
+            'homepage': data.get('homepage'),
+            'imdb_id': data.get('imdb_id'),
+            'genres': [genre['name'] for genre in data.get('genres', [])],
+            'production_companies': [
+                company['name'] for company in data.get('production_companies', [])
+            ],
+            'production_countries': [
+                country['name'] for country in data.get('production_countries', [])
+            ],
+            'spoken_languages': [
+                lang['name'] for lang in data.get('spoken_languages', [])
+            ],
+            'poster_url': self.get_image_url(data.get('poster_path')),
+            'backdrop_url': self.get_image_url(data.get('backdrop_path'), 'w780')
+        }
+    
+    def _parse_credits(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """整理演职员表"""
+        cast = []
+        for person in data.get('cast', [])[:10]:  # 只取前10个演员
+            cast.append({
+                'id': person.get('id'),
+                'name': person.get('name'),
+                'character': person.get('character'),
+                'profile_path': person.get('profile_path'),
+                'profile_url': self.get_image_url(person.get('profile_path'))
+            })
+        
+        crew = []
+        for person in data.get('crew', []):
+            if person.get('job') in ['Director', 'Producer', 'Writer']:
+                crew.append({
+                    'id': person.get('id'),
+                    'name': person.get('name'),
+                    'job': person.get('job'),
+                    'profile_path': person.get('profile_path'),
+                    'profile_url': self.get_image_url(person.get('profile_path'))
+                })
+        
+        return {
+            'cast': cast,
+            'crew': crew
+        }
+    
     async def search_movies(
         self, 
         query: str, 
@@ -89,7 +508,7 @@ class TMDBAPIClient:
     ) -> Dict[str, Any]:
         """搜索电影"""
         try:
-            data = await self._make_request(
+            data = await self._cached_request(
                 '/search/movie',
                 {'query': query, 'page': page}
             )
@@ -133,38 +552,39 @@ class TMDBAPIClient:
     async def get_movie_details(self, movie_id: int) -> Dict[str, Any]:
         """获取电影详情"""
         try:
-            data = await self._make_request(f'/movie/{movie_id}')
+            data = await self._cached_request(f'/movie/{movie_id}')
+            
+            movie = self._parse_movie_details(data)
             
-            # 处理电影详情
-            movie = {
-                'id': data.get('id'),
-                'title': data.get('title'),
-                'original_title': data.get('original_title'),
-                'overview': data.get('overview'),
-                'release_date': data.get('release_date'),
-                'runtime': data.get('runtime'),
-                'vote_average': data.get('vote_average'),
-                'vote_count': data.get('vote_count'),
-                'popularity': data.get('popularity'),
-                'budget': data.get('budget'),
-                'revenue': data.get('revenue'),
-                'poster_path': data.get('poster_path'),
-                'backdrop_path': data.get('backdrop_path'),
-                'homepage': data.get('homepage'),
-                'imdb_id': data.get('imdb_id'),
-                'genres': [genre['name'] for genre in data.get('genres', [])],
-                'production_companies': [
-                    company['name'] for company in data.get('production_companies', [])
-                ],
-                'production_countries': [
-                    country['name'] for country in data.get('production_countries', [])
-                ],
-                'spoken_languages': [
-                    lang['name'] for lang in data.get('spoken_languages', [])
-                ],
-                'poster_url': self.get_image_url(data.get('poster_path')),
-                'backdrop_url': self.get_image_url(data.get('backdrop_path'), 'w780')
+            return {
+                'success': True,
+                'data': movie,
+                'message': '电影详情获取成功'
+            }
+        except Exception as e:
+            logger.error(f"获取电影详情失败: {e}")
+            return {
+                'success': False,
+                'data': None,
+                'message': f'获取电影详情失败: {str(e)}'
             }
+    
+    async def get_movie_bundle(self, movie_id: int) -> Dict[str, Any]:
+        """获取电影详情和演职员表
+        
+        通过 append_to_response=credits 在一次请求中取回两部分数据，
+        合并结果与其他请求一样进入响应缓存。
+        """
+        try:
+            data = await self._cached_request(f'/movie/{movie_id}', {'append_to_response': 'credits'})
+            
+            movie = self._parse_movie_details(data)
+            if 'credits' in data:
+                movie['credits'] = self._parse_credits(data['credits'])
+            else:
+                # 响应中缺少附加数据时单独请求
+                credits_result = await self.get_movie_credits(movie_id)
+                movie['credits'] = credits_result['data'] or {'cast': [], 'crew': []}
             
             return {
                 'success': True,
@@ -182,7 +602,7 @@ class TMDBAPIClient:
     async def get_popular_movies(self, page: int = 1) -> Dict[str, Any]:
         """获取热门电影"""
         try:
-            data = await self._make_request('/movie/popular', {'page': page})
+            data = await self._cached_request('/movie/popular', {'page': page})
             
             # 处理热门电影
             movies = []
@@ -216,36 +636,11 @@ class TMDBAPIClient:
     async def get_movie_credits(self, movie_id: int) -> Dict[str, Any]:
         """获取电影演职员表"""
         try:
-            data = await self._make_request(f'/movie/{movie_id}/credits')
-            
-            # 处理演职员表
-            cast = []
-            for person in data.get('cast', [])[:10]:  # 只取前10个演员
-                cast.append({
-                    'id': person.get('id'),
-                    'name': person.get('name'),
-                    'character': person.get('character'),
-                    'profile_path': person.get('profile_path'),
-                    'profile_url': self.get_image_url(person.get('profile_path'))
-                })
-            
-            crew = []
-            for person in data.get('crew', []):
-                if person.get('job') in ['Director', 'Producer', 'Writer']:
-                    crew.append({
-                        'id': person.get('id'),
-                        'name': person.get('name'),
-                        'job': person.get('job'),
-                        'profile_path': person.get('profile_path'),
-                        'profile_url': self.get_image_url(person.get('profile_path'))
-                    })
+            data = await self._cached_request(f'/movie/{movie_id}/credits')
             
             return {
                 'success': True,
-                'data': {
-                    'cast': cast,
-                    'crew': crew
-                },
+                'data': self._parse_credits(data),
                 'message': '演职员表获取成功'
             }
         except Exception as e:
@@ -257,5 +652,105 @@ class TMDBAPIClient:
             }
 
 
+class SearchPrefetcher:
+    """电影搜索预取器
+    
+    搜索结果展示后在后台预取下一页和前 top_n 部电影的详情，把结果放进响应缓存，
+    用户翻页或打开详情时直接命中缓存。每个用户同时只有一批预取，用户开始其他操作时取消；
+    所有用户共享全局预算：最多 max_concurrent 个预取请求并发，每分钟最多 budget_per_minute 个；
+    已有未过期缓存的请求直接跳过，不占用预算。
+    """
+    
+    def __init__(self, client: TMDBAPIClient, top_n: int = 3, max_concurrent: int = 3, budget_per_minute: int = 60):
+        self.client = client
+        self.top_n = top_n
+        self.max_concurrent = max_concurrent
+        self.budget_per_minute = budget_per_minute
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._recent: deque = deque()                 # 最近一分钟内预取请求的时间
+        self._tasks: Dict[int, asyncio.Task] = {}     # 用户 ID -> 当前预取任务
+        self.stats = {'scheduled': 0, 'fetched': 0, 'cached': 0, 'skipped': 0, 'cancelled': 0, 'failed': 0}
+    
+    def schedule(self, owner_id: int, search_query: str, page: int, total_pages: int, movies: List[Dict[str, Any]]):
+        """为用户安排一批预取（取代该用户尚未完成的上一批）"""
+        self.cancel(owner_id)
+        
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        
+        # (接口, 参数, 请求)：接口和参数须与请求实际使用的缓存键一致，用于预先检查缓存
+        jobs: List[Tuple[str, Dict[str, Any], Callable[[], Awaitable[Any]]]] = []
+        if page < total_pages:
+            jobs.append((
+                '/search/movie', {'query': search_query, 'page': page + 1},
+                lambda: self.client.search_movies(search_query, page + 1)
+            ))
+        for movie in movies[:self.top_n]:
+            if movie.get('id'):
+                jobs.append((
+                    f"/movie/{movie['id']}", {'append_to_response': 'credits'},
+                    lambda movie_id=movie['id']: self.client.get_movie_bundle(movie_id)
+                ))
+        
+        if not jobs:
+            return
+        
+        task = asyncio.create_task(self._run(jobs))
+        self._tasks[owner_id] = task
+        task.add_done_callback(lambda t: self._forget(owner_id, t))
+        self.stats['scheduled'] += len(jobs)
+    
+    def _forget(self, owner_id: int, task: asyncio.Task):
+        """任务结束后移除记录（已被新批次取代时不动）"""
+        if self._tasks.get(owner_id) is task:
+            del self._tasks[owner_id]
+    
+    def cancel(self, owner_id: int):
+        """取消用户尚未完成的预取（没有其他请求等待同一结果时，上游请求一并取消）"""
+        task = self._tasks.pop(owner_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.stats['cancelled'] += 1
+    
+    def _take_budget(self) -> bool:
+        """占用一个全局预算，超出每分钟上限时返回 False"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.budget_per_minute:
+            return False
+        self._recent.append(now)
+        return True
+    
+    async def _run(self, jobs: List[Tuple[str, Dict[str, Any], Callable[[], Awaitable[Any]]]]):
+        """并发执行一批预取
+        
+        先跳过已有未过期缓存的请求（不占用预算），其余按列表顺序（下一页在前）排队
+        取得并发名额；同时拿到名额的请求之间不保证先后。
+        """
+        cached = await asyncio.gather(*(self.client.is_cached(endpoint, params) for endpoint, params, _ in jobs))
+        self.stats['cached'] += sum(cached)
+        await asyncio.gather(*(self._prefetch(job) for (_, _, job), hit in zip(jobs, cached) if not hit))
+    
+    async def _prefetch(self, job: Callable[[], Awaitable[Any]]):
+        """在并发和预算限制下执行单个预取"""
+        async with self._semaphore:
+            if not self._take_budget():
+                self.stats['skipped'] += 1
+                return
+            result = await job()
+            if result['success']:
+                self.stats['fetched'] += 1
+            else:
+                self.stats['failed'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预取统计"""
+        stats = self.stats.copy()
+        stats['active'] = len(self._tasks)
+        return stats
+
+
 # 全局客户端实例
-tmdb_client = TMDBAPIClient()
\ No newline at end of file
+tmdb_client = TMDBAPIClient()
+search_prefetcher = SearchPrefetcher(tmdb_client)
\ No newline at end of file
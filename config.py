@@ -14,6 +14,15 @@ class Config:
     # 弹幕 API 配置
     DANMAKU_API_KEY = os.getenv('DANMAKU_API_KEY')
     DANMAKU_BASE_URL = os.getenv('DANMAKU_BASE_URL', 'http://154.12.85.19:7768')
+    DANMAKU_RATE_LIMIT = float(os.getenv('DANMAKU_RATE_LIMIT', '10'))   # 每秒请求数
+    DANMAKU_RATE_BURST = float(os.getenv('DANMAKU_RATE_BURST', '10'))   # 允许的突发请求数
+    STATUS_POLL_INTERVAL = float(os.getenv('STATUS_POLL_INTERVAL', '10'))          # 状态刷新间隔（秒）
+    STATUS_POLL_MAX_INTERVAL = float(os.getenv('STATUS_POLL_MAX_INTERVAL', '120'))  # 退避后的最长间隔
+    
+    # 弹幕队列配置
+    QUEUE_WORKERS = int(os.getenv('QUEUE_WORKERS', '3'))
+    QUEUE_SEND_INTERVAL = float(os.getenv('QUEUE_SEND_INTERVAL', '2.0'))
+    QUEUE_SEND_BURST = int(os.getenv('QUEUE_SEND_BURST', '1'))
     
     # TMDB API 配置
     TMDB_API_KEY = os.getenv('TMDB_API_KEY')
@@ -22,6 +31,9 @@ class Config:
     
     # 数据库配置
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/bot.db')
+    DB_READER_THREADS = int(os.getenv('DB_READER_THREADS', '4'))              # 每个数据库的读线程数
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))             # 每个连接的页缓存大小
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))      # 内存映射读取的最大字节数
     
     # 日志配置
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
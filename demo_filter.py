@@ -81,7 +81,7 @@ async def demo_content_filtering():
     # 3. 显示过滤统计
     print("📊 过滤统计信息:")
     print("-" * 40)
-    stats = content_filter.get_filter_statistics(days=1)
+    stats = await content_filter.get_filter_statistics(days=1)
     
     print(f"今日处理: {stats.get('total_processed', 0)} 条")
     print(f"已拦截: {stats.get('blocked', 0)} 条")
@@ -105,7 +105,7 @@ async def demo_content_filtering():
         created_by=1
     )
     
-    success = content_filter.add_rule(custom_rule)
+    success = await content_filter.add_rule(custom_rule)
     if success:
         print("✅ 自定义规则添加成功")
         
@@ -122,7 +122,7 @@ async def demo_content_filtering():
     # 5. 显示审核记录
     print("📝 审核记录:")
     print("-" * 40)
-    records = content_filter.get_audit_records(days=1)
+    records = await content_filter.get_audit_records(days=1)
     
     if records:
         print(f"今日审核记录 {len(records)} 条:")
@@ -147,7 +147,7 @@ async def demo_content_filtering():
     print(f"活跃规则数: {len(content_filter.rules)}")
     print(f"敏感词数量: {len(content_filter._sensitive_words)}")
     print(f"正则缓存: {len(content_filter._regex_cache)} 个")
-    print(f"频率限制缓存: {len(content_filter._rate_limit_cache)} 个用户")
+    print(f"频率限制跟踪: {content_filter._rate_limiter.get_stats()['tracked_keys']} 个用户")
     print()
     
     print("🎉 弹幕过滤审核系统演示完成!")
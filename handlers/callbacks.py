@@ -3,15 +3,14 @@ from telegram.ext import ContextTypes
 from loguru import logger
 
 from managers.user_manager import user_manager
-<<<<<<< HEAD
+from managers.status_monitor import status_monitor
 from managers.template_manager import template_manager
 from managers.queue_manager import danmaku_queue
 from managers.content_filter import content_filter
-=======
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
 from utils.keyboards import keyboards
 from clients.danmaku_client import danmaku_client
-from clients.tmdb_client import tmdb_client
+from clients.tmdb_client import tmdb_client, search_prefetcher
+from config import config
 
 
 async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -27,13 +26,17 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         await query.edit_message_text("❌ 您的账户已被禁用，请联系管理员。")
         return
     
+    # 离开电影浏览时取消尚未完成的预取
+    if not callback_data.startswith("movie_"):
+        search_prefetcher.cancel(user.id)
+    
     try:
         # 主菜单和基础功能
         if callback_data == "main_menu":
             await handle_main_menu(query, context)
         elif callback_data == "status":
             await handle_server_status(query, context)
-        elif callback_data == "danmaku_control":
+        elif callback_data in ("danmaku_control", "danmaku_quick_menu"):
             await handle_danmaku_control(query, context)
         elif callback_data == "movie_search":
             await handle_movie_search(query, context)
@@ -45,7 +48,6 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
             await handle_danmaku_action(query, "resume")
         elif callback_data.startswith("clear_danmaku"):
             await handle_danmaku_action(query, "clear")
-<<<<<<< HEAD
         elif callback_data == "danmaku_style_menu":
             await handle_danmaku_style_menu(query, context)
         elif callback_data.startswith("send_danmaku"):
@@ -101,24 +103,24 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         elif callback_data == "clear_queue":
             await handle_clear_queue(query, context)
         
-=======
-        elif callback_data.startswith("send_danmaku"):
-            await handle_send_danmaku_prompt(query, context)
-        
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
         # 设置功能
         elif callback_data.startswith("speed_"):
             await handle_speed_setting(query, callback_data)
         elif callback_data.startswith("opacity_"):
             await handle_opacity_setting(query, callback_data)
-        elif callback_data == "display_settings":
+        elif callback_data in ("display_settings", "danmaku_advanced"):
             await handle_display_settings(query)
         
         # 电影功能
         elif callback_data.startswith("movie_detail_"):
             await handle_movie_detail(query, callback_data)
+        elif callback_data.startswith("movie_page_"):
+            await handle_movie_page(query, context, callback_data)
+        
+        # 管理员功能
+        elif callback_data == "admin_stats":
+            await handle_admin_stats(query, context)
         
-<<<<<<< HEAD
         # 内容审核功能
         elif callback_data == "content_moderation":
             await handle_content_moderation_menu(query, context)
@@ -141,8 +143,6 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
         elif callback_data.startswith("reject_content_"):
             await handle_reject_content(query, callback_data)
         
-=======
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
         else:
             await query.edit_message_text("❓ 未知操作", reply_markup=keyboards.back_to_menu())
         
@@ -161,17 +161,17 @@ async def handle_main_menu(query, context):
 
 async def handle_server_status(query, context):
     """服务器状态"""
-    await query.edit_message_text("📊 正在获取状态...")
-    
-    async with danmaku_client as client:
-        result = await client.get_status()
+    result = await status_monitor.get_snapshot()
     
     if result['success']:
         data = result['data']
         status_text = f"""📊 服务器状态
 🟢 状态: {"在线" if data.get('online') else "离线"}
 💻 CPU: {data.get('cpu_usage', 'N/A')}%
-🧠 内存: {data.get('memory_usage', 'N/A')}MB"""
+🧠 内存: {data.get('memory_usage', 'N/A')}MB
+🕒 更新于: {status_monitor.format_age(result['age'])}"""
+        if result['error']:
+            status_text += f"\n⚠️ 最近一次刷新失败: {result['error']}"
         
         await query.edit_message_text(status_text, reply_markup=keyboards.server_status())
     else:
@@ -181,7 +181,7 @@ async def handle_server_status(query, context):
 async def handle_danmaku_control(query, context):
     """弹幕控制"""
     text = "🎯 弹幕管理\n\n选择操作："
-    await query.edit_message_text(text, reply_markup=keyboards.danmaku_control())
+    await query.edit_message_text(text, reply_markup=keyboards.danmaku_quick_menu())
 
 
 async def handle_danmaku_action(query, action):
@@ -198,7 +198,7 @@ async def handle_danmaku_action(query, action):
             result = await client.clear_danmaku()
     
     status = "✅ 成功" if result['success'] else f"❌ 失败：{result['message']}"
-    await query.edit_message_text(f"{status}", reply_markup=keyboards.danmaku_control())
+    await query.edit_message_text(f"{status}", reply_markup=keyboards.danmaku_quick_menu())
     
     # 记录日志
     await user_manager.log_operation(query.from_user.id, f"{action}_danmaku", None, 
@@ -214,7 +214,7 @@ async def handle_send_danmaku_prompt(query, context):
 async def handle_display_settings(query):
     """显示设置"""
     text = "⚙️ 显示设置\n\n选择要调整的参数："
-    await query.edit_message_text(text, reply_markup=keyboards.display_settings())
+    await query.edit_message_text(text, reply_markup=keyboards.danmaku_advanced())
 
 
 async def handle_speed_setting(query, callback_data):
@@ -226,7 +226,7 @@ async def handle_speed_setting(query, callback_data):
         result = await client.set_danmaku_speed(speed)
     
     status = "✅ 设置成功" if result['success'] else f"❌ 设置失败"
-    await query.edit_message_text(status, reply_markup=keyboards.display_settings())
+    await query.edit_message_text(status, reply_markup=keyboards.danmaku_advanced())
 
 
 async def handle_opacity_setting(query, callback_data):
@@ -255,18 +255,53 @@ async def handle_movie_detail(query, callback_data):
     await query.edit_message_text("🎬 获取详情中...")
     
     async with tmdb_client as client:
-        result = await client.get_movie_details(movie_id)
+        result = await client.get_movie_bundle(movie_id)
     
     if result['success']:
         movie = result['data']
+        credits = movie.get('credits', {})
+        directors = [p['name'] for p in credits.get('crew', []) if p.get('job') == 'Director']
+        cast = [p['name'] for p in credits.get('cast', [])[:5]]
+        
         text = f"""🎬 {movie.get('title')}
 📅 {movie.get('release_date')}
-⭐ {movie.get('vote_average')}/10
-📝 {movie.get('overview', '')[:100]}..."""
+⭐ {movie.get('vote_average')}/10"""
+        if directors:
+            text += f"\n🎬 导演: {'、'.join(directors)}"
+        if cast:
+            text += f"\n👥 主演: {'、'.join(cast)}"
+        text += f"\n📝 {(movie.get('overview') or '')[:100]}..."
         
         await query.edit_message_text(text, reply_markup=keyboards.movie_detail(movie_id))
     else:
-<<<<<<< HEAD
+        await query.edit_message_text(f"❌ 获取失败", reply_markup=keyboards.back_to_menu())
+
+
+async def handle_movie_page(query, context, callback_data):
+    """电影搜索结果翻页"""
+    page = int(callback_data.replace('movie_page_', ''))
+    search_query = context.user_data.get('search_query')
+    if not search_query:
+        await query.edit_message_text("❌ 搜索已过期，请重新搜索", reply_markup=keyboards.back_to_menu())
+        return
+    
+    async with tmdb_client as client:
+        result = await client.search_movies(search_query, page)
+    
+    if result['success'] and result['data']['movies']:
+        movies = result['data']['movies']
+        total_pages = result['data']['total_pages']
+        context.user_data['search_results'] = movies
+        context.user_data['current_page'] = page
+        context.user_data['total_pages'] = total_pages
+        
+        await query.edit_message_text(
+            f"🎬 「{search_query}」搜索结果（第 {page}/{total_pages} 页）",
+            reply_markup=keyboards.movie_search_results(movies, page, total_pages)
+        )
+        
+        search_prefetcher.schedule(query.from_user.id, search_query, page, total_pages, movies)
+    else:
         await query.edit_message_text(f"❌ 获取失败", reply_markup=keyboards.back_to_menu())
 
 
@@ -416,6 +451,7 @@ async def handle_queue_management(query, context):
 • 已失败：{queue_info['status_counts'].get('failed', 0)}
 
 🎛️ 处理状态：{'运行中' if queue_info['is_processing'] else '已停止'}
+• 发送任务：{len(queue_info['workers'])} 个，进行中 {queue_info['in_flight']} 条
 
 📈 统计信息：
 • 总发送：{queue_info['stats']['total_sent']}
@@ -461,7 +497,12 @@ async def handle_start_queue(query, context):
         return
     
     try:
-        await danmaku_queue.start_processing(danmaku_client, interval=2.0)
+        await danmaku_queue.start_processing(
+            danmaku_client,
+            interval=config.QUEUE_SEND_INTERVAL,
+            workers=config.QUEUE_WORKERS,
+            burst=config.QUEUE_SEND_BURST
+        )
         await query.edit_message_text(
             "✅ 队列处理已启动",
             reply_markup=keyboards.queue_management()
@@ -525,6 +566,46 @@ async def handle_clear_queue(query, context):
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
 
 
+# 管理员相关处理函数
+
+async def handle_admin_stats(query, context):
+    """管理员统计信息"""
+    user_id = query.from_user.id
+    is_admin = await user_manager.is_admin(user_id)
+    
+    if not is_admin:
+        await query.edit_message_text(
+            "❌ 权限不足，只有管理员可以查看统计信息",
+            reply_markup=keyboards.back_to_menu()
+        )
+        return
+    
+    stats = await user_manager.get_user_stats()
+    
+    text = f"""📊 系统统计
+
+👥 总用户数: {stats.get('total_users', 0)}
+✅ 活跃用户: {stats.get('active_users', 0)}
+🔑 管理员数: {stats.get('admin_users', 0)}
+📅 今日活跃: {stats.get('today_active', 0)}
+
+🔥 最活跃用户（7天，操作/审核/拦截）："""
+    
+    try:
+        overview = await user_manager.get_activity_overview(days=7, limit=10)
+    except Exception as e:
+        logger.error(f"获取用户活跃概览失败: {e}")
+        overview = []
+    
+    for row in overview:
+        name = row['username'] or row['first_name'] or row['telegram_id']
+        text += f"\n• {name}: {row['operations']} / {row['audited']} / {row['blocked']}"
+    if not overview:
+        text += "\n• 暂无数据"
+    
+    await query.edit_message_text(text, reply_markup=keyboards.admin_panel())
+
+
 # 内容审核相关处理函数
 
 async def handle_content_moderation_menu(query, context):
@@ -540,7 +621,7 @@ async def handle_content_moderation_menu(query, context):
         return
     
     # 获取基础统计信息
-    stats = content_filter.get_filter_statistics(days=1)
+    stats = await content_filter.get_filter_statistics(days=1)
     
     text = f"""🛡️ 内容审核管理
 
@@ -589,7 +670,7 @@ async def handle_filter_rules(query, context):
 
 async def handle_audit_records(query, context):
     """审核记录查看"""
-    records = content_filter.get_audit_records(days=7)
+    records = await content_filter.get_audit_records(days=7)
     
     if not records:
         await query.edit_message_text(
@@ -625,8 +706,8 @@ async def handle_audit_records(query, context):
 
 async def handle_filter_statistics(query, context):
     """过滤统计信息"""
-    stats_7d = content_filter.get_filter_statistics(days=7)
-    stats_30d = content_filter.get_filter_statistics(days=30)
+    stats_7d = await content_filter.get_filter_statistics(days=7)
+    stats_30d = await content_filter.get_filter_statistics(days=30)
     
     text = f"""📊 过滤统计报告
 
@@ -678,7 +759,7 @@ async def handle_toggle_rule(query, callback_data):
             rule.updated_at = datetime.now()
             
             # 更新数据库
-            success = content_filter.add_rule(rule)  # add_rule 支持更新
+            success = await content_filter.add_rule(rule)  # add_rule 支持更新
             
             if success:
                 status = "启用" if rule.enabled else "禁用"
@@ -703,7 +784,7 @@ async def handle_delete_rule(query, callback_data):
     """删除规则"""
     rule_id = callback_data.replace('delete_rule_', '')
     
-    success = content_filter.remove_rule(rule_id)
+    success = await content_filter.remove_rule(rule_id)
     
     if success:
         await query.edit_message_text(
@@ -722,7 +803,7 @@ async def handle_audit_detail(query, callback_data):
     record_id = int(callback_data.replace('audit_detail_', ''))
     
     # 获取记录详情
-    records = content_filter.get_audit_records()
+    records = await content_filter.get_audit_records()
     record = next((r for r in records if r['id'] == record_id), None)
     
     if not record:
@@ -809,6 +890,3 @@ async def handle_reject_content(query, callback_data):
         {'record_id': record_id},
         'success'
     )
-=======
-        await query.edit_message_text(f"❌ 获取失败", reply_markup=keyboards.back_to_menu())
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
@@ -1,18 +1,17 @@
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes
 from loguru import logger
 from typing import Dict, Any
 
 from managers.user_manager import user_manager
-<<<<<<< HEAD
+from managers.status_monitor import status_monitor
 from managers.template_manager import template_manager
-from managers.queue_manager import danmaku_queue
-from managers.content_filter import content_filter
-=======
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
+from managers.queue_manager import danmaku_queue, DanmakuStatus
+from managers.content_filter import content_filter, FilterAction
 from utils.keyboards import keyboards
 from clients.danmaku_client import danmaku_client
-from clients.tmdb_client import tmdb_client
+from clients.tmdb_client import tmdb_client, search_prefetcher
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -135,14 +134,14 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text("❌ 您的账户已被禁用，请联系管理员。")
         return
     
-    await update.message.reply_text("📊 正在获取服务器状态...")
-    
-    # 获取服务器状态
-    async with danmaku_client as client:
-        status_result = await client.get_status()
+    # 读取后台刷新的状态快照
+    status_result = await status_monitor.get_snapshot()
     
     if status_result['success']:
         data = status_result['data']
+        age_text = status_monitor.format_age(status_result['age'])
+        if status_result['error']:
+            age_text += f"（最近一次刷新失败：{status_result['error']}）"
         
         # 格式化状态信息
         status_text = f"""
@@ -156,9 +155,10 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 ⏰ **运行时间**: {data.get('uptime', 'N/A')}
 
 最后更新: {data.get('last_update', 'N/A')}
+数据更新于: {age_text}
         """
         
-        await update.message.edit_text(
+        await update.message.reply_text(
             status_text,
             parse_mode='Markdown',
             reply_markup=keyboards.server_status()
@@ -172,7 +172,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             'success'
         )
     else:
-        await update.message.edit_text(
+        await update.message.reply_text(
             f"❌ 获取服务器状态失败：{status_result['message']}",
             reply_markup=keyboards.back_to_menu()
         )
@@ -259,6 +259,67 @@ def require_permission(permission: str = 'user'):
     return decorator
 
 
+async def _track_bulk_send(progress_message, user_id: int, message_ids: list, total: int, blocked_count: int, rejected_count: int) -> None:
+    """后台跟踪批量弹幕在队列中的发送进度，最多每秒更新一次进度消息"""
+    last_done = -1
+    
+    while True:
+        messages = [danmaku_queue.get_message(message_id) for message_id in message_ids]
+        success_count = sum(1 for msg in messages if msg and msg.status == DanmakuStatus.SUCCESS)
+        failed_count = sum(1 for msg in messages if msg and msg.status == DanmakuStatus.FAILED)
+        pending_count = sum(
+            1 for msg in messages if msg and msg.status in (DanmakuStatus.PENDING, DanmakuStatus.SENDING)
+        )
+        # 被取消或已移出队列
+        cancelled_count = len(message_ids) - success_count - failed_count - pending_count
+                
+        # 全部结束，或队列未在处理（停止后剩余消息等重新启动再发送）
+        if pending_count == 0 or not danmaku_queue.is_processing:
+            break
+    
+        done = len(message_ids) - pending_count
+        if done != last_done:
+            last_done = done
+            try:
+                await progress_message.edit_text(
+                    f"📦 正在发送弹幕 {done}/{len(message_ids)}\n"
+                    f"✅ 成功: {success_count} 条\n❌ 失败: {failed_count} 条"
+                )
+            except Exception as e:
+                logger.debug(f"更新批量进度失败: {e}")
+        
+        # Telegram 对消息编辑有频率限制
+        await asyncio.sleep(1.0)
+    
+    failed_count += rejected_count
+    if pending_count:
+        result_text = f"📦 批量弹幕已加入队列\n✅ 成功: {success_count} 条\n❌ 失败: {failed_count} 条"
+    else:
+        result_text = f"📦 批量发送完成\n✅ 成功: {success_count} 条\n❌ 失败: {failed_count} 条"
+    if blocked_count:
+        result_text += f"\n🚫 被过滤: {blocked_count} 条"
+    if cancelled_count:
+        result_text += f"\n🗑️ 已取消: {cancelled_count} 条"
+    if pending_count:
+        result_text += f"\n⏳ 待发送: {pending_count} 条\n\n📄 队列处理未运行，启动后将自动发送"
+    
+    try:
+        await progress_message.edit_text(
+            result_text,
+            reply_markup=keyboards.queue_management() if pending_count else keyboards.bulk_send_menu()
+        )
+    except Exception as e:
+        logger.error(f"更新批量发送结果失败: {e}")
+    
+    # 记录操作
+    await user_manager.log_operation(
+        user_id, 
+        'bulk_send_danmaku', 
+        f'{total} messages', 
+        f'success: {success_count}, failed: {failed_count}, blocked: {blocked_count}, pending: {pending_count}'
+    )
+
+
 # 消息处理器
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """处理文本消息"""
@@ -271,6 +332,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     if user_data.get('waiting_for_movie_search'):
         # 处理电影搜索
         user_data['waiting_for_movie_search'] = False
+        search_prefetcher.cancel(user.id)
         
         await update.message.reply_text("🔍 正在搜索电影...")
         
@@ -305,6 +367,9 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 parse_mode='Markdown',
                 reply_markup=keyboards.movie_search_results(movies, 1, total_pages)
             )
+            
+            # 结果展示后在后台预取下一页和前几部电影的详情
+            search_prefetcher.schedule(user.id, message_text, 1, total_pages, movies)
         else:
             await update.message.reply_text(
                 f"😔 未找到相关电影，请尝试其他关键词。",
@@ -320,7 +385,6 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
     
     elif user_data.get('waiting_for_danmaku_text'):
-<<<<<<< HEAD
         # 处理普通弹幕发送
         user_data['waiting_for_danmaku_text'] = False
         style = user_data.get('danmaku_style', 'normal')
@@ -334,18 +398,18 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 f"原因: {', '.join(filter_result.warnings) if filter_result.warnings else '触发安全规则'}\n"
                 f"风险等级: {filter_result.risk_level.value.upper()}\n\n"
                 f"请修改内容后重试。",
-                reply_markup=keyboards.danmaku_control()
+                reply_markup=keyboards.danmaku_quick_menu()
             )
             return
         
         # 如果需要人工审核
-        if filter_result.action.value == 'review':
+        if filter_result.action == FilterAction.REVIEW:
             await update.message.reply_text(
                 f"⏳ 弹幕内容需要人工审核\n\n"
                 f"内容: {message_text}\n"
                 f"状态: 已提交审核，请等待管理员处理\n\n"
                 f"审核通过后将自动发送。",
-                reply_markup=keyboards.danmaku_control()
+                reply_markup=keyboards.danmaku_quick_menu()
             )
             # 这里可以通知管理员进行审核
             return
@@ -375,32 +439,18 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             
             await update.message.reply_text(
                 success_msg,
-=======
-        # 处理弹幕发送
-        user_data['waiting_for_danmaku_text'] = False
-        
-        await update.message.reply_text("💬 正在发送弹幕...")
-        
-        async with danmaku_client as client:
-            send_result = await client.send_danmaku(message_text)
-        
-        if send_result['success']:
-            await update.message.reply_text(
-                f"✅ 弹幕发送成功！\n内容：{message_text}",
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
-                reply_markup=keyboards.danmaku_control()
+                reply_markup=keyboards.danmaku_quick_menu()
             )
         else:
             await update.message.reply_text(
                 f"❌ 弹幕发送失败：{send_result['message']}",
-                reply_markup=keyboards.danmaku_control()
+                reply_markup=keyboards.danmaku_quick_menu()
             )
         
         # 记录操作
         await user_manager.log_operation(
             user.id, 
             'send_danmaku', 
-<<<<<<< HEAD
             {'original': message_text, 'filtered': final_text, 'filter_action': filter_result.action.value}, 
             'success' if send_result['success'] else f"failed: {send_result['message']}"
         )
@@ -464,41 +514,36 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             return
         
-        await update.message.reply_text(f"📦 正在添加 {len(lines)} 条弹幕到队列...")
-        
-        # 添加到队列
-        success_count = 0
-        failed_count = 0
+        # 整批内容过滤，被拦截或需要审核的不发送
+        texts = []
+        blocked_count = 0
+        for filter_result in await content_filter.filter_many(lines, user.id):
+            if filter_result.is_blocked or filter_result.action == FilterAction.REVIEW:
+                blocked_count += 1
+            else:
+                texts.append(filter_result.filtered_text)
         
-        for i, text in enumerate(lines):
+        # 加入弹幕队列，由队列按优先级、速率预算发送，并随队列日志持久化
+        message_ids = []
+        rejected_count = 0
+        for text in texts:
             try:
-                message_id = danmaku_queue.add_message(
+                message_ids.append(await danmaku_queue.add_message(
                     text=text,
                     user_id=user.id,
                     priority=2,  # 批量消息使用低优先级
-                    delay=i * 1.0  # 每条消息间隔1秒
-                )
-                success_count += 1
+                    skip_filter=True  # 上面已整批过滤
+                ))
             except Exception as e:
                 logger.error(f"添加批量弹幕失败: {e}")
-                failed_count += 1
-        
-        result_text = f"📦 批量添加完成\n✅ 成功: {success_count} 条\n❌ 失败: {failed_count} 条"
+                rejected_count += 1
         
-        if success_count > 0:
-            result_text += "\n\n📄 消息已添加到队列，开始处理后将自动发送"
+        progress_message = await update.message.reply_text(f"📦 已将 {len(message_ids)} 条弹幕加入队列...")
         
-        await update.message.reply_text(
-            result_text,
-            reply_markup=keyboards.queue_management()
-        )
-        
-        # 记录操作
-        await user_manager.log_operation(
-            user.id, 
-            'bulk_send_danmaku', 
-            f'{len(lines)} messages', 
-            f'success: {success_count}, failed: {failed_count}'
+        # 后台跟踪发送进度；更新按顺序处理，不能让等待发送阻塞其他用户
+        context.application.create_task(
+            _track_bulk_send(progress_message, user.id, message_ids, len(lines), blocked_count, rejected_count),
+            update=update
         )
     
     elif user_data.get('waiting_for_filter_rule'):
@@ -518,7 +563,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             name, filter_type, pattern, action, risk_level = [p.strip() for p in parts]
             
             # 验证参数
-            from managers.content_filter import FilterType, FilterAction, RiskLevel, FilterRule
+            from managers.content_filter import FilterType, RiskLevel, FilterRule
             import uuid
             
             # 检查枚举值是否有效
@@ -548,7 +593,7 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             
             # 添加规则
-            success = content_filter.add_rule(rule)
+            success = await content_filter.add_rule(rule)
             
             if success:
                 await update.message.reply_text(
@@ -580,11 +625,6 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 f"❌ 处理规则时发生错误: {str(e)}",
                 reply_markup=keyboards.back_to_content_moderation()
             )
-=======
-            message_text, 
-            'success' if send_result['success'] else f"failed: {send_result['message']}"
-        )
->>>>>>> d7713b91f7befb22e88fb9bbcf3ab5a17dfa2103
     
     else:
         # 默认回复
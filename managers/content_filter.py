@@ -1,14 +1,18 @@
 import re
 import json
-import sqlite3
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple, Set, Union
+from typing import Dict, List, Any, Optional, Tuple, Set, Pattern
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from enum import Enum
 import hashlib
 import asyncio
 
+from .storage import StorageExecutor, storage
+
 
 # 简单的日志记录器
 class Logger:
@@ -108,128 +112,765 @@ class FilterResult:
             self.warnings = []
 
 
+class AhoCorasickMatcher:
+    """Aho-Corasick 多模式匹配自动机
+    
+    一次扫描即可找出文本中出现的所有模式，耗时与文本长度线性相关，
+    与模式数量无关。模式与文本均按小写匹配。
+    """
+    
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]   # 状态转移表
+        self._fail: List[int] = [0]               # 失败指针
+        self._output: List[List[Any]] = [[]]      # 每个状态命中的模式载荷
+        self._built = True
+        self.pattern_count = 0
+    
+    def add(self, pattern: str, payload: Any):
+        """添加模式，命中时返回 payload"""
+        pattern = pattern.lower()
+        if not pattern:
+            return
+        
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        
+        self._output[state].append(payload)
+        self.pattern_count += 1
+        self._built = False
+    
+    def build(self):
+        """构建失败指针（BFS）"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                # 合并后缀状态的输出，匹配时无需再沿失败链回溯
+                self._output[next_state].extend(self._output[self._fail[next_state]])
+        
+        self._built = True
+    
+    def search(self, text: str) -> List[Any]:
+        """扫描文本，按首次出现顺序返回命中的载荷（去重）"""
+        if not self._built:
+            self.build()
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found = []
+        seen = set()
+        state = 0
+        
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for payload in output[state]:
+                    if payload not in seen:
+                        seen.add(payload)
+                        found.append(payload)
+        
+        return found
+
+
+# 风险等级排序，用于取最高风险
+_RISK_RANK = {
+    RiskLevel.LOW: 0,
+    RiskLevel.MEDIUM: 1,
+    RiskLevel.HIGH: 2,
+    RiskLevel.CRITICAL: 3
+}
+
+# 反向引用在合并正则后会错位，含有反向引用的规则单独匹配
+_BACKREFERENCE_PATTERN = re.compile(r'\\\d|\(\?P=')
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """编译后的单条规则（规则计划中的一步）"""
+    rule_id: str
+    risk_level: RiskLevel
+    risk_rank: int
+    action: Optional[FilterAction] = None        # 命中后设置的动作（ALLOW/QUARANTINE 不改变结果动作）
+    is_blocking: bool = False                    # 命中后标记为阻止
+    stops: bool = False                          # 命中后停止检查后续规则（BLOCK/REVIEW）
+    warning: str = ""                            # 命中后追加的警告
+    replace_regex: Optional[Pattern] = None      # 替换用的正则
+    replacement: str = ""
+    rate_limit: Optional[Tuple[int, int]] = None  # 频率限制规则的 (最大次数, 窗口秒数)
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    """不可变的规则计划，每个规则集版本构建一次"""
+    version: int
+    steps: Tuple[CompiledRule, ...]                  # 按优先级排序、仅包含启用的规则
+    keyword_matcher: AhoCorasickMatcher               # 关键词规则与敏感词
+    length_thresholds: Tuple[int, ...]                # 长度限制（升序）
+    length_rule_ids: Tuple[str, ...]
+    combined_regex: Optional[Pattern]                 # 正则规则合并后的命名分组交替式
+    regex_group_rules: Dict[str, str]                 # 分组名 -> 规则ID
+    merged_regex_rules: Tuple[Tuple[str, Pattern], ...]    # 已合并的 (规则ID, 正则)
+    separate_regex_rules: Tuple[Tuple[str, Pattern], ...]  # 需逐条匹配的 (规则ID, 正则)
+
+
+class SlidingWindowRateLimiter:
+    """滑动窗口频率限制器
+    
+    每个键只保存一个定长环形缓冲（deque(maxlen=max_count)），记录最近 max_count 次
+    放行的 monotonic 时间戳；缓冲已满且最早一次仍在窗口内即视为超限，检查为 O(1)。
+    键按最近访问顺序排列，后台任务定期清理超过窗口未活动的键，
+    键数达到 max_keys 时淘汰最久未访问的键，内存有上界。
+    """
+    
+    def __init__(self, max_keys: int = 100000, sweep_interval: float = 30.0):
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        # 键 -> [环形缓冲, 窗口秒数, 最近访问时间]
+        self._entries: "OrderedDict[Any, list]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            'checks': 0,
+            'limited': 0,
+            'idle_evictions': 0,
+            'capacity_evictions': 0,
+            'sweeps': 0
+        }
+    
+    def is_limited(self, key: Any, max_count: int, window_seconds: float) -> bool:
+        """检查并记录一次请求，超限时返回 True（超限的请求不计入窗口）"""
+        return self.acquire(key, max_count, window_seconds) == 0
+    
+    def acquire(self, key: Any, max_count: int, window_seconds: float, count: int = 1) -> int:
+        """一次记账 count 个请求，返回按顺序放行的数量（其余视为超限，不计入窗口）"""
+        now = time.monotonic()
+        self.stats['checks'] += count
+        
+        entry = self._entries.get(key)
+        if entry is None or entry[0].maxlen != max_count:
+            entry = [deque(maxlen=max_count), window_seconds, now]
+            self._entries[key] = entry
+            if len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.stats['capacity_evictions'] += 1
+        else:
+            self._entries.move_to_end(key)
+        
+        ring = entry[0]
+        entry[1] = window_seconds
+        entry[2] = now
+        
+        allowed = 0
+        while allowed < count and not (len(ring) == max_count and now - ring[0] < window_seconds):
+            ring.append(now)
+            allowed += 1
+        
+        self.stats['limited'] += count - allowed
+        return allowed
+    
+    def sweep(self) -> int:
+        """清理超过窗口未活动的键，返回清理数量"""
+        now = time.monotonic()
+        evicted = 0
+        # 按最近访问顺序从最旧的键开始，遇到仍活跃的键即停止
+        while self._entries:
+            key, (_, window_seconds, last_seen) = next(iter(self._entries.items()))
+            if now - last_seen < window_seconds:
+                break
+            del self._entries[key]
+            evicted += 1
+        
+        self.stats['idle_evictions'] += evicted
+        self.stats['sweeps'] += 1
+        return evicted
+    
+    def ensure_started(self):
+        """在当前事件循环中启动后台清理任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sweep_loop())
+    
+    async def _sweep_loop(self):
+        """后台清理循环"""
+        try:
+            while True:
+                await asyncio.sleep(self.sweep_interval)
+                self.sweep()
+        except asyncio.CancelledError:
+            pass
+    
+    async def stop(self):
+        """停止后台清理任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+    
+    def clear(self):
+        """清空全部限流状态"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        stats = self.stats.copy()
+        stats['tracked_keys'] = len(self._entries)
+        stats['max_keys'] = self.max_keys
+        return stats
+
+
+class VerdictCache:
+    """过滤结论缓存
+    
+    直播弹幕大量重复（"666"、"哈哈哈"、复制刷屏），无状态规则（长度/关键词/正则）和敏感词
+    的命中结果只取决于文本和规则集，按 (规范化文本, 规则集版本) 缓存在 LRU 中；
+    规则或敏感词变化后版本递增，旧条目不会再被命中，随 LRU 淘汰。
+    """
+    
+    def __init__(self, max_entries: int = 10000, max_text_length: int = 256):
+        self.max_entries = max_entries
+        self.max_text_length = max_text_length   # 过长的文本几乎不会重复，不缓存
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[frozenset, Tuple[str, ...]]]" = OrderedDict()
+        
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """规范化文本：规则匹配不区分大小写，统一转为小写（长度变化时保留原文，避免影响长度规则）"""
+        lowered = text.lower()
+        return lowered if len(lowered) == len(text) else text
+    
+    def get(self, text: str, version: int) -> Optional[Tuple[frozenset, Tuple[str, ...]]]:
+        """查询缓存的命中结果"""
+        entry = self._entries.get((text, version))
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end((text, version))
+        self.stats['hits'] += 1
+        return entry
+    
+    def put(self, text: str, version: int, matched_ids: Set[str], sensitive_words: List[str]):
+        """写入命中结果"""
+        if len(text) > self.max_text_length:
+            return
+        self._entries[(text, version)] = (frozenset(matched_ids), tuple(sensitive_words))
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = self.stats.copy()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        return stats
+
+
+class AuditSink:
+    """审核记录批量写入器
+
+    过滤结果先缓存在内存中，由后台任务每 batch_size 条或每 flush_interval
+    秒交给存储执行器的写线程用 executemany 一次事务写入，避免阻塞事件循环。
+    缓冲区达到 max_pending 时 submit 会等待写入完成（背压）。
+    """
+    
+    def __init__(
+        self,
+        db: StorageExecutor,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_pending: int = 5000
+    ):
+        self._db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        
+        self._buffer: List[Tuple] = []
+        self._flush_event: Optional[asyncio.Event] = None
+        self._space_available: Optional[asyncio.Condition] = None
+        self._writer_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        
+        self.stats = {
+            'submitted': 0,
+            'written': 0,
+            'failed': 0,
+            'flushes': 0,
+            'backpressure_waits': 0
+        }
+    
+    def _ensure_started(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self._task is None or self._task.done():
+            self._flush_event = asyncio.Event()
+            self._space_available = asyncio.Condition()
+            self._writer_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+    
+    async def submit(self, user_id: int, result: FilterResult):
+        """提交一条审核记录"""
+        if self._closed:
+            # 关闭后直接同步写入，避免丢失记录
+            await self._db.write(self._insert_rows, [self._to_row(user_id, result)])
+            return
+        
+        self._ensure_started()
+        
+        if len(self._buffer) >= self.max_pending:
+            self.stats['backpressure_waits'] += 1
+            self._flush_event.set()
+            async with self._space_available:
+                await self._space_available.wait_for(lambda: len(self._buffer) < self.max_pending)
+        
+        self._buffer.append(self._to_row(user_id, result))
+        self.stats['submitted'] += 1
+        
+        if len(self._buffer) >= self.batch_size:
+            self._flush_event.set()
+    
+    async def write_many(self, user_id: int, results: List[FilterResult]):
+        """在一个事务中直接写入一批审核记录（用于批量过滤）"""
+        rows = [self._to_row(user_id, result) for result in results]
+        await self._db.write(self._insert_rows, rows)
+        self.stats['submitted'] += len(rows)
+        self.stats['written'] += len(rows)
+    
+    @staticmethod
+    def _to_row(user_id: int, result: FilterResult) -> Tuple:
+        """转换为数据库行"""
+        return (
+            user_id, result.original_text, result.filtered_text,
+            result.action.value, result.risk_level.value,
+            json.dumps(result.matched_rules), json.dumps(result.warnings),
+            datetime.now()
+        )
+    
+    async def _run(self):
+        """后台写入循环"""
+        try:
+            while not self._closed:
+                try:
+                    await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_event.clear()
+                await self.flush()
+        except asyncio.CancelledError:
+            pass
+    
+    async def flush(self):
+        """立即写入缓冲区中的全部记录"""
+        if self._writer_lock is None:
+            return
+        
+        async with self._writer_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                
+                try:
+                    await self._db.write(self._insert_rows, batch)
+                    self.stats['written'] += len(batch)
+                except Exception as e:
+                    self.stats['failed'] += len(batch)
+                    logger.error(f"批量写入审核记录失败: {e}")
+                
+                self.stats['flushes'] += 1
+                async with self._space_available:
+                    self._space_available.notify_all()
+    
+    @staticmethod
+    def _insert_rows(conn, rows: List[Tuple]):
+        """在写线程中以单个事务写入"""
+        conn.executemany('''
+            INSERT INTO audit_records (
+                user_id, original_text, filtered_text, action, risk_level,
+                matched_rules, warnings, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    
+    async def close(self):
+        """停止后台任务并写入剩余记录"""
+        self._closed = True
+        if self._task and not self._task.done():
+            # 唤醒后台任务让其自然退出；取消进行中的写入会丢失已出队的批次
+            self._flush_event.set()
+            await self._task
+        await self.flush()
+        logger.info(f"审核记录写入器已关闭，共写入 {self.stats['written']} 条")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        stats = self.stats.copy()
+        stats['pending'] = len(self._buffer)
+        return stats
+
+
 class DanmakuContentFilter:
     """弹幕内容过滤器"""
     
     def __init__(self, db_file: str = "data/content_filter.db"):
         self.db_file = Path(db_file)
         self.db_file.parent.mkdir(parents=True, exist_ok=True)
-        self._init_database()
-        self._load_rules()
-        self._init_default_rules()
+        self._db = storage.open(self.db_file)
+        
+        # 规则计划（规则集版本变化后按需重建）
+        self._ruleset_version = 0
+        self._rule_plan: Optional[RulePlan] = None
         
         # 缓存编译的正则表达式
         self._regex_cache = {}
         
-        # 用户频率限制缓存
-        self._rate_limit_cache = {}
-        self._rate_limit_window = 60  # 60秒窗口
+        # 用户频率限制（有界内存，后台清理空闲用户）
+        self._rate_limiter = SlidingWindowRateLimiter()
+        
+        # 无状态规则命中结果缓存（按规则集版本失效）
+        self._verdict_cache = VerdictCache()
         
         # 敏感词库
         self._sensitive_words = set()
+        
+        # 审核记录批量写入器
+        self._audit_sink = AuditSink(self._db)
+        
+        self._init_database()
+        self._load_rules()
+        self._init_default_rules()
         self._load_sensitive_words()
     
+    def _invalidate_rule_plan(self):
+        """规则或敏感词变化后递增规则集版本，下次过滤时重建规则计划"""
+        self._ruleset_version += 1
+        self._rule_plan = None
+        self._verdict_cache.clear()
+    
+    def _compile_regex(self, pattern: str) -> Optional[Pattern]:
+        """编译并缓存正则表达式"""
+        if pattern not in self._regex_cache:
+            try:
+                self._regex_cache[pattern] = re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"正则表达式错误: {pattern} - {e}")
+                self._regex_cache[pattern] = None
+        return self._regex_cache[pattern]
+    
+    def _get_rule_plan(self) -> RulePlan:
+        """获取当前规则集版本的规则计划"""
+        plan = self._rule_plan
+        if plan is None or plan.version != self._ruleset_version:
+            plan = self._build_rule_plan()
+            self._rule_plan = plan
+        return plan
+    
+    def _build_rule_plan(self) -> RulePlan:
+        """将启用的规则编译为不可变的规则计划"""
+        steps = []
+        keyword_matcher = AhoCorasickMatcher()
+        length_limits = []
+        regex_rules = []
+        
+        for rule in sorted(self.rules, key=lambda x: x.priority, reverse=True):
+            if not rule.enabled:
+                continue
+            
+            replace_regex = None
+            rate_limit = None
+            
+            if rule.filter_type == FilterType.KEYWORD:
+                keywords = [kw.strip() for kw in rule.pattern.split(',') if kw.strip()]
+                if not keywords:
+                    continue
+                for keyword in keywords:
+                    keyword_matcher.add(keyword, ('rule', rule.id))
+                # 长关键词优先，避免被其前缀截断替换
+                replace_regex = re.compile(
+                    '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True)),
+                    re.IGNORECASE
+                )
+            
+            elif rule.filter_type == FilterType.REGEX:
+                replace_regex = self._compile_regex(rule.pattern)
+                if replace_regex is None:
+                    continue
+                regex_rules.append((rule.id, replace_regex))
+            
+            elif rule.filter_type == FilterType.LENGTH:
+                try:
+                    length_limits.append((int(rule.pattern), rule.id))
+                except ValueError:
+                    continue
+            
+            elif rule.filter_type == FilterType.RATE_LIMIT:
+                try:
+                    max_count, window_seconds = map(int, rule.pattern.split(','))
+                except ValueError:
+                    continue
+                rate_limit = (max_count, window_seconds)
+            
+            else:
+                # 其他类型暂未实现检查，永远不会命中
+                continue
+            
+            action = rule.action
+            steps.append(CompiledRule(
+                rule_id=rule.id,
+                risk_level=rule.risk_level,
+                risk_rank=_RISK_RANK[rule.risk_level],
+                action=action if action not in (FilterAction.ALLOW, FilterAction.QUARANTINE) else None,
+                is_blocking=action == FilterAction.BLOCK,
+                stops=action in (FilterAction.BLOCK, FilterAction.REVIEW),
+                warning=f"触发规则: {rule.name}" if action == FilterAction.WARNING else "",
+                replace_regex=replace_regex if action == FilterAction.REPLACE else None,
+                replacement=rule.replacement,
+                rate_limit=rate_limit
+            ))
+        
+        for word in self._sensitive_words:
+            keyword_matcher.add(word, ('word', word))
+        keyword_matcher.build()
+        
+        # 合并正则规则为一个命名分组交替式
+        combined_regex = None
+        regex_group_rules = {}
+        merged_regex_rules = [
+            (rule_id, regex) for rule_id, regex in regex_rules
+            if not _BACKREFERENCE_PATTERN.search(regex.pattern)
+        ]
+        separate_regex_rules = [
+            (rule_id, regex) for rule_id, regex in regex_rules
+            if _BACKREFERENCE_PATTERN.search(regex.pattern)
+        ]
+        if merged_regex_rules:
+            alternatives = []
+            for i, (rule_id, regex) in enumerate(merged_regex_rules):
+                group_name = f"_rule{i}"
+                regex_group_rules[group_name] = rule_id
+                alternatives.append(f"(?P<{group_name}>{regex.pattern})")
+            try:
+                combined_regex = re.compile('|'.join(alternatives), re.IGNORECASE)
+            except re.error as e:
+                logger.warning(f"合并正则规则失败，改为逐条匹配: {e}")
+                combined_regex = None
+                regex_group_rules = {}
+                separate_regex_rules = regex_rules
+                merged_regex_rules = []
+        
+        length_limits.sort()
+        plan = RulePlan(
+            version=self._ruleset_version,
+            steps=tuple(steps),
+            keyword_matcher=keyword_matcher,
+            length_thresholds=tuple(limit for limit, _ in length_limits),
+            length_rule_ids=tuple(rule_id for _, rule_id in length_limits),
+            combined_regex=combined_regex,
+            regex_group_rules=regex_group_rules,
+            merged_regex_rules=tuple(merged_regex_rules),
+            separate_regex_rules=tuple(separate_regex_rules)
+        )
+        
+        logger.info(
+            f"规则计划构建完成: {len(steps)} 条规则, "
+            f"{keyword_matcher.pattern_count} 个关键词/敏感词, {len(regex_rules)} 条正则"
+        )
+        return plan
+    
+    def _scan_keywords(self, text: str, plan: Optional[RulePlan] = None) -> Tuple[Set[str], List[str]]:
+        """单次扫描文本，返回命中的关键词规则ID和敏感词"""
+        plan = plan or self._get_rule_plan()
+        keyword_rule_ids = set()
+        sensitive_words = []
+        
+        for kind, value in plan.keyword_matcher.search(text):
+            if kind == 'rule':
+                keyword_rule_ids.add(value)
+            else:
+                sensitive_words.append(value)
+        
+        return keyword_rule_ids, sensitive_words
+    
+    def _match_stateless_rules(self, text: str, plan: RulePlan) -> Tuple[Set[str], List[str]]:
+        """一次性计算所有无状态规则（长度/关键词/正则）的命中结果"""
+        matched_ids, sensitive_words = self._scan_keywords(text, plan)
+        
+        # 长度限制：阈值小于文本长度的规则全部命中
+        matched_ids.update(plan.length_rule_ids[:bisect_left(plan.length_thresholds, len(text))])
+        
+        # 合并的交替式未命中时，其中所有正则规则都不会命中
+        if plan.combined_regex is not None and plan.combined_regex.search(text):
+            regex_hits = {
+                plan.regex_group_rules[match.lastgroup]
+                for match in plan.combined_regex.finditer(text)
+            }
+            matched_ids.update(regex_hits)
+            # 交替式只报告不重叠的匹配，未出现的规则需单独确认
+            for rule_id, regex in plan.merged_regex_rules:
+                if rule_id not in regex_hits and regex.search(text):
+                    matched_ids.add(rule_id)
+        
+        for rule_id, regex in plan.separate_regex_rules:
+            if regex.search(text):
+                matched_ids.add(rule_id)
+        
+        return matched_ids, sensitive_words
+    
+    def _match_content(self, text: str, plan: RulePlan) -> Tuple[Set[str], Tuple[str, ...]]:
+        """获取文本的无状态命中结果，优先使用结论缓存"""
+        key = VerdictCache.normalize(text)
+        cached = self._verdict_cache.get(key, plan.version)
+        if cached is not None:
+            return cached
+        
+        matched_ids, sensitive_words = self._match_stateless_rules(key, plan)
+        self._verdict_cache.put(key, plan.version, matched_ids, sensitive_words)
+        return matched_ids, tuple(sensitive_words)
+    
     def _init_database(self):
         """初始化数据库"""
+        def create_schema(conn):
+            cursor = conn.cursor()
+            
+            # 过滤规则表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS filter_rules (
+                    id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    filter_type TEXT NOT NULL,
+                    pattern TEXT NOT NULL,
+                    action TEXT NOT NULL,
+                    risk_level TEXT NOT NULL,
+                    replacement TEXT DEFAULT '',
+                    enabled BOOLEAN DEFAULT 1,
+                    priority INTEGER DEFAULT 1,
+                    description TEXT DEFAULT '',
+                    created_by INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 审核记录表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS audit_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    original_text TEXT NOT NULL,
+                    filtered_text TEXT,
+                    action TEXT NOT NULL,
+                    risk_level TEXT NOT NULL,
+                    matched_rules TEXT,
+                    warnings TEXT,
+                    审核员_id INTEGER,
+                    审核_status TEXT DEFAULT 'pending',
+                    审核_notes TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    审核_at TIMESTAMP
+                )
+            ''')
+            
+            # 敏感词表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sensitive_words (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    word TEXT NOT NULL UNIQUE,
+                    category TEXT NOT NULL,
+                    severity INTEGER DEFAULT 1,
+                    replacement TEXT DEFAULT '***',
+                    enabled BOOLEAN DEFAULT 1,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建索引
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_filter_rules_type ON filter_rules(filter_type)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_filter_rules_enabled ON filter_rules(enabled)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_records_user ON audit_records(user_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_records_date ON audit_records(created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_sensitive_words_word ON sensitive_words(word)')
+        
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                # 过滤规则表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS filter_rules (
-                        id TEXT PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        filter_type TEXT NOT NULL,
-                        pattern TEXT NOT NULL,
-                        action TEXT NOT NULL,
-                        risk_level TEXT NOT NULL,
-                        replacement TEXT DEFAULT '',
-                        enabled BOOLEAN DEFAULT 1,
-                        priority INTEGER DEFAULT 1,
-                        description TEXT DEFAULT '',
-                        created_by INTEGER DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # 审核记录表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS audit_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        original_text TEXT NOT NULL,
-                        filtered_text TEXT,
-                        action TEXT NOT NULL,
-                        risk_level TEXT NOT NULL,
-                        matched_rules TEXT,
-                        warnings TEXT,
-                        审核员_id INTEGER,
-                        审核_status TEXT DEFAULT 'pending',
-                        审核_notes TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        审核_at TIMESTAMP
-                    )
-                ''')
-                
-                # 敏感词表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS sensitive_words (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        word TEXT NOT NULL UNIQUE,
-                        category TEXT NOT NULL,
-                        severity INTEGER DEFAULT 1,
-                        replacement TEXT DEFAULT '***',
-                        enabled BOOLEAN DEFAULT 1,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # 创建索引
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_filter_rules_type ON filter_rules(filter_type)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_filter_rules_enabled ON filter_rules(enabled)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_records_user ON audit_records(user_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_audit_records_date ON audit_records(created_at)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_sensitive_words_word ON sensitive_words(word)')
-                
-                conn.commit()
-                logger.info("内容过滤数据库初始化完成")
-                
+            self._db.migrate_sync([(1, create_schema)])
+            logger.info("内容过滤数据库初始化完成")
         except Exception as e:
             logger.error(f"初始化内容过滤数据库失败: {e}")
             raise
     
+    @staticmethod
+    def _fetch_rules(conn) -> List[FilterRule]:
+        """查询启用的过滤规则"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM filter_rules WHERE enabled = 1 ORDER BY priority DESC')
+        
+        rules = []
+        for row in cursor.fetchall():
+            columns = [desc[0] for desc in cursor.description]
+            data = dict(zip(columns, row))
+            
+            # 转换枚举值
+            data['filter_type'] = FilterType(data['filter_type'])
+            data['action'] = FilterAction(data['action'])
+            data['risk_level'] = RiskLevel(data['risk_level'])
+            
+            if data['created_at']:
+                data['created_at'] = datetime.fromisoformat(data['created_at'])
+            if data['updated_at']:
+                data['updated_at'] = datetime.fromisoformat(data['updated_at'])
+            
+            rules.append(FilterRule(**data))
+        
+        return rules
+    
+    def _set_rules(self, rules: List[FilterRule]):
+        """替换当前规则集"""
+        self.rules = rules
+        self._invalidate_rule_plan()
+        logger.info(f"加载了 {len(self.rules)} 条过滤规则")
+    
     def _load_rules(self):
-        """加载过滤规则"""
-        self.rules = []
+        """加载过滤规则（初始化时同步读取）"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM filter_rules WHERE enabled = 1 ORDER BY priority DESC')
-                
-                for row in cursor.fetchall():
-                    columns = [desc[0] for desc in cursor.description]
-                    data = dict(zip(columns, row))
-                    
-                    # 转换枚举值
-                    data['filter_type'] = FilterType(data['filter_type'])
-                    data['action'] = FilterAction(data['action'])
-                    data['risk_level'] = RiskLevel(data['risk_level'])
-                    
-                    if data['created_at']:
-                        data['created_at'] = datetime.fromisoformat(data['created_at'])
-                    if data['updated_at']:
-                        data['updated_at'] = datetime.fromisoformat(data['updated_at'])
-                    
-                    rule = FilterRule(**data)
-                    self.rules.append(rule)
-                    
-                logger.info(f"加载了 {len(self.rules)} 条过滤规则")
-                
+            self._set_rules(self._db.read_sync(self._fetch_rules))
+        except Exception as e:
+            logger.error(f"加载过滤规则失败: {e}")
+            self._set_rules([])
+    
+    async def _reload_rules(self):
+        """规则变更后重新加载（失败时保留当前规则）"""
+        try:
+            self._set_rules(await self._db.read(self._fetch_rules))
         except Exception as e:
             logger.error(f"加载过滤规则失败: {e}")
-            self.rules = []
     
     def _init_default_rules(self):
         """初始化默认过滤规则"""
@@ -274,228 +915,173 @@ class DanmakuContentFilter:
                 }
             ]
             
-            for rule_data in default_rules:
-                rule = FilterRule(**rule_data)
-                self.add_rule(rule)
+            def insert_defaults(conn):
+                for rule_data in default_rules:
+                    self._upsert_rule(conn, FilterRule(**rule_data))
+            
+            try:
+                self._db.write_sync(insert_defaults)
+                self._load_rules()
+                logger.info(f"已创建 {len(default_rules)} 条默认过滤规则")
+            except Exception as e:
+                logger.error(f"创建默认过滤规则失败: {e}")
+    
+    @staticmethod
+    def _fetch_sensitive_words(conn) -> Set[str]:
+        """查询启用的敏感词"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT word FROM sensitive_words WHERE enabled = 1')
+        return {row[0] for row in cursor.fetchall()}
+    
+    def _set_sensitive_words(self, words: Set[str]):
+        """替换当前敏感词库"""
+        self._sensitive_words = words
+        self._invalidate_rule_plan()
+        logger.info(f"加载了 {len(self._sensitive_words)} 个敏感词")
     
     def _load_sensitive_words(self):
-        """加载敏感词库"""
+        """加载敏感词库（初始化时同步读取）"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT word FROM sensitive_words WHERE enabled = 1')
-                
-                self._sensitive_words = {row[0] for row in cursor.fetchall()}
-                logger.info(f"加载了 {len(self._sensitive_words)} 个敏感词")
-                
+            self._set_sensitive_words(self._db.read_sync(self._fetch_sensitive_words))
         except Exception as e:
             logger.error(f"加载敏感词库失败: {e}")
             self._sensitive_words = set()
+            self._invalidate_rule_plan()
+    
+    async def _reload_sensitive_words(self):
+        """敏感词变更后重新加载（失败时保留当前词库）"""
+        try:
+            self._set_sensitive_words(await self._db.read(self._fetch_sensitive_words))
+        except Exception as e:
+            logger.error(f"加载敏感词库失败: {e}")
+    
+    @staticmethod
+    def _upsert_rule(conn, rule: FilterRule):
+        """写入或更新一条过滤规则"""
+        conn.execute('''
+            INSERT OR REPLACE INTO filter_rules (
+                id, name, filter_type, pattern, action, risk_level,
+                replacement, enabled, priority, description, created_by,
+                created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            rule.id, rule.name, rule.filter_type.value, rule.pattern,
+            rule.action.value, rule.risk_level.value, rule.replacement,
+            rule.enabled, rule.priority, rule.description, rule.created_by,
+            rule.created_at, rule.updated_at
+        ))
     
-    def add_rule(self, rule: FilterRule) -> bool:
+    async def add_rule(self, rule: FilterRule) -> bool:
         """添加过滤规则"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
+            await self._db.write(self._upsert_rule, rule)
                 
-                cursor.execute('''
-                    INSERT OR REPLACE INTO filter_rules (
-                        id, name, filter_type, pattern, action, risk_level,
-                        replacement, enabled, priority, description, created_by,
-                        created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    rule.id, rule.name, rule.filter_type.value, rule.pattern,
-                    rule.action.value, rule.risk_level.value, rule.replacement,
-                    rule.enabled, rule.priority, rule.description, rule.created_by,
-                    rule.created_at, rule.updated_at
-                ))
-                
-                conn.commit()
+            # 重新加载规则
+            await self._reload_rules()
                 
-                # 重新加载规则
-                self._load_rules()
-                
-                logger.info(f"添加过滤规则成功: {rule.name}")
-                return True
+            logger.info(f"添加过滤规则成功: {rule.name}")
+            return True
                 
         except Exception as e:
             logger.error(f"添加过滤规则失败: {e}")
             return False
     
-    def remove_rule(self, rule_id: str) -> bool:
+    async def remove_rule(self, rule_id: str) -> bool:
         """删除过滤规则"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM filter_rules WHERE id = ?', (rule_id,))
-                conn.commit()
+            await self._db.execute('DELETE FROM filter_rules WHERE id = ?', (rule_id,))
                 
-                # 重新加载规则
-                self._load_rules()
+            # 重新加载规则
+            await self._reload_rules()
                 
-                logger.info(f"删除过滤规则成功: {rule_id}")
-                return True
+            logger.info(f"删除过滤规则成功: {rule_id}")
+            return True
                 
         except Exception as e:
             logger.error(f"删除过滤规则失败: {e}")
             return False
     
-    def _check_length_limit(self, text: str, pattern: str) -> bool:
-        """检查长度限制"""
-        try:
-            max_length = int(pattern)
-            return len(text) > max_length
-        except ValueError:
-            return False
-    
-    def _check_rate_limit(self, user_id: int, pattern: str) -> bool:
-        """检查频率限制"""
-        try:
-            max_count, window_seconds = map(int, pattern.split(','))
-            current_time = datetime.now()
-            
-            # 清理过期记录
-            if user_id in self._rate_limit_cache:
-                self._rate_limit_cache[user_id] = [
-                    timestamp for timestamp in self._rate_limit_cache[user_id]
-                    if (current_time - timestamp).total_seconds() < window_seconds
-                ]
-            else:
-                self._rate_limit_cache[user_id] = []
-            
-            # 检查是否超过限制
-            if len(self._rate_limit_cache[user_id]) >= max_count:
-                return True
-            
-            # 记录本次请求
-            self._rate_limit_cache[user_id].append(current_time)
-            return False
-            
-        except (ValueError, IndexError):
-            return False
-    
-    def _check_keyword(self, text: str, pattern: str) -> bool:
-        """检查关键词"""
-        keywords = [kw.strip().lower() for kw in pattern.split(',')]
-        text_lower = text.lower()
-        
-        for keyword in keywords:
-            if keyword in text_lower:
-                return True
-        return False
-    
-    def _check_regex(self, text: str, pattern: str) -> bool:
-        """检查正则表达式"""
-        try:
-            if pattern not in self._regex_cache:
-                self._regex_cache[pattern] = re.compile(pattern, re.IGNORECASE)
-            
-            regex = self._regex_cache[pattern]
-            return bool(regex.search(text))
-            
-        except re.error as e:
-            logger.warning(f"正则表达式错误: {pattern} - {e}")
-            return False
-    
     def _check_sensitive_words(self, text: str) -> List[str]:
         """检查敏感词"""
-        found_words = []
-        text_lower = text.lower()
-        
-        for word in self._sensitive_words:
-            if word.lower() in text_lower:
-                found_words.append(word)
-        
-        return found_words
+        return self._scan_keywords(text)[1]
     
-    def _apply_replacement(self, text: str, rule: FilterRule) -> str:
-        """应用替换规则"""
-        if rule.filter_type == FilterType.KEYWORD:
-            keywords = [kw.strip() for kw in rule.pattern.split(',')]
-            for keyword in keywords:
-                text = re.sub(re.escape(keyword), rule.replacement, text, flags=re.IGNORECASE)
+    def _evaluate(self, texts: List[str], user_id: int) -> List[FilterResult]:
+        """按规则计划评估一批文本
         
-        elif rule.filter_type == FilterType.REGEX:
-            try:
-                if rule.pattern not in self._regex_cache:
-                    self._regex_cache[rule.pattern] = re.compile(rule.pattern, re.IGNORECASE)
-                
-                regex = self._regex_cache[rule.pattern]
-                text = regex.sub(rule.replacement, text)
-                
-            except re.error:
-                pass
-        
-        return text
-    
-    async def filter_content(self, text: str, user_id: int = 0) -> FilterResult:
-        """过滤弹幕内容"""
-        result = FilterResult(
-            original_text=text,
-            filtered_text=text
-        )
-        
-        highest_risk = RiskLevel.LOW
-        matched_rules = []
+        逐条规则遍历整批文本：无状态规则取缓存或一次性匹配的结果，频率限制规则对仍在
+        检查中的文本按顺序一次记账，与逐条调用 filter_content 的结果一致。
+        """
+        self._rate_limiter.ensure_started()
+        plan = self._get_rule_plan()
         
-        try:
-            # 按优先级检查规则
-            for rule in sorted(self.rules, key=lambda x: x.priority, reverse=True):
-                if not rule.enabled:
-                    continue
+        results = [FilterResult(original_text=text, filtered_text=text) for text in texts]
+        matches = [self._match_content(text, plan) for text in texts]
+        ranks = [0] * len(texts)
+        active = list(range(len(texts)))   # 尚未被阻止/审核规则终止检查的文本
+            
+        # 按优先级执行规则计划
+        for step in plan.steps:
+            if not active:
+                break
+            
+            if step.rate_limit is not None:
+                # 前 allowed 条放行，其余超限即命中该规则
+                allowed = self._rate_limiter.acquire(
+                    (user_id, *step.rate_limit), *step.rate_limit, len(active)
+                )
+                hits = active[allowed:]
+            else:
+                hits = [i for i in active if step.rule_id in matches[i][0]]
                 
-                is_matched = False
+            for i in hits:
+                result = results[i]
+                result.matched_rules.append(step.rule_id)
                 
-                # 根据规则类型进行检查
-                if rule.filter_type == FilterType.LENGTH:
-                    is_matched = self._check_length_limit(text, rule.pattern)
-                    
-                elif rule.filter_type == FilterType.RATE_LIMIT:
-                    is_matched = self._check_rate_limit(user_id, rule.pattern)
-                    
-                elif rule.filter_type == FilterType.KEYWORD:
-                    is_matched = self._check_keyword(text, rule.pattern)
-                    
-                elif rule.filter_type == FilterType.REGEX:
-                    is_matched = self._check_regex(text, rule.pattern)
+                # 更新风险等级
+                if step.risk_rank > ranks[i]:
+                    ranks[i] = step.risk_rank
+                    result.risk_level = step.risk_level
                 
-                if is_matched:
-                    matched_rules.append(rule.id)
-                    
-                    # 更新风险等级
-                    if rule.risk_level.value == 'critical' or highest_risk.value != 'critical':
-                        if rule.risk_level.value == 'high' or highest_risk.value not in ['critical', 'high']:
-                            if rule.risk_level.value == 'medium' or highest_risk.value == 'low':
-                                highest_risk = rule.risk_level
-                    
-                    # 执行相应动作
-                    if rule.action == FilterAction.BLOCK:
-                        result.is_blocked = True
-                        result.action = FilterAction.BLOCK
-                        break
-                        
-                    elif rule.action == FilterAction.REPLACE:
-                        result.filtered_text = self._apply_replacement(result.filtered_text, rule)
-                        result.action = FilterAction.REPLACE
-                        
-                    elif rule.action == FilterAction.WARNING:
-                        result.warnings.append(f"触发规则: {rule.name}")
-                        result.action = FilterAction.WARNING
-                        
-                    elif rule.action == FilterAction.REVIEW:
-                        result.action = FilterAction.REVIEW
-                        break
-            
-            # 检查敏感词
-            sensitive_words = self._check_sensitive_words(text)
+                # 执行相应动作
+                if step.replace_regex is not None:
+                    result.filtered_text = step.replace_regex.sub(step.replacement, result.filtered_text)
+                if step.warning:
+                    result.warnings.append(step.warning)
+                if step.action is not None:
+                    result.action = step.action
+                if step.is_blocking:
+                    result.is_blocked = True
+            
+            if step.stops and hits:
+                stopped = set(hits)
+                active = [i for i in active if i not in stopped]
+        
+        # 检查敏感词
+        for i, result in enumerate(results):
+            sensitive_words = matches[i][1]
             if sensitive_words:
                 result.warnings.extend([f"包含敏感词: {word}" for word in sensitive_words])
-                if highest_risk == RiskLevel.LOW:
-                    highest_risk = RiskLevel.MEDIUM
+                if ranks[i] == 0:
+                    result.risk_level = RiskLevel.MEDIUM
             
-            result.risk_level = highest_risk
-            result.matched_rules = matched_rules
+        return results
+    
+    @staticmethod
+    def _error_result(text: str) -> FilterResult:
+        """过滤出错时采用保守策略"""
+        return FilterResult(
+            is_blocked=True,
+            action=FilterAction.REVIEW,
+            risk_level=RiskLevel.HIGH,
+            original_text=text,
+            filtered_text=text,
+            warnings=["过滤系统错误，需要人工审核"]
+        )
+    
+    async def filter_content(self, text: str, user_id: int = 0) -> FilterResult:
+        """过滤弹幕内容"""
+        try:
+            result = self._evaluate([text], user_id)[0]
             
             # 记录审核日志
             await self._log_audit_record(user_id, result)
@@ -504,180 +1090,179 @@ class DanmakuContentFilter:
             
         except Exception as e:
             logger.error(f"内容过滤失败: {e}")
-            # 出错时采用保守策略
-            return FilterResult(
-                is_blocked=True,
-                action=FilterAction.REVIEW,
-                risk_level=RiskLevel.HIGH,
-                original_text=text,
-                filtered_text=text,
-                warnings=["过滤系统错误，需要人工审核"]
-            )
+            return self._error_result(text)
+    
+    async def filter_many(self, texts: List[str], user_id: int = 0) -> List[FilterResult]:
+        """批量过滤弹幕内容，按输入顺序返回结果，审核记录在一个事务中写入"""
+        if not texts:
+            return []
+        
+        try:
+            results = self._evaluate(texts, user_id)
+        except Exception as e:
+            logger.error(f"批量内容过滤失败: {e}")
+            return [self._error_result(text) for text in texts]
+        
+        try:
+            await self._audit_sink.write_many(user_id, results)
+        except Exception as e:
+            logger.error(f"记录审核日志失败: {e}")
+        
+        return results
     
     async def _log_audit_record(self, user_id: int, result: FilterResult):
-        """记录审核日志"""
+        """记录审核日志（交给后台批量写入）"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO audit_records (
-                        user_id, original_text, filtered_text, action, risk_level,
-                        matched_rules, warnings, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    user_id, result.original_text, result.filtered_text,
-                    result.action.value, result.risk_level.value,
-                    json.dumps(result.matched_rules), json.dumps(result.warnings),
-                    datetime.now()
-                ))
-                
-                conn.commit()
-                
+            await self._audit_sink.submit(user_id, result)
         except Exception as e:
             logger.error(f"记录审核日志失败: {e}")
     
-    def get_audit_records(self, user_id: Optional[int] = None, days: int = 7) -> List[Dict[str, Any]]:
+    async def flush_audit_records(self):
+        """立即写入缓冲中的审核记录"""
+        await self._audit_sink.flush()
+    
+    async def close(self):
+        """关闭过滤器，写入剩余审核记录"""
+        await self._rate_limiter.stop()
+        await self._audit_sink.close()
+    
+    async def get_audit_records(self, user_id: Optional[int] = None, days: int = 7) -> List[Dict[str, Any]]:
         """获取审核记录"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=days)
-                
-                if user_id:
-                    cursor.execute('''
-                        SELECT * FROM audit_records 
-                        WHERE user_id = ? AND created_at BETWEEN ? AND ?
-                        ORDER BY created_at DESC
-                    ''', (user_id, start_date, end_date))
-                else:
-                    cursor.execute('''
-                        SELECT * FROM audit_records 
-                        WHERE created_at BETWEEN ? AND ?
-                        ORDER BY created_at DESC
-                        LIMIT 100
-                    ''', (start_date, end_date))
-                
-                columns = [desc[0] for desc in cursor.description]
-                records = []
-                
-                for row in cursor.fetchall():
-                    record = dict(zip(columns, row))
-                    
-                    # 解析 JSON 字段
-                    if record['matched_rules']:
-                        record['matched_rules'] = json.loads(record['matched_rules'])
-                    if record['warnings']:
-                        record['warnings'] = json.loads(record['warnings'])
-                    
-                    records.append(record)
+        def query(conn):
+            cursor = conn.cursor()
+            
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days)
+            
+            if user_id:
+                cursor.execute('''
+                    SELECT * FROM audit_records 
+                    WHERE user_id = ? AND created_at BETWEEN ? AND ?
+                    ORDER BY created_at DESC
+                ''', (user_id, start_date, end_date))
+            else:
+                cursor.execute('''
+                    SELECT * FROM audit_records 
+                    WHERE created_at BETWEEN ? AND ?
+                    ORDER BY created_at DESC
+                    LIMIT 100
+                ''', (start_date, end_date))
+            
+            columns = [desc[0] for desc in cursor.description]
+            records = []
+            
+            for row in cursor.fetchall():
+                record = dict(zip(columns, row))
                 
-                return records
+                # 解析 JSON 字段
+                if record['matched_rules']:
+                    record['matched_rules'] = json.loads(record['matched_rules'])
+                if record['warnings']:
+                    record['warnings'] = json.loads(record['warnings'])
                 
+                records.append(record)
+            
+            return records
+        
+        try:
+            return await self._db.read(query)
         except Exception as e:
             logger.error(f"获取审核记录失败: {e}")
             return []
     
-    def get_filter_statistics(self, days: int = 7) -> Dict[str, Any]:
+    async def get_filter_statistics(self, days: int = 7) -> Dict[str, Any]:
         """获取过滤统计信息"""
+        def query(conn):
+            cursor = conn.cursor()
+            
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days)
+            
+            # 总体统计
+            cursor.execute('''
+                SELECT 
+                    COUNT(*) as total_processed,
+                    SUM(CASE WHEN action = 'block' THEN 1 ELSE 0 END) as blocked,
+                    SUM(CASE WHEN action = 'warning' THEN 1 ELSE 0 END) as warned,
+                    SUM(CASE WHEN action = 'replace' THEN 1 ELSE 0 END) as replaced,
+                    SUM(CASE WHEN action = 'review' THEN 1 ELSE 0 END) as needs_review
+                FROM audit_records
+                WHERE created_at BETWEEN ? AND ?
+            ''', (start_date, end_date))
+            
+            stats = cursor.fetchone()
+            
+            # 风险等级分布
+            cursor.execute('''
+                SELECT risk_level, COUNT(*) 
+                FROM audit_records
+                WHERE created_at BETWEEN ? AND ?
+                GROUP BY risk_level
+            ''', (start_date, end_date))
+            
+            risk_distribution = dict(cursor.fetchall())
+            
+            # 最活跃用户
+            cursor.execute('''
+                SELECT user_id, COUNT(*) as count
+                FROM audit_records
+                WHERE created_at BETWEEN ? AND ?
+                GROUP BY user_id
+                ORDER BY count DESC
+                LIMIT 10
+            ''', (start_date, end_date))
+            
+            top_users = cursor.fetchall()
+            
+            return {
+                'period_days': days,
+                'total_processed': stats[0] or 0,
+                'blocked': stats[1] or 0,
+                'warned': stats[2] or 0,
+                'replaced': stats[3] or 0,
+                'needs_review': stats[4] or 0,
+                'risk_distribution': risk_distribution,
+                'top_users': [{'user_id': uid, 'count': count} for uid, count in top_users],
+                'active_rules': len(self.rules),
+                'sensitive_words_count': len(self._sensitive_words),
+                'rate_limiter': self._rate_limiter.get_stats(),
+                'verdict_cache': self._verdict_cache.get_stats()
+            }
+        
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=days)
-                
-                # 总体统计
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_processed,
-                        SUM(CASE WHEN action = 'block' THEN 1 ELSE 0 END) as blocked,
-                        SUM(CASE WHEN action = 'warning' THEN 1 ELSE 0 END) as warned,
-                        SUM(CASE WHEN action = 'replace' THEN 1 ELSE 0 END) as replaced,
-                        SUM(CASE WHEN action = 'review' THEN 1 ELSE 0 END) as needs_review
-                    FROM audit_records
-                    WHERE created_at BETWEEN ? AND ?
-                ''', (start_date, end_date))
-                
-                stats = cursor.fetchone()
-                
-                # 风险等级分布
-                cursor.execute('''
-                    SELECT risk_level, COUNT(*) 
-                    FROM audit_records
-                    WHERE created_at BETWEEN ? AND ?
-                    GROUP BY risk_level
-                ''', (start_date, end_date))
-                
-                risk_distribution = dict(cursor.fetchall())
-                
-                # 最活跃用户
-                cursor.execute('''
-                    SELECT user_id, COUNT(*) as count
-                    FROM audit_records
-                    WHERE created_at BETWEEN ? AND ?
-                    GROUP BY user_id
-                    ORDER BY count DESC
-                    LIMIT 10
-                ''', (start_date, end_date))
-                
-                top_users = cursor.fetchall()
-                
-                return {
-                    'period_days': days,
-                    'total_processed': stats[0] or 0,
-                    'blocked': stats[1] or 0,
-                    'warned': stats[2] or 0,
-                    'replaced': stats[3] or 0,
-                    'needs_review': stats[4] or 0,
-                    'risk_distribution': risk_distribution,
-                    'top_users': [{'user_id': uid, 'count': count} for uid, count in top_users],
-                    'active_rules': len(self.rules),
-                    'sensitive_words_count': len(self._sensitive_words)
-                }
-                
+            return await self._db.read(query)
         except Exception as e:
             logger.error(f"获取过滤统计失败: {e}")
             return {}
     
-    def add_sensitive_word(self, word: str, category: str = "general", severity: int = 1) -> bool:
+    async def add_sensitive_word(self, word: str, category: str = "general", severity: int = 1) -> bool:
         """添加敏感词"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT OR IGNORE INTO sensitive_words (word, category, severity)
-                    VALUES (?, ?, ?)
-                ''', (word, category, severity))
-                
-                conn.commit()
+            await self._db.execute('''
+                INSERT OR IGNORE INTO sensitive_words (word, category, severity)
+                VALUES (?, ?, ?)
+            ''', (word, category, severity))
                 
-                # 重新加载敏感词
-                self._load_sensitive_words()
+            # 重新加载敏感词
+            await self._reload_sensitive_words()
                 
-                logger.info(f"添加敏感词成功: {word}")
-                return True
+            logger.info(f"添加敏感词成功: {word}")
+            return True
                 
         except Exception as e:
             logger.error(f"添加敏感词失败: {e}")
             return False
     
-    def remove_sensitive_word(self, word: str) -> bool:
+    async def remove_sensitive_word(self, word: str) -> bool:
         """删除敏感词"""
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM sensitive_words WHERE word = ?', (word,))
-                conn.commit()
+            await self._db.execute('DELETE FROM sensitive_words WHERE word = ?', (word,))
                 
-                # 重新加载敏感词
-                self._load_sensitive_words()
+            # 重新加载敏感词
+            await self._reload_sensitive_words()
                 
-                logger.info(f"删除敏感词成功: {word}")
-                return True
+            logger.info(f"删除敏感词成功: {word}")
+            return True
                 
         except Exception as e:
             logger.error(f"删除敏感词失败: {e}")
@@ -686,7 +1271,8 @@ class DanmakuContentFilter:
     def clear_cache(self):
         """清理缓存"""
         self._regex_cache.clear()
-        self._rate_limit_cache.clear()
+        self._rate_limiter.clear()
+        self._verdict_cache.clear()
         logger.info("已清理过滤器缓存")
 
 
@@ -1,5 +1,4 @@
 import json
-import sqlite3
 from datetime import datetime
 from typing import Dict, Any, Optional, Union
 from pathlib import Path
@@ -7,6 +6,8 @@ from loguru import logger
 from dataclasses import dataclass, asdict
 from enum import Enum
 
+from .storage import storage
+
 
 class NotificationLevel(Enum):
     """通知级别"""
@@ -97,53 +98,53 @@ class UserPreferencesManager:
     def __init__(self, db_file: str = "data/user_preferences.db"):
         self.db_file = Path(db_file)
         self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._db = storage.open(self.db_file)
         self._init_database()
         self._cache = {}  # 内存缓存
         self._cache_timeout = 300  # 5分钟缓存
     
     def _init_database(self):
         """初始化数据库"""
+        def create_schema(conn):
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_preferences (
+                    user_id INTEGER PRIMARY KEY,
+                    default_color TEXT DEFAULT '#FFFFFF',
+                    default_position TEXT DEFAULT 'scroll',
+                    default_font_size INTEGER DEFAULT 24,
+                    default_duration INTEGER DEFAULT 5,
+                    favorite_templates TEXT DEFAULT '[]',
+                    theme TEXT DEFAULT 'default',
+                    language TEXT DEFAULT 'zh-CN',
+                    notification_level TEXT DEFAULT 'important',
+                    auto_refresh_status BOOLEAN DEFAULT 1,
+                    show_statistics BOOLEAN DEFAULT 1,
+                    auto_start_queue BOOLEAN DEFAULT 0,
+                    default_priority INTEGER DEFAULT 3,
+                    batch_send_interval REAL DEFAULT 1.0,
+                    max_queue_size INTEGER DEFAULT 100,
+                    enable_cache BOOLEAN DEFAULT 1,
+                    log_operations BOOLEAN DEFAULT 1,
+                    share_statistics BOOLEAN DEFAULT 0,
+                    auto_backup BOOLEAN DEFAULT 1,
+                    session_timeout INTEGER DEFAULT 3600,
+                    api_timeout INTEGER DEFAULT 30,
+                    retry_attempts INTEGER DEFAULT 3,
+                    rate_limit INTEGER DEFAULT 10,
+                    debug_mode BOOLEAN DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 创建索引
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_preferences_user_id ON user_preferences(user_id)')
+        
         try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_preferences (
-                        user_id INTEGER PRIMARY KEY,
-                        default_color TEXT DEFAULT '#FFFFFF',
-                        default_position TEXT DEFAULT 'scroll',
-                        default_font_size INTEGER DEFAULT 24,
-                        default_duration INTEGER DEFAULT 5,
-                        favorite_templates TEXT DEFAULT '[]',
-                        theme TEXT DEFAULT 'default',
-                        language TEXT DEFAULT 'zh-CN',
-                        notification_level TEXT DEFAULT 'important',
-                        auto_refresh_status BOOLEAN DEFAULT 1,
-                        show_statistics BOOLEAN DEFAULT 1,
-                        auto_start_queue BOOLEAN DEFAULT 0,
-                        default_priority INTEGER DEFAULT 3,
-                        batch_send_interval REAL DEFAULT 1.0,
-                        max_queue_size INTEGER DEFAULT 100,
-                        enable_cache BOOLEAN DEFAULT 1,
-                        log_operations BOOLEAN DEFAULT 1,
-                        share_statistics BOOLEAN DEFAULT 0,
-                        auto_backup BOOLEAN DEFAULT 1,
-                        session_timeout INTEGER DEFAULT 3600,
-                        api_timeout INTEGER DEFAULT 30,
-                        retry_attempts INTEGER DEFAULT 3,
-                        rate_limit INTEGER DEFAULT 10,
-                        debug_mode BOOLEAN DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # 创建索引
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_preferences_user_id ON user_preferences(user_id)')
-                
-                conn.commit()
-                logger.info("用户偏好设置数据库初始化完成")
-                
+            self._db.migrate_sync([(1, create_schema)])
+            logger.info("用户偏好设置数据库初始化完成")
         except Exception as e:
             logger.error(f"初始化用户偏好设置数据库失败: {e}")
             raise
@@ -163,4 +164,258 @@ class UserPreferencesManager:
     def _get_from_cache(self, user_id: int) -> Optional[UserPreferences]:
         """从缓存获取数据"""
         cache_key = self._get_cache_key(user_id)
-        if cache_key in self._cache:\n            cached_item = self._cache[cache_key]\n            if (datetime.now() - cached_item['timestamp']).seconds < self._cache_timeout:\n                return cached_item['data']\n            else:\n                del self._cache[cache_key]\n        return None\n    \n    def _clear_cache(self, user_id: Optional[int] = None):\n        \"\"\"清理缓存\"\"\"\n        if user_id:\n            cache_key = self._get_cache_key(user_id)\n            self._cache.pop(cache_key, None)\n        else:\n            self._cache.clear()\n    \n    def get_user_preferences(self, user_id: int) -> UserPreferences:\n        \"\"\"获取用户偏好设置\"\"\"\n        # 首先检查缓存\n        cached_prefs = self._get_from_cache(user_id)\n        if cached_prefs:\n            return cached_prefs\n        \n        try:\n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                cursor.execute('SELECT * FROM user_preferences WHERE user_id = ?', (user_id,))\n                row = cursor.fetchone()\n                \n                if row:\n                    # 将数据库行转换为字典\n                    columns = [desc[0] for desc in cursor.description]\n                    data = dict(zip(columns, row))\n                    \n                    # 特殊处理 JSON 字段\n                    if 'favorite_templates' in data:\n                        data['favorite_templates'] = json.loads(data['favorite_templates'])\n                    \n                    preferences = UserPreferences.from_dict(data)\n                else:\n                    # 如果用户不存在，创建默认偏好设置\n                    preferences = UserPreferences(user_id=user_id)\n                    self.save_user_preferences(preferences)\n                \n                # 设置缓存\n                self._set_cache(user_id, preferences)\n                return preferences\n                \n        except Exception as e:\n            logger.error(f\"获取用户偏好设置失败: {e}\")\n            # 返回默认设置\n            return UserPreferences(user_id=user_id)\n    \n    def save_user_preferences(self, preferences: UserPreferences) -> bool:\n        \"\"\"保存用户偏好设置\"\"\"\n        try:\n            preferences.updated_at = datetime.now()\n            \n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                # 准备数据\n                favorite_templates_json = json.dumps(preferences.favorite_templates)\n                \n                cursor.execute('''\n                    INSERT OR REPLACE INTO user_preferences (\n                        user_id, default_color, default_position, default_font_size,\n                        default_duration, favorite_templates, theme, language,\n                        notification_level, auto_refresh_status, show_statistics,\n                        auto_start_queue, default_priority, batch_send_interval,\n                        max_queue_size, enable_cache, log_operations, share_statistics,\n                        auto_backup, session_timeout, api_timeout, retry_attempts,\n                        rate_limit, debug_mode, created_at, updated_at\n                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)\n                ''', (\n                    preferences.user_id, preferences.default_color, preferences.default_position,\n                    preferences.default_font_size, preferences.default_duration, favorite_templates_json,\n                    preferences.theme, preferences.language, preferences.notification_level,\n                    preferences.auto_refresh_status, preferences.show_statistics,\n                    preferences.auto_start_queue, preferences.default_priority,\n                    preferences.batch_send_interval, preferences.max_queue_size,\n                    preferences.enable_cache, preferences.log_operations,\n                    preferences.share_statistics, preferences.auto_backup,\n                    preferences.session_timeout, preferences.api_timeout,\n                    preferences.retry_attempts, preferences.rate_limit,\n                    preferences.debug_mode, preferences.created_at, preferences.updated_at\n                ))\n                \n                conn.commit()\n                \n                # 更新缓存\n                self._set_cache(preferences.user_id, preferences)\n                \n                logger.debug(f\"保存用户 {preferences.user_id} 的偏好设置成功\")\n                return True\n                \n        except Exception as e:\n            logger.error(f\"保存用户偏好设置失败: {e}\")\n            return False\n    \n    def update_preference(self, user_id: int, key: str, value: Any) -> bool:\n        \"\"\"更新单个偏好设置\"\"\"\n        try:\n            preferences = self.get_user_preferences(user_id)\n            \n            if hasattr(preferences, key):\n                setattr(preferences, key, value)\n                return self.save_user_preferences(preferences)\n            else:\n                logger.warning(f\"未知的偏好设置键: {key}\")\n                return False\n                \n        except Exception as e:\n            logger.error(f\"更新偏好设置失败: {e}\")\n            return False\n    \n    def add_favorite_template(self, user_id: int, template_name: str) -> bool:\n        \"\"\"添加收藏模板\"\"\"\n        try:\n            preferences = self.get_user_preferences(user_id)\n            \n            if template_name not in preferences.favorite_templates:\n                preferences.favorite_templates.append(template_name)\n                return self.save_user_preferences(preferences)\n            \n            return True  # 已存在，认为成功\n            \n        except Exception as e:\n            logger.error(f\"添加收藏模板失败: {e}\")\n            return False\n    \n    def remove_favorite_template(self, user_id: int, template_name: str) -> bool:\n        \"\"\"移除收藏模板\"\"\"\n        try:\n            preferences = self.get_user_preferences(user_id)\n            \n            if template_name in preferences.favorite_templates:\n                preferences.favorite_templates.remove(template_name)\n                return self.save_user_preferences(preferences)\n            \n            return True  # 不存在，认为成功\n            \n        except Exception as e:\n            logger.error(f\"移除收藏模板失败: {e}\")\n            return False\n    \n    def reset_user_preferences(self, user_id: int) -> bool:\n        \"\"\"重置用户偏好设置为默认值\"\"\"\n        try:\n            default_prefs = UserPreferences(user_id=user_id)\n            result = self.save_user_preferences(default_prefs)\n            \n            if result:\n                self._clear_cache(user_id)\n                logger.info(f\"重置用户 {user_id} 的偏好设置为默认值\")\n            \n            return result\n            \n        except Exception as e:\n            logger.error(f\"重置用户偏好设置失败: {e}\")\n            return False\n    \n    def export_preferences(self, user_id: int, file_path: str) -> bool:\n        \"\"\"导出用户偏好设置\"\"\"\n        try:\n            preferences = self.get_user_preferences(user_id)\n            data = preferences.to_dict()\n            \n            with open(file_path, 'w', encoding='utf-8') as f:\n                json.dump(data, f, ensure_ascii=False, indent=2)\n            \n            logger.info(f\"导出用户 {user_id} 的偏好设置到 {file_path}\")\n            return True\n            \n        except Exception as e:\n            logger.error(f\"导出偏好设置失败: {e}\")\n            return False\n    \n    def import_preferences(self, user_id: int, file_path: str) -> bool:\n        \"\"\"导入用户偏好设置\"\"\"\n        try:\n            with open(file_path, 'r', encoding='utf-8') as f:\n                data = json.load(f)\n            \n            # 确保 user_id 正确\n            data['user_id'] = user_id\n            \n            preferences = UserPreferences.from_dict(data)\n            result = self.save_user_preferences(preferences)\n            \n            if result:\n                logger.info(f\"导入用户 {user_id} 的偏好设置从 {file_path}\")\n            \n            return result\n            \n        except Exception as e:\n            logger.error(f\"导入偏好设置失败: {e}\")\n            return False\n    \n    def get_statistics(self) -> Dict[str, Any]:\n        \"\"\"获取偏好设置统计信息\"\"\"\n        try:\n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                # 基础统计\n                cursor.execute('SELECT COUNT(*) FROM user_preferences')\n                total_users = cursor.fetchone()[0]\n                \n                # 主题分布\n                cursor.execute('SELECT theme, COUNT(*) FROM user_preferences GROUP BY theme')\n                theme_distribution = dict(cursor.fetchall())\n                \n                # 语言分布\n                cursor.execute('SELECT language, COUNT(*) FROM user_preferences GROUP BY language')\n                language_distribution = dict(cursor.fetchall())\n                \n                # 通知级别分布\n                cursor.execute('SELECT notification_level, COUNT(*) FROM user_preferences GROUP BY notification_level')\n                notification_distribution = dict(cursor.fetchall())\n                \n                return {\n                    'total_users': total_users,\n                    'theme_distribution': theme_distribution,\n                    'language_distribution': language_distribution,\n                    'notification_distribution': notification_distribution,\n                    'cache_size': len(self._cache)\n                }\n                \n        except Exception as e:\n            logger.error(f\"获取偏好设置统计失败: {e}\")\n            return {}\n    \n    def cleanup_cache(self):\n        \"\"\"清理过期缓存\"\"\"\n        current_time = datetime.now()\n        expired_keys = []\n        \n        for key, cached_item in self._cache.items():\n            if (current_time - cached_item['timestamp']).seconds >= self._cache_timeout:\n                expired_keys.append(key)\n        \n        for key in expired_keys:\n            del self._cache[key]\n        \n        if expired_keys:\n            logger.debug(f\"清理了 {len(expired_keys)} 个过期缓存项\")\n\n\n# 全局偏好设置管理器实例\nuser_prefs_manager = UserPreferencesManager()
\ No newline at end of file
+        if cache_key in self._cache:
+            cached_item = self._cache[cache_key]
+            if (datetime.now() - cached_item['timestamp']).seconds < self._cache_timeout:
+                return cached_item['data']
+            else:
+                del self._cache[cache_key]
+        return None
+    
+    def _clear_cache(self, user_id: Optional[int] = None):
+        """清理缓存"""
+        if user_id:
+            cache_key = self._get_cache_key(user_id)
+            self._cache.pop(cache_key, None)
+        else:
+            self._cache.clear()
+    
+    @staticmethod
+    def _fetch_preferences(conn, user_id: int) -> Optional[UserPreferences]:
+        """查询用户偏好设置，不存在时返回 None"""
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM user_preferences WHERE user_id = ?', (user_id,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        # 将数据库行转换为字典
+        columns = [desc[0] for desc in cursor.description]
+        data = dict(zip(columns, row))
+        
+        # 特殊处理 JSON 字段
+        if 'favorite_templates' in data:
+            data['favorite_templates'] = json.loads(data['favorite_templates'])
+        
+        return UserPreferences.from_dict(data)
+    
+    async def get_user_preferences(self, user_id: int) -> UserPreferences:
+        """获取用户偏好设置"""
+        # 首先检查缓存
+        cached_prefs = self._get_from_cache(user_id)
+        if cached_prefs:
+            return cached_prefs
+        
+        try:
+            preferences = await self._db.read(self._fetch_preferences, user_id)
+            
+            if preferences is None:
+                # 如果用户不存在，创建默认偏好设置
+                preferences = UserPreferences(user_id=user_id)
+                await self.save_user_preferences(preferences)
+            
+            # 设置缓存
+            self._set_cache(user_id, preferences)
+            return preferences
+        
+        except Exception as e:
+            logger.error(f"获取用户偏好设置失败: {e}")
+            # 返回默认设置
+            return UserPreferences(user_id=user_id)
+    
+    async def save_user_preferences(self, preferences: UserPreferences) -> bool:
+        """保存用户偏好设置"""
+        try:
+            preferences.updated_at = datetime.now()
+            
+            # 准备数据
+            favorite_templates_json = json.dumps(preferences.favorite_templates)
+            
+            await self._db.execute('''
+                INSERT OR REPLACE INTO user_preferences (
+                    user_id, default_color, default_position, default_font_size,
+                    default_duration, favorite_templates, theme, language,
+                    notification_level, auto_refresh_status, show_statistics,
+                    auto_start_queue, default_priority, batch_send_interval,
+                    max_queue_size, enable_cache, log_operations, share_statistics,
+                    auto_backup, session_timeout, api_timeout, retry_attempts,
+                    rate_limit, debug_mode, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                preferences.user_id, preferences.default_color, preferences.default_position,
+                preferences.default_font_size, preferences.default_duration, favorite_templates_json,
+                preferences.theme, preferences.language, preferences.notification_level,
+                preferences.auto_refresh_status, preferences.show_statistics,
+                preferences.auto_start_queue, preferences.default_priority,
+                preferences.batch_send_interval, preferences.max_queue_size,
+                preferences.enable_cache, preferences.log_operations,
+                preferences.share_statistics, preferences.auto_backup,
+                preferences.session_timeout, preferences.api_timeout,
+                preferences.retry_attempts, preferences.rate_limit,
+                preferences.debug_mode, preferences.created_at, preferences.updated_at
+            ))
+            
+            # 更新缓存
+            self._set_cache(preferences.user_id, preferences)
+            
+            logger.debug(f"保存用户 {preferences.user_id} 的偏好设置成功")
+            return True
+        
+        except Exception as e:
+            logger.error(f"保存用户偏好设置失败: {e}")
+            return False
+    
+    async def update_preference(self, user_id: int, key: str, value: Any) -> bool:
+        """更新单个偏好设置"""
+        try:
+            preferences = await self.get_user_preferences(user_id)
+            
+            if hasattr(preferences, key):
+                setattr(preferences, key, value)
+                return await self.save_user_preferences(preferences)
+            else:
+                logger.warning(f"未知的偏好设置键: {key}")
+                return False
+        
+        except Exception as e:
+            logger.error(f"更新偏好设置失败: {e}")
+            return False
+    
+    async def add_favorite_template(self, user_id: int, template_name: str) -> bool:
+        """添加收藏模板"""
+        try:
+            preferences = await self.get_user_preferences(user_id)
+            
+            if template_name not in preferences.favorite_templates:
+                preferences.favorite_templates.append(template_name)
+                return await self.save_user_preferences(preferences)
+            
+            return True  # 已存在，认为成功
+        
+        except Exception as e:
+            logger.error(f"添加收藏模板失败: {e}")
+            return False
+    
+    async def remove_favorite_template(self, user_id: int, template_name: str) -> bool:
+        """移除收藏模板"""
+        try:
+            preferences = await self.get_user_preferences(user_id)
+            
+            if template_name in preferences.favorite_templates:
+                preferences.favorite_templates.remove(template_name)
+                return await self.save_user_preferences(preferences)
+            
+            return True  # 不存在，认为成功
+        
+        except Exception as e:
+            logger.error(f"移除收藏模板失败: {e}")
+            return False
+    
+    async def reset_user_preferences(self, user_id: int) -> bool:
+        """重置用户偏好设置为默认值"""
+        try:
+            default_prefs = UserPreferences(user_id=user_id)
+            result = await self.save_user_preferences(default_prefs)
+            
+            if result:
+                self._clear_cache(user_id)
+                logger.info(f"重置用户 {user_id} 的偏好设置为默认值")
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"重置用户偏好设置失败: {e}")
+            return False
+    
+    async def export_preferences(self, user_id: int, file_path: str) -> bool:
+        """导出用户偏好设置"""
+        try:
+            preferences = await self.get_user_preferences(user_id)
+            data = preferences.to_dict()
+            
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            
+            logger.info(f"导出用户 {user_id} 的偏好设置到 {file_path}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"导出偏好设置失败: {e}")
+            return False
+    
+    async def import_preferences(self, user_id: int, file_path: str) -> bool:
+        """导入用户偏好设置"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            # 确保 user_id 正确
+            data['user_id'] = user_id
+            
+            preferences = UserPreferences.from_dict(data)
+            result = await self.save_user_preferences(preferences)
+            
+            if result:
+                logger.info(f"导入用户 {user_id} 的偏好设置从 {file_path}")
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"导入偏好设置失败: {e}")
+            return False
+    
+    async def get_statistics(self) -> Dict[str, Any]:
+        """获取偏好设置统计信息"""
+        def query(conn):
+            cursor = conn.cursor()
+            
+            # 基础统计
+            cursor.execute('SELECT COUNT(*) FROM user_preferences')
+            total_users = cursor.fetchone()[0]
+            
+            # 主题分布
+            cursor.execute('SELECT theme, COUNT(*) FROM user_preferences GROUP BY theme')
+            theme_distribution = dict(cursor.fetchall())
+            
+            # 语言分布
+            cursor.execute('SELECT language, COUNT(*) FROM user_preferences GROUP BY language')
+            language_distribution = dict(cursor.fetchall())
+            
+            # 通知级别分布
+            cursor.execute('SELECT notification_level, COUNT(*) FROM user_preferences GROUP BY notification_level')
+            notification_distribution = dict(cursor.fetchall())
+            
+            return {
+                'total_users': total_users,
+                'theme_distribution': theme_distribution,
+                'language_distribution': language_distribution,
+                'notification_distribution': notification_distribution,
+                'cache_size': len(self._cache)
+            }
+        
+        try:
+            return await self._db.read(query)
+        except Exception as e:
+            logger.error(f"获取偏好设置统计失败: {e}")
+            return {}
+    
+    def cleanup_cache(self):
+        """清理过期缓存"""
+        current_time = datetime.now()
+        expired_keys = []
+        
+        for key, cached_item in self._cache.items():
+            if (current_time - cached_item['timestamp']).seconds >= self._cache_timeout:
+                expired_keys.append(key)
+        
+        for key in expired_keys:
+            del self._cache[key]
+        
+        if expired_keys:
+            logger.debug(f"清理了 {len(expired_keys)} 个过期缓存项")
+
+
+# 全局偏好设置管理器实例
+user_prefs_manager = UserPreferencesManager()
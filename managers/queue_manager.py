@@ -1,5 +1,10 @@
 import asyncio
+import heapq
+import itertools
 import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
@@ -67,15 +72,201 @@ class DanmakuMessage:
         return cls(**data)
 
 
+class DanmakuScheduler:
+    """弹幕调度器
+    
+    由三部分组成：就绪消息的优先级堆（高优先级、先入队者优先）、
+    延迟消息按到期时间排序的最小堆，以及 ID -> 消息 的索引。
+    入队、出队和移除均为 O(log n)，被移除或重新调度的堆条目延迟清理。
+    """
+    
+    def __init__(self):
+        self._messages: Dict[str, DanmakuMessage] = {}
+        self._ready: List[Tuple[int, int, str]] = []       # (-优先级, 序号, ID)
+        self._delayed: List[Tuple[float, int, str]] = []   # (到期时间戳, 序号, ID)
+        self._tokens: Dict[str, int] = {}                  # 已调度消息 ID -> 当前有效序号
+        self._counter = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self._messages)
+    
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._messages
+    
+    def get(self, message_id: str) -> Optional[DanmakuMessage]:
+        """按 ID 获取消息"""
+        return self._messages.get(message_id)
+    
+    def messages(self) -> List[DanmakuMessage]:
+        """所有消息（按入队顺序）"""
+        return list(self._messages.values())
+    
+    @property
+    def scheduled_count(self) -> int:
+        """等待发送的消息数"""
+        return len(self._tokens)
+    
+    def add(self, message: DanmakuMessage):
+        """加入索引，待发送的消息同时进入调度"""
+        self._messages[message.id] = message
+        if message.status == DanmakuStatus.PENDING:
+            self.schedule(message)
+    
+    def schedule(self, message: DanmakuMessage):
+        """（重新）调度一条待发送消息"""
+        seq = next(self._counter)
+        self._tokens[message.id] = seq
+        
+        due = self._due_time(message)
+        if due > time.time():
+            heapq.heappush(self._delayed, (due, seq, message.id))
+        else:
+            heapq.heappush(self._ready, (-message.priority, seq, message.id))
+        
+        self._maybe_compact()
+    
+    @staticmethod
+    def _due_time(message: DanmakuMessage) -> float:
+        """消息的最早发送时间"""
+        if message.delay > 0:
+            return message.created_at.timestamp() + message.delay
+        return 0.0
+    
+    def discard(self, message_id: str) -> Optional[DanmakuMessage]:
+        """从索引和调度中移除消息"""
+        self._tokens.pop(message_id, None)
+        return self._messages.pop(message_id, None)
+    
+    def _promote_due(self, now: float):
+        """将已到期的延迟消息移入就绪堆"""
+        while self._delayed and self._delayed[0][0] <= now:
+            _, seq, message_id = heapq.heappop(self._delayed)
+            if self._tokens.get(message_id) == seq:
+                message = self._messages[message_id]
+                heapq.heappush(self._ready, (-message.priority, seq, message_id))
+    
+    def pop_ready(self, now: Optional[float] = None) -> Optional[DanmakuMessage]:
+        """取出下一条可发送的消息"""
+        self._promote_due(time.time() if now is None else now)
+        
+        while self._ready:
+            _, seq, message_id = heapq.heappop(self._ready)
+            if self._tokens.get(message_id) == seq:
+                del self._tokens[message_id]
+                return self._messages[message_id]
+        return None
+    
+    def next_due_time(self) -> Optional[float]:
+        """最近一条延迟消息的到期时间"""
+        while self._delayed:
+            due, seq, message_id = self._delayed[0]
+            if self._tokens.get(message_id) == seq:
+                return due
+            heapq.heappop(self._delayed)
+        return None
+    
+    def _maybe_compact(self):
+        """失效条目过多时重建堆"""
+        if len(self._ready) + len(self._delayed) <= 2 * len(self._tokens) + 1024:
+            return
+        
+        ready, delayed = [], []
+        now = time.time()
+        for message_id, seq in self._tokens.items():
+            message = self._messages[message_id]
+            due = self._due_time(message)
+            if due > now:
+                delayed.append((due, seq, message_id))
+            else:
+                ready.append((-message.priority, seq, message_id))
+        heapq.heapify(ready)
+        heapq.heapify(delayed)
+        self._ready, self._delayed = ready, delayed
+    
+    def clear(self):
+        """清空调度器"""
+        self._messages.clear()
+        self._ready.clear()
+        self._delayed.clear()
+        self._tokens.clear()
+
+
+class SendRateBudget:
+    """全部发送任务共享的令牌桶
+    
+    每 interval 秒补充一个令牌（按小数连续补充），最多积累 burst 个；interval <= 0 时不限速。
+    调用方需保证同一时刻只有一个协程在取令牌。
+    """
+    
+    def __init__(self, interval: float, burst: int = 1):
+        self.rate = 1.0 / interval if interval > 0 else 0.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def wait_time(self) -> float:
+        """距离下一个可用令牌还需等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+    
+    def consume(self):
+        """消耗一个令牌"""
+        if self.rate > 0:
+            self._refill()
+            self._tokens -= 1
+
+
 class DanmakuQueue:
-    """弹幕队列管理器"""
+    """弹幕队列管理器
+    
+    持久化采用 快照 + 追加日志：每次变更只向日志追加一行 JSON，
+    日志达到 compact_threshold 条后合并为新快照并清空日志。
+    fsync_policy 可选 always（每条同步）、interval（按 fsync_interval 秒同步）、never（交由系统）。
+    记录在事件循环中序列化，写盘、fsync 和合并都在一个日志写线程中按提交顺序执行，
+    不阻塞事件循环；always 策略下入队和发送结果会等到日志落盘后才返回。
+    """
+    
+    FSYNC_POLICIES = ('always', 'interval', 'never')
     
-    def __init__(self, max_queue_size: int = 1000, queue_file: str = "data/danmaku_queue.json"):
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        queue_file: str = "data/danmaku_queue.json",
+        fsync_policy: str = "interval",
+        fsync_interval: float = 1.0,
+        compact_threshold: int = 1000
+    ):
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"未知的 fsync 策略: {fsync_policy}")
+        
         self.max_queue_size = max_queue_size
         self.queue_file = Path(queue_file)
-        self.queue: List[DanmakuMessage] = []
+        self.journal_file = self.queue_file.with_suffix('.journal')
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self._journal = None            # 追加日志文件句柄（只在日志写线程中使用）
+        self._journal_io: Optional[ThreadPoolExecutor] = None
+        self._journal_records = 0       # 自上次快照以来的日志条数
+        self._last_fsync = 0.0
+        self._scheduler = DanmakuScheduler()
         self.is_processing = False
-        self.processing_task = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running_workers = 0
+        self._worker_in_flight: List[int] = []     # 每个发送任务正在发送的消息数
+        self._worker_handled: List[int] = []       # 每个发送任务本次处理的消息数
+        self._rate_budget: Optional[SendRateBudget] = None
+        self._dispatch_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None  # 有新消息时唤醒发送任务
         self.stats = {
             'total_sent': 0,
             'total_failed': 0,
@@ -85,33 +276,163 @@ class DanmakuQueue:
         }
         self._load_queue()
     
+    @property
+    def queue(self) -> List[DanmakuMessage]:
+        """队列中的所有消息（按入队顺序）"""
+        return self._scheduler.messages()
+    
     def _load_queue(self):
-        """加载队列数据"""
+        """加载队列数据（快照 + 重放日志）"""
         try:
             if self.queue_file.exists():
                 with open(self.queue_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.queue = [DanmakuMessage.from_dict(item) for item in data.get('queue', [])]
+                    for item in data.get('queue', []):
+                        self._scheduler.add(DanmakuMessage.from_dict(item))
                     self.stats.update(data.get('stats', {}))
-                logger.info(f"加载弹幕队列: {len(self.queue)} 条待处理")
+            
+            replayed = self._replay_journal()
+            if replayed or (self.journal_file.exists() and self.journal_file.stat().st_size > 0):
+                # 重放后立即合并为新快照；日志中只有写了一半的记录时也要清空，
+                # 否则之后追加的记录会接在残行后面，变成无法解析的一行
+                self._save_queue().result()
+            
+            if self.queue_file.exists() or replayed:
+                logger.info(f"加载弹幕队列: {len(self._scheduler)} 条待处理（重放日志 {replayed} 条）")
         except Exception as e:
             logger.error(f"加载弹幕队列失败: {e}")
-            self.queue = []
+            self._scheduler.clear()
+    
+    def _replay_journal(self) -> int:
+        """按顺序重放追加日志，返回重放条数"""
+        if not self.journal_file.exists():
+            return 0
+        
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时写了一半的最后一行
+                    logger.warning("忽略损坏的队列日志记录")
+                    continue
+                
+                op = record.get('op')
+                if op == 'put':
+                    message = DanmakuMessage.from_dict(record['message'])
+                    self._scheduler.discard(message.id)
+                    self._scheduler.add(message)
+                elif op == 'del':
+                    self._scheduler.discard(record['id'])
+                elif op == 'clear':
+                    self._scheduler.clear()
+                
+                if 'stats' in record:
+                    self.stats.update(record['stats'])
+                replayed += 1
+        
+        return replayed
     
-    def _save_queue(self):
-        """保存队列数据"""
+    def _journal_executor(self) -> ThreadPoolExecutor:
+        """日志写线程（首次使用时创建）"""
+        if self._journal_io is None:
+            self._journal_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix='queue-journal')
+        return self._journal_io
+    
+    def _append_journal(self, op: str, **fields) -> Optional[Future]:
+        """向日志追加一条变更记录，返回日志写线程中的写入任务"""
+        try:
+            record = {'op': op, **fields, 'stats': self.stats}
+            line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            future = self._journal_executor().submit(self._write_journal, line)
+            
+            self._journal_records += 1
+            if self._journal_records >= self.compact_threshold:
+                future = self._save_queue()
+            return future
+        except Exception as e:
+            logger.error(f"写入队列日志失败: {e}")
+            return None
+    
+    def _write_journal(self, line: str):
+        """在日志写线程中追加一行，并按策略 fsync"""
+        try:
+            if self._journal is None:
+                self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+                self._journal = open(self.journal_file, 'a', encoding='utf-8')
+            
+            self._journal.write(line)
+            self._journal.flush()
+            
+            if self.fsync_policy == 'always':
+                os.fsync(self._journal.fileno())
+            elif self.fsync_policy == 'interval':
+                now = time.monotonic()
+                if now - self._last_fsync >= self.fsync_interval:
+                    os.fsync(self._journal.fileno())
+                    self._last_fsync = now
+        except Exception as e:
+            logger.error(f"写入队列日志失败: {e}")
+    
+    async def _wait_durable(self, future: Optional[Future]):
+        """always 策略下等待日志写入落盘"""
+        if future is not None and self.fsync_policy == 'always':
+            await asyncio.wrap_future(future)
+    
+    def _journal_put(self, message: DanmakuMessage) -> Optional[Future]:
+        """记录消息新增或状态变化"""
+        return self._append_journal('put', message=message.to_dict())
+    
+    def _journal_delete(self, message_id: str) -> Optional[Future]:
+        """记录消息移除"""
+        return self._append_journal('del', id=message_id)
+    
+    def _save_queue(self) -> Future:
+        """保存队列快照并清空日志（合并）
+        
+        快照内容在调用时取得，写盘在日志写线程中进行：排在它之前提交的记录都已包含在快照中，
+        之后提交的记录写入清空后的新日志，不会丢失。
+        """
+        data = {
+            'queue': [msg.to_dict() for msg in self._scheduler.messages()],
+            'stats': self.stats.copy(),
+            'updated_at': datetime.now().isoformat()
+        }
+        self._journal_records = 0
+        return self._journal_executor().submit(self._write_snapshot, data)
+    
+    def _write_snapshot(self, data: Dict[str, Any]):
+        """在日志写线程中写入快照并清空日志"""
         try:
             self.queue_file.parent.mkdir(parents=True, exist_ok=True)
-            data = {
-                'queue': [msg.to_dict() for msg in self.queue],
-                'stats': self.stats,
-                'updated_at': datetime.now().isoformat()
-            }
-            with open(self.queue_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 先写临时文件再原子替换，避免合并过程中崩溃丢失快照
+            tmp_file = self.queue_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                if self.fsync_policy != 'never':
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, self.queue_file)
+            
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            with open(self.journal_file, 'w', encoding='utf-8'):
+                pass
         except Exception as e:
             logger.error(f"保存弹幕队列失败: {e}")
     
+    def close(self):
+        """合并日志为快照，等待日志写线程写完并关闭"""
+        self._save_queue()
+        self._journal_io.shutdown(wait=True)
+        self._journal_io = None
+        logger.info("弹幕队列已保存")
+    
     async def add_message(
         self, 
         text: str, 
@@ -122,10 +443,10 @@ class DanmakuQueue:
         **style_kwargs
     ) -> str:
         """添加弹幕消息到队列（带内容过滤）"""
-        if len(self.queue) >= self.max_queue_size:
+        if len(self._scheduler) >= self.max_queue_size:
             # 移除最旧的低优先级消息
             self._cleanup_queue()
-            if len(self.queue) >= self.max_queue_size:
+            if len(self._scheduler) >= self.max_queue_size:
                 raise ValueError("队列已满，无法添加新消息")
         
         # 内容过滤检查
@@ -135,7 +456,7 @@ class DanmakuQueue:
                 
                 if filter_result.is_blocked:
                     logger.warning(f"用户 {user_id} 的弹幕被阻止: {text[:20]}...")
-                    raise ValueError(f"弹幕内容被过滤器阻止: {、'.join(filter_result.warnings)}")
+                    raise ValueError(f"弹幕内容被过滤器阻止: {'、'.join(filter_result.warnings)}")
                 
                 if filter_result.action == FilterAction.REVIEW:
                     logger.info(f"用户 {user_id} 的弹幕需要人工审核: {text[:20]}...")
@@ -148,7 +469,7 @@ class DanmakuQueue:
                 
                 # 记录警告
                 if filter_result.warnings:
-                    logger.warning(f"用户 {user_id} 的弹幕触发警告: {、'.join(filter_result.warnings)}")
+                    logger.warning(f"用户 {user_id} 的弹幕触发警告: {'、'.join(filter_result.warnings)}")
                 
             except Exception as e:
                 if "被过滤器阻止" in str(e) or "需要人工审核" in str(e):
@@ -156,8 +477,13 @@ class DanmakuQueue:
                 logger.error(f"内容过滤失败: {e}")
                 # 过滤器失败时继续处理，但记录日志
         
-        # 生成唯一ID
+        # 生成唯一ID（同一毫秒内批量添加时追加序号）
         message_id = f"dm_{user_id}_{int(datetime.now().timestamp() * 1000)}"
+        if message_id in self._scheduler:
+            suffix = 1
+            while f"{message_id}_{suffix}" in self._scheduler:
+                suffix += 1
+            message_id = f"{message_id}_{suffix}"
         
         # 创建消息对象
         message = DanmakuMessage(
@@ -169,67 +495,72 @@ class DanmakuQueue:
             **style_kwargs
         )
         
-        # 按优先级插入队列
-        self._insert_by_priority(message)
-        self._save_queue()
+        # 按优先级调度
+        self._scheduler.add(message)
+        self._notify_worker()
+        await self._wait_durable(self._journal_put(message))
         
         logger.info(f"添加弹幕到队列: {text[:20]}... (优先级: {priority})")
         return message_id
     
-    def _insert_by_priority(self, message: DanmakuMessage):
-        """按优先级插入消息"""
-        # 找到合适的插入位置（高优先级在前）
-        for i, existing_msg in enumerate(self.queue):
-            if existing_msg.priority < message.priority:
-                self.queue.insert(i, message)
-                return
-        # 如果没有找到合适位置，添加到末尾
-        self.queue.append(message)
-    
     def _cleanup_queue(self):
         """清理队列中的低优先级消息"""
         # 移除已发送成功或失败的消息
-        self.queue = [msg for msg in self.queue if msg.status in [DanmakuStatus.PENDING, DanmakuStatus.SENDING]]
+        for msg in self._scheduler.messages():
+            if msg.status not in [DanmakuStatus.PENDING, DanmakuStatus.SENDING]:
+                self._scheduler.discard(msg.id)
+                self._journal_delete(msg.id)
         
         # 如果还是太多，移除最旧的低优先级消息
-        if len(self.queue) >= self.max_queue_size:
-            self.queue.sort(key=lambda x: (x.priority, x.created_at), reverse=True)
-            removed_count = len(self.queue) - self.max_queue_size + 100  # 留出一些空间
-            for _ in range(removed_count):
-                if self.queue:
-                    removed_msg = self.queue.pop()
-                    logger.warning(f"队列已满，移除消息: {removed_msg.text[:20]}...")
+        if len(self._scheduler) >= self.max_queue_size:
+            remaining = sorted(self._scheduler.messages(), key=lambda x: (x.priority, x.created_at), reverse=True)
+            removed_count = len(remaining) - self.max_queue_size + 100  # 留出一些空间
+            for removed_msg in remaining[-removed_count:]:
+                self._scheduler.discard(removed_msg.id)
+                self._journal_delete(removed_msg.id)
+                logger.warning(f"队列已满，移除消息: {removed_msg.text[:20]}...")
     
     def remove_message(self, message_id: str) -> bool:
         """从队列中移除消息"""
-        for i, msg in enumerate(self.queue):
-            if msg.id == message_id:
-                if msg.status == DanmakuStatus.SENDING:
-                    msg.status = DanmakuStatus.CANCELLED
-                else:
-                    self.queue.pop(i)
-                    self.stats['total_cancelled'] += 1
-                self._save_queue()
-                return True
-        return False
+        msg = self._scheduler.get(message_id)
+        if msg is None:
+            return False
+        
+        if msg.status == DanmakuStatus.SENDING:
+            msg.status = DanmakuStatus.CANCELLED
+            self._journal_put(msg)
+        else:
+            self._scheduler.discard(message_id)
+            self.stats['total_cancelled'] += 1
+            self._journal_delete(message_id)
+        return True
     
     def get_queue_info(self) -> Dict[str, Any]:
         """获取队列信息"""
-        status_counts = {}
-        for status in DanmakuStatus:
-            status_counts[status.value] = sum(1 for msg in self.queue if msg.status == status)
+        status_counts = {status.value: 0 for status in DanmakuStatus}
+        for msg in self._scheduler.messages():
+            status_counts[msg.status.value] += 1
         
         return {
-            'total_messages': len(self.queue),
+            'total_messages': len(self._scheduler),
             'status_counts': status_counts,
             'stats': self.stats.copy(),
             'is_processing': self.is_processing,
-            'queue_size_limit': self.max_queue_size
+            'queue_size_limit': self.max_queue_size,
+            'in_flight': sum(self._worker_in_flight),
+            'workers': [
+                {'worker_id': i, 'in_flight': in_flight, 'handled': handled}
+                for i, (in_flight, handled) in enumerate(zip(self._worker_in_flight, self._worker_handled))
+            ]
         }
     
+    def get_message(self, message_id: str) -> Optional[DanmakuMessage]:
+        """按 ID 获取消息（已移出队列时返回 None）"""
+        return self._scheduler.get(message_id)
+    
     def get_user_messages(self, user_id: int, status_filter: Optional[DanmakuStatus] = None) -> List[DanmakuMessage]:
         """获取用户的消息"""
-        messages = [msg for msg in self.queue if msg.user_id == user_id]
+        messages = [msg for msg in self._scheduler.messages() if msg.user_id == user_id]
         if status_filter:
             messages = [msg for msg in messages if msg.status == status_filter]
         return messages
@@ -238,91 +569,126 @@ class DanmakuQueue:
         """清空队列"""
         if user_id is None and status_filter is None:
             # 清空整个队列
-            cancelled_count = len([msg for msg in self.queue if msg.status == DanmakuStatus.PENDING])
-            self.queue.clear()
+            cancelled_count = len([msg for msg in self._scheduler.messages() if msg.status == DanmakuStatus.PENDING])
+            self._scheduler.clear()
             self.stats['total_cancelled'] += cancelled_count
+            self._append_journal('clear')
         else:
             # 按条件清空
-            new_queue = []
             cancelled_count = 0
-            for msg in self.queue:
+            for msg in self._scheduler.messages():
                 should_remove = True
                 if user_id is not None and msg.user_id != user_id:
                     should_remove = False
                 if status_filter is not None and msg.status != status_filter:
                     should_remove = False
                 
-                if should_remove and msg.status == DanmakuStatus.PENDING:
-                    cancelled_count += 1
-                elif not should_remove:
-                    new_queue.append(msg)
+                if should_remove:
+                    if msg.status == DanmakuStatus.PENDING:
+                        cancelled_count += 1
+                    self._scheduler.discard(msg.id)
+                    self._journal_delete(msg.id)
             
-            self.queue = new_queue
             self.stats['total_cancelled'] += cancelled_count
         
-        self._save_queue()
         logger.info(f"清空队列完成")
     
-    async def start_processing(self, danmaku_client, interval: float = 1.0):
-        """开始处理队列"""
+    async def start_processing(self, danmaku_client, interval: float = 1.0, workers: int = 1, burst: int = 1):
+        """开始处理队列
+        
+        启动 workers 个发送任务，共享一个每 interval 秒一条（最多积累 burst 条）的速率预算。
+        消息总是按优先级顺序取出，多个任务只是让网络往返互相重叠。
+        """
         if self.is_processing:
             logger.warning("队列处理已在运行中")
             return
         
+        workers = max(1, workers)
         self.is_processing = True
-        self.processing_task = asyncio.create_task(self._process_queue(danmaku_client, interval))
-        logger.info("开始处理弹幕队列")
+        self._wakeup = asyncio.Event()
+        self._dispatch_lock = asyncio.Lock()
+        self._rate_budget = SendRateBudget(interval, burst)
+        self._worker_in_flight = [0] * workers
+        self._worker_handled = [0] * workers
+        self._running_workers = workers
+        self._worker_tasks = [
+            asyncio.create_task(self._worker_loop(worker_id, danmaku_client))
+            for worker_id in range(workers)
+        ]
+        logger.info(f"开始处理弹幕队列（发送任务: {workers}，间隔: {interval}s）")
+    
+    def _notify_worker(self):
+        """唤醒等待中的发送任务"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def _wait_for_work(self):
+        """等待新消息入队或最近一条延迟消息到期"""
+        due = self._scheduler.next_due_time()
+        timeout = None if due is None else max(0.0, due - time.time())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
     
     async def stop_processing(self):
         """停止处理队列"""
         self.is_processing = False
-        if self.processing_task:
-            self.processing_task.cancel()
-            try:
-                await self.processing_task
-            except asyncio.CancelledError:
-                pass
+        tasks, self._worker_tasks = self._worker_tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
         logger.info("停止处理弹幕队列")
     
-    async def _process_queue(self, danmaku_client, interval: float):
-        """处理队列的主循环"""
-        try:
-            while self.is_processing:
-                if not self.queue:
-                    await asyncio.sleep(interval)
+    async def _next_message(self) -> DanmakuMessage:
+        """取出下一条要发送的消息
+        
+        分派在锁内串行进行：先等到速率预算可用，再取当前优先级最高的就绪消息，
+        因此各任务的发送顺序与单任务时一致。空闲时阻塞等待唤醒，不定时轮询。
+        """
+        async with self._dispatch_lock:
+            while True:
+                wait_time = self._rate_budget.wait_time()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
                     continue
                 
-                # 找到下一个待发送的消息
-                message = None
-                for msg in self.queue:
-                    if msg.status == DanmakuStatus.PENDING:
-                        # 检查是否到了发送时间
-                        if msg.delay > 0:
-                            send_time = msg.created_at + timedelta(seconds=msg.delay)
-                            if datetime.now() < send_time:
-                                continue
-                        message = msg
-                        break
-                
+                self._wakeup.clear()
+                message = self._scheduler.pop_ready()
                 if message is None:
-                    await asyncio.sleep(interval)
+                    await self._wait_for_work()
                     continue
                 
-                # 发送消息
-                await self._send_message(message, danmaku_client)
+                self._rate_budget.consume()
+                return message
+    
+    async def _worker_loop(self, worker_id: int, danmaku_client):
+        """单个发送任务的主循环"""
+        try:
+            while self.is_processing:
+                message = await self._next_message()
                 
-                # 等待间隔
-                await asyncio.sleep(interval)
+                self._worker_in_flight[worker_id] += 1
+                try:
+                    await self._send_message(message, danmaku_client)
+                finally:
+                    self._worker_in_flight[worker_id] -= 1
+                    self._worker_handled[worker_id] += 1
                 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"队列处理出错: {e}")
+            logger.error(f"队列处理出错（发送任务 {worker_id}）: {e}")
         finally:
-            self.is_processing = False
+            self._running_workers -= 1
+            if self._running_workers <= 0:
+                self.is_processing = False
     
     async def _send_message(self, message: DanmakuMessage, danmaku_client):
         """发送单个消息"""
         message.status = DanmakuStatus.SENDING
-        self._save_queue()
+        await self._wait_durable(self._journal_put(message))
         
         try:
             async with danmaku_client as client:
@@ -357,9 +723,12 @@ class DanmakuQueue:
                 # 延迟重试
                 message.delay = 5.0 * message.retry_count
                 message.created_at = datetime.now()
+                self._scheduler.schedule(message)
+                # 其他任务可能正持有分派锁空闲等待，需唤醒它按新的到期时间重新计时
+                self._notify_worker()
                 logger.warning(f"发送弹幕失败，将重试: {message.text[:20]}... - {e}")
         
-        self._save_queue()
+        await self._wait_durable(self._journal_put(message))
 
 
 # 全局队列管理器实例
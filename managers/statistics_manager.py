@@ -1,5 +1,5 @@
 import json
-import sqlite3
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
@@ -7,6 +7,8 @@ from loguru import logger
 from dataclasses import dataclass
 import asyncio
 
+from .storage import storage
+
 
 @dataclass
 class DanmakuStatistics:
@@ -24,88 +26,84 @@ class DanmakuStatistics:
 
 
 class StatisticsManager:
-    """弹幕统计管理器"""
+    """弹幕统计管理器
+    
+    每条发送记录在写入时同步累加到分钟、小时、天三级汇总表（按 epoch 秒的桶起点 + 用户），
+    查询只按桶起点做范围扫描，不再对明细表使用 DATE()/strftime() 表达式。
+    """
+    
+    # (汇总表, 保留天数；None 表示永久保留)
+    ROLLUP_TABLES = (
+        ('stats_rollup_minute', 2),
+        ('stats_rollup_hour', 90),
+        ('stats_rollup_day', None),
+    )
     
     def __init__(self, db_file: str = "data/statistics.db"):
         self.db_file = Path(db_file)
         self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._last_prune = 0.0
+        self._db = storage.open(self.db_file)
         self._init_database()
     
     def _init_database(self):
         """初始化数据库"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                # 用户统计表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_statistics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        date TEXT NOT NULL,
-                        total_sent INTEGER DEFAULT 0,
-                        total_failed INTEGER DEFAULT 0,
-                        total_templates_used INTEGER DEFAULT 0,
-                        total_custom_sent INTEGER DEFAULT 0,
-                        avg_response_time REAL DEFAULT 0.0,
-                        peak_hour INTEGER DEFAULT 0,
-                        most_used_color TEXT DEFAULT '#FFFFFF',
-                        most_used_position TEXT DEFAULT 'scroll',
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(user_id, date)
-                    )
-                ''')
-                
-                # 弹幕记录表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS danmaku_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        def create_schema(conn):
+            cursor = conn.cursor()
+            
+            # 弹幕记录表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS danmaku_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    message_id TEXT,
+                    text TEXT NOT NULL,
+                    color TEXT DEFAULT '#FFFFFF',
+                    position TEXT DEFAULT 'scroll',
+                    font_size INTEGER DEFAULT 24,
+                    duration INTEGER DEFAULT 5,
+                    is_template BOOLEAN DEFAULT 0,
+                    template_name TEXT,
+                    priority INTEGER DEFAULT 1,
+                    status TEXT NOT NULL,
+                    response_time REAL DEFAULT 0.0,
+                    error_message TEXT,
+                    retry_count INTEGER DEFAULT 0,
+                    sent_at TIMESTAMP,
+                    sent_ts INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # 分钟 / 小时 / 天汇总表，bucket 为桶起点的 epoch 秒（本地时间对齐）
+            for table, _ in self.ROLLUP_TABLES:
+                cursor.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket INTEGER NOT NULL,
                         user_id INTEGER NOT NULL,
-                        message_id TEXT,
-                        text TEXT NOT NULL,
-                        color TEXT DEFAULT '#FFFFFF',
-                        position TEXT DEFAULT 'scroll',
-                        font_size INTEGER DEFAULT 24,
-                        duration INTEGER DEFAULT 5,
-                        is_template BOOLEAN DEFAULT 0,
-                        template_name TEXT,
-                        priority INTEGER DEFAULT 1,
-                        status TEXT NOT NULL,
-                        response_time REAL DEFAULT 0.0,
-                        error_message TEXT,
-                        retry_count INTEGER DEFAULT 0,
-                        sent_at TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-                
-                # 系统统计表
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS system_statistics (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        date TEXT NOT NULL UNIQUE,
-                        total_users INTEGER DEFAULT 0,
-                        total_messages INTEGER DEFAULT 0,
-                        total_success INTEGER DEFAULT 0,
-                        total_failed INTEGER DEFAULT 0,
-                        avg_queue_size REAL DEFAULT 0.0,
-                        peak_concurrent_users INTEGER DEFAULT 0,
-                        most_active_hour INTEGER DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        messages INTEGER DEFAULT 0,
+                        success INTEGER DEFAULT 0,
+                        failed INTEGER DEFAULT 0,
+                        templates INTEGER DEFAULT 0,
+                        custom INTEGER DEFAULT 0,
+                        response_time_sum REAL DEFAULT 0.0,
+                        PRIMARY KEY (bucket, user_id)
                     )
                 ''')
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table}(user_id, bucket)')
                 
-                # 创建索引
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_date ON user_statistics(user_id, date)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_danmaku_user ON danmaku_records(user_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_danmaku_date ON danmaku_records(sent_at)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_system_date ON system_statistics(date)')
+            # 创建索引
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_danmaku_user ON danmaku_records(user_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_danmaku_date ON danmaku_records(sent_at)')
                 
-                conn.commit()
-                logger.info("统计数据库初始化完成")
+            self._migrate_schema(cursor)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_danmaku_sent_ts ON danmaku_records(sent_ts)')
                 
+        # 早期按日维护的 user_statistics / system_statistics 等表已由汇总表取代，不再写入；
+        # 旧数据库中的这些表原样保留（含按小时、样式的历史数据），不做删除
+        try:
+            self._db.migrate_sync([(1, create_schema)])
+            logger.info("统计数据库初始化完成")
         except Exception as e:
             logger.error(f"初始化统计数据库失败: {e}")
             raise
@@ -127,54 +125,354 @@ class StatisticsManager:
         error_message: str = "",
         retry_count: int = 0
     ):
-        """记录弹幕发送"""
-        try:
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO danmaku_records (
-                        user_id, message_id, text, color, position, font_size, duration,
-                        is_template, template_name, priority, status, response_time,
-                        error_message, retry_count, sent_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+        """记录弹幕发送（明细与分钟/小时/天汇总在写线程中同一个事务内增量更新）"""
+        sent_at = datetime.now()
+            
+        def apply(conn):
+            cursor = conn.cursor()
+                
+            cursor.execute('''
+                INSERT INTO danmaku_records (
                     user_id, message_id, text, color, position, font_size, duration,
                     is_template, template_name, priority, status, response_time,
-                    error_message, retry_count, datetime.now()
-                ))
+                    error_message, retry_count, sent_at, sent_ts
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                user_id, message_id, text, color, position, font_size, duration,
+                is_template, template_name, priority, status, response_time,
+                error_message, retry_count, sent_at, int(sent_at.timestamp())
+            ))
                 
-                conn.commit()
+            self._apply_rollups(cursor, user_id, sent_at, status, is_template, response_time)
                 
-                # 异步更新统计
-                asyncio.create_task(self._update_user_statistics(user_id))
-                asyncio.create_task(self._update_system_statistics())
+            # 每小时清理一次过期的细粒度汇总
+            if time.time() - self._last_prune >= 3600:
+                self._prune_rollups(cursor)
                 
+        try:
+            await self._db.write(apply)
         except Exception as e:
             logger.error(f"记录弹幕发送失败: {e}")
     
-    async def _update_user_statistics(self, user_id: int):
-        """更新用户统计"""
+    def _migrate_schema(self, cursor):
+        """为旧数据库补充时间戳列，并据明细重建一次汇总"""
+        rebuild = False
+        
+        cursor.execute('PRAGMA table_info(danmaku_records)')
+        record_columns = {row[1] for row in cursor.fetchall()}
+        if 'sent_ts' not in record_columns:
+            cursor.execute('ALTER TABLE danmaku_records ADD COLUMN sent_ts INTEGER')
+            # sent_at 为本地时间，'utc' 修饰符将其换算为 UTC 后再取 epoch 秒
+            cursor.execute('''
+                UPDATE danmaku_records SET sent_ts = CAST(strftime('%s', sent_at, 'utc') AS INTEGER)
+                WHERE sent_at IS NOT NULL
+            ''')
+            rebuild = True
+        
+        if rebuild:
+            self._rebuild_aggregates(cursor)
+    
+    def _rebuild_aggregates(self, cursor):
+        """清空汇总表并按明细重新累加"""
+        for table, _ in self.ROLLUP_TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+        
+        records = cursor.connection.execute('''
+            SELECT user_id, sent_at, status, is_template, response_time
+            FROM danmaku_records
+            WHERE sent_at IS NOT NULL
+            ORDER BY id
+        ''')
+        rebuilt = 0
+        for user_id, sent_at, status, is_template, response_time in records:
+            sent_at = datetime.fromisoformat(sent_at)
+            self._apply_rollups(cursor, user_id, sent_at, status, bool(is_template), response_time or 0.0)
+            rebuilt += 1
+        
+        if rebuilt:
+            logger.info(f"已按 {rebuilt} 条明细重建统计汇总")
+    
+    @staticmethod
+    def _bucket_starts(moment: datetime) -> Tuple[int, int, int]:
+        """时间所在分钟、小时、天的起点（epoch 秒）"""
+        minute = moment.replace(second=0, microsecond=0)
+        hour = minute.replace(minute=0)
+        day = hour.replace(hour=0)
+        return int(minute.timestamp()), int(hour.timestamp()), int(day.timestamp())
+    
+    def _apply_rollups(
+        self,
+        cursor,
+        user_id: int,
+        sent_at: datetime,
+        status: str,
+        is_template: bool,
+        response_time: float
+    ):
+        """将一条发送记录累加到分钟、小时、天汇总"""
+        success = 1 if status == 'success' else 0
+        failed = 1 if status == 'failed' else 0
+        template = 1 if is_template else 0
+        
+        for (table, _), bucket in zip(self.ROLLUP_TABLES, self._bucket_starts(sent_at)):
+            cursor.execute(f'''
+                INSERT INTO {table} (
+                    bucket, user_id, messages, success, failed, templates, custom, response_time_sum
+                ) VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+                ON CONFLICT (bucket, user_id) DO UPDATE SET
+                    messages = messages + 1,
+                    success = success + excluded.success,
+                    failed = failed + excluded.failed,
+                    templates = templates + excluded.templates,
+                    custom = custom + excluded.custom,
+                    response_time_sum = response_time_sum + excluded.response_time_sum
+            ''', (bucket, user_id, success, failed, template, 1 - template, response_time))
+    
+    def _prune_rollups(self, cursor):
+        """删除超过保留期的细粒度汇总"""
+        self._last_prune = time.time()
+        for table, retention_days in self.ROLLUP_TABLES:
+            if retention_days is None:
+                continue
+            cutoff = int(time.time()) - retention_days * 86400
+            cursor.execute(f'DELETE FROM {table} WHERE bucket < ?', (cutoff,))
+    
+    def _day_range(self, days: int) -> Tuple[int, int]:
+        """最近 days 天（含今天）对应的天汇总桶范围"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        return self._bucket_starts(start_date)[2], self._bucket_starts(end_date)[2]
+    
+    @staticmethod
+    def _bucket_date(bucket: int) -> str:
+        """天汇总桶起点转为 YYYY-MM-DD"""
+        return datetime.fromtimestamp(bucket).strftime('%Y-%m-%d')
+    
+    async def get_activity_series(
+        self,
+        granularity: str = 'hour',
+        periods: int = 24,
+        user_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """获取最近若干分钟/小时/天的发送量序列"""
+        tables = {'minute': ('stats_rollup_minute', 60), 'hour': ('stats_rollup_hour', 3600)}
+        
+        def query(conn):
+            if granularity == 'day':
+                start_bucket = self._day_range(periods - 1)[0]
+                table = 'stats_rollup_day'
+            else:
+                table, width = tables[granularity]
+                now_bucket = self._bucket_starts(datetime.now())[0 if granularity == 'minute' else 1]
+                start_bucket = now_bucket - (periods - 1) * width
+            
+            condition = 'bucket >= ?'
+            params: List[Any] = [start_bucket]
+            if user_id is not None:
+                condition += ' AND user_id = ?'
+                params.append(user_id)
+            
+            rows = conn.execute(f'''
+                SELECT bucket, SUM(messages), SUM(success), SUM(failed)
+                FROM {table}
+                WHERE {condition}
+                GROUP BY bucket
+                ORDER BY bucket
+            ''', params).fetchall()
+            
+            return [
+                {
+                    'time': datetime.fromtimestamp(row[0]).isoformat(),
+                    'messages': row[1],
+                    'success': row[2],
+                    'failed': row[3]
+                }
+                for row in rows
+            ]
+        
+        try:
+            return await self._db.read(query)
+        except Exception as e:
+            logger.error(f"获取发送量序列失败: {e}")
+            return []
+    
+    async def get_user_statistics(self, user_id: int, days: int = 7) -> Dict[str, Any]:
+        """获取用户统计数据"""
+        def query(conn):
+            start_bucket, end_bucket = self._day_range(days)
+            
+            cursor = conn.cursor()
+                
+            # 按天汇总读取，每日一行
+            cursor.execute('''
+                SELECT bucket, success, failed, templates, custom, messages, response_time_sum
+                FROM stats_rollup_day
+                WHERE user_id = ? AND bucket BETWEEN ? AND ?
+                ORDER BY bucket DESC
+            ''', (user_id, start_bucket, end_bucket))
+                
+            daily_data = cursor.fetchall()
+                
+            total_sent = sum(row[1] for row in daily_data)
+            total_failed = sum(row[2] for row in daily_data)
+            total_messages = sum(row[5] for row in daily_data)
+            response_time_sum = sum(row[6] for row in daily_data)
+                
+            # 计算成功率
+            total_attempts = total_sent + total_failed
+            success_rate = (total_sent / total_attempts * 100) if total_attempts > 0 else 0
+            avg_response = response_time_sum / total_messages if total_messages > 0 else 0.0
+                
+            return {
+                'user_id': user_id,
+                'period_days': days,
+                'total_sent': total_sent,
+                'total_failed': total_failed,
+                'success_rate': round(success_rate, 2),
+                'templates_used': sum(row[3] for row in daily_data),
+                'custom_sent': sum(row[4] for row in daily_data),
+                'avg_response_time': round(avg_response, 3),
+                'daily_data': [
+                    {'date': self._bucket_date(row[0]), 'sent': row[1], 'failed': row[2]}
+                    for row in daily_data
+                ]
+            }
+                
+        try:
+            return await self._db.read(query)
+        except Exception as e:
+            logger.error(f"获取用户统计失败: {e}")
+            return {}
+    
+    async def get_system_statistics(self, days: int = 7) -> Dict[str, Any]:
+        """获取系统统计数据"""
+        def query(conn):
+            start_bucket, end_bucket = self._day_range(days)
+            
+            cursor = conn.cursor()
+                
+            # 获取每日数据（天汇总中每个用户一行，行数即当日活跃用户数）
+            cursor.execute('''
+                SELECT bucket, COUNT(*), SUM(messages), SUM(success), SUM(failed)
+                FROM stats_rollup_day
+                WHERE bucket BETWEEN ? AND ?
+                GROUP BY bucket
+                ORDER BY bucket DESC
+            ''', (start_bucket, end_bucket))
+                
+            daily_data = cursor.fetchall()
+                
+            # 获取活跃用户统计
+            cursor.execute('''
+                SELECT COUNT(DISTINCT user_id)
+                FROM stats_rollup_day
+                WHERE bucket BETWEEN ? AND ?
+            ''', (start_bucket, end_bucket))
+                
+            active_users = cursor.fetchone()[0] or 0
+                
+            # 计算成功率
+            total_success = sum(row[3] for row in daily_data)
+            total_failed = sum(row[4] for row in daily_data)
+            total_attempts = total_success + total_failed
+            success_rate = (total_success / total_attempts * 100) if total_attempts > 0 else 0
+                
+            return {
+                'period_days': days,
+                'total_users': sum(row[1] for row in daily_data),
+                'active_users': active_users,
+                'total_messages': sum(row[2] for row in daily_data),
+                'total_success': total_success,
+                'total_failed': total_failed,
+                'success_rate': round(success_rate, 2),
+                'daily_data': [
+                    {
+                        'date': self._bucket_date(row[0]), 
+                        'users': row[1], 
+                        'messages': row[2],
+                        'success': row[3],
+                        'failed': row[4]
+                    }
+                    for row in daily_data
+                ]
+            }
+                
         try:
-            today = datetime.now().strftime('%Y-%m-%d')
+            return await self._db.read(query)
+        except Exception as e:
+            logger.error(f"获取系统统计失败: {e}")
+            return {}
+    
+    async def get_user_ranking(self, period_days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+        """获取用户排行榜"""
+        def query(conn):
+            start_bucket, end_bucket = self._day_range(period_days)
+            
+            cursor = conn.cursor()
+                
+            cursor.execute('''
+                SELECT 
+                    user_id,
+                    SUM(success) as total_sent,
+                    SUM(failed) as total_failed,
+                    SUM(templates) as templates_used
+                FROM stats_rollup_day
+                WHERE bucket BETWEEN ? AND ?
+                GROUP BY user_id
+                ORDER BY total_sent DESC
+                LIMIT ?
+            ''', (start_bucket, end_bucket, limit))
+                
+            ranking = []
+            for i, row in enumerate(cursor.fetchall(), 1):
+                total_attempts = (row[1] or 0) + (row[2] or 0)
+                success_rate = ((row[1] or 0) / total_attempts * 100) if total_attempts > 0 else 0
+                    
+                ranking.append({
+                    'rank': i,
+                    'user_id': row[0],
+                    'total_sent': row[1] or 0,
+                    'total_failed': row[2] or 0,
+                    'success_rate': round(success_rate, 2),
+                    'templates_used': row[3] or 0
+                })
+                
+            return ranking
+                
+        try:
+            return await self._db.read(query)
+        except Exception as e:
+            logger.error(f"获取用户排行榜失败: {e}")
+            return []
+    
+    async def export_statistics(self, file_path: str, user_id: Optional[int] = None, days: int = 30) -> bool:
+        """导出统计数据"""
+        try:
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days)
+            
+            data = {
+                'exported_at': datetime.now().isoformat(),
+                'period_days': days,
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d')
+            }
+            
+            if user_id:
+                data['user_statistics'] = await self.get_user_statistics(user_id, days)
+            else:
+                data['system_statistics'] = await self.get_system_statistics(days)
+                data['user_ranking'] = await self.get_user_ranking(days)
+            
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
             
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                
-                # 获取今日用户数据
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_count,
-                        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,
-                        SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count,
-                        SUM(CASE WHEN is_template = 1 THEN 1 ELSE 0 END) as template_count,
-                        SUM(CASE WHEN is_template = 0 THEN 1 ELSE 0 END) as custom_count,
-                        AVG(response_time) as avg_response,
-                        color as most_color,
-                        position as most_position
-                    FROM danmaku_records 
-                    WHERE user_id = ? AND DATE(sent_at) = ?
-                    GROUP BY color, position
-                    ORDER BY COUNT(*) DESC
-                    LIMIT 1
-                ''', (user_id, today))\n                \n                result = cursor.fetchone()\n                \n                if result and result[0] > 0:\n                    # 获取最活跃小时\n                    cursor.execute('''\n                        SELECT strftime('%H', sent_at) as hour, COUNT(*) as count\n                        FROM danmaku_records \n                        WHERE user_id = ? AND DATE(sent_at) = ?\n                        GROUP BY hour\n                        ORDER BY count DESC\n                        LIMIT 1\n                    ''', (user_id, today))\n                    \n                    peak_hour_result = cursor.fetchone()\n                    peak_hour = int(peak_hour_result[0]) if peak_hour_result else 0\n                    \n                    # 更新或插入统计数据\n                    cursor.execute('''\n                        INSERT OR REPLACE INTO user_statistics (\n                            user_id, date, total_sent, total_failed, total_templates_used,\n                            total_custom_sent, avg_response_time, peak_hour, most_used_color,\n                            most_used_position, updated_at\n                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)\n                    ''', (\n                        user_id, today, result[1] or 0, result[2] or 0, result[3] or 0,\n                        result[4] or 0, result[5] or 0.0, peak_hour, result[6] or '#FFFFFF',\n                        result[7] or 'scroll', datetime.now()\n                    ))\n                    \n                    conn.commit()\n                    \n        except Exception as e:\n            logger.error(f\"更新用户统计失败: {e}\")\n    \n    async def _update_system_statistics(self):\n        \"\"\"更新系统统计\"\"\"\n        try:\n            today = datetime.now().strftime('%Y-%m-%d')\n            \n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                # 获取今日系统数据\n                cursor.execute('''\n                    SELECT \n                        COUNT(DISTINCT user_id) as total_users,\n                        COUNT(*) as total_messages,\n                        SUM(CASE WHEN status = 'success' THEN 1 ELSE 0 END) as success_count,\n                        SUM(CASE WHEN status = 'failed' THEN 1 ELSE 0 END) as failed_count\n                    FROM danmaku_records \n                    WHERE DATE(sent_at) = ?\n                ''', (today,))\n                \n                result = cursor.fetchone()\n                \n                if result:\n                    # 获取最活跃小时\n                    cursor.execute('''\n                        SELECT strftime('%H', sent_at) as hour, COUNT(*) as count\n                        FROM danmaku_records \n                        WHERE DATE(sent_at) = ?\n                        GROUP BY hour\n                        ORDER BY count DESC\n                        LIMIT 1\n                    ''', (today,))\n                    \n                    peak_hour_result = cursor.fetchone()\n                    most_active_hour = int(peak_hour_result[0]) if peak_hour_result else 0\n                    \n                    # 更新或插入系统统计\n                    cursor.execute('''\n                        INSERT OR REPLACE INTO system_statistics (\n                            date, total_users, total_messages, total_success, total_failed,\n                            most_active_hour, updated_at\n                        ) VALUES (?, ?, ?, ?, ?, ?, ?)\n                    ''', (\n                        today, result[0] or 0, result[1] or 0, result[2] or 0,\n                        result[3] or 0, most_active_hour, datetime.now()\n                    ))\n                    \n                    conn.commit()\n                    \n        except Exception as e:\n            logger.error(f\"更新系统统计失败: {e}\")\n    \n    def get_user_statistics(self, user_id: int, days: int = 7) -> Dict[str, Any]:\n        \"\"\"获取用户统计数据\"\"\"\n        try:\n            end_date = datetime.now()\n            start_date = end_date - timedelta(days=days)\n            \n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                # 获取时间段内的统计\n                cursor.execute('''\n                    SELECT \n                        SUM(total_sent) as total_sent,\n                        SUM(total_failed) as total_failed,\n                        SUM(total_templates_used) as templates_used,\n                        SUM(total_custom_sent) as custom_sent,\n                        AVG(avg_response_time) as avg_response\n                    FROM user_statistics\n                    WHERE user_id = ? AND date BETWEEN ? AND ?\n                ''', (user_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))\n                \n                summary = cursor.fetchone()\n                \n                # 获取每日数据\n                cursor.execute('''\n                    SELECT date, total_sent, total_failed\n                    FROM user_statistics\n                    WHERE user_id = ? AND date BETWEEN ? AND ?\n                    ORDER BY date DESC\n                ''', (user_id, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))\n                \n                daily_data = cursor.fetchall()\n                \n                # 计算成功率\n                total_sent = summary[0] or 0\n                total_failed = summary[1] or 0\n                total_attempts = total_sent + total_failed\n                success_rate = (total_sent / total_attempts * 100) if total_attempts > 0 else 0\n                \n                return {\n                    'user_id': user_id,\n                    'period_days': days,\n                    'total_sent': total_sent,\n                    'total_failed': total_failed,\n                    'success_rate': round(success_rate, 2),\n                    'templates_used': summary[2] or 0,\n                    'custom_sent': summary[3] or 0,\n                    'avg_response_time': round(summary[4] or 0.0, 3),\n                    'daily_data': [\n                        {'date': row[0], 'sent': row[1], 'failed': row[2]}\n                        for row in daily_data\n                    ]\n                }\n                \n        except Exception as e:\n            logger.error(f\"获取用户统计失败: {e}\")\n            return {}\n    \n    def get_system_statistics(self, days: int = 7) -> Dict[str, Any]:\n        \"\"\"获取系统统计数据\"\"\"\n        try:\n            end_date = datetime.now()\n            start_date = end_date - timedelta(days=days)\n            \n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                # 获取时间段内的统计\n                cursor.execute('''\n                    SELECT \n                        SUM(total_users) as total_users,\n                        SUM(total_messages) as total_messages,\n                        SUM(total_success) as total_success,\n                        SUM(total_failed) as total_failed,\n                        AVG(peak_concurrent_users) as avg_concurrent\n                    FROM system_statistics\n                    WHERE date BETWEEN ? AND ?\n                ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))\n                \n                summary = cursor.fetchone()\n                \n                # 获取每日数据\n                cursor.execute('''\n                    SELECT date, total_users, total_messages, total_success, total_failed\n                    FROM system_statistics\n                    WHERE date BETWEEN ? AND ?\n                    ORDER BY date DESC\n                ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))\n                \n                daily_data = cursor.fetchall()\n                \n                # 获取活跃用户统计\n                cursor.execute('''\n                    SELECT COUNT(DISTINCT user_id) as active_users\n                    FROM danmaku_records\n                    WHERE DATE(sent_at) BETWEEN ? AND ?\n                ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))\n                \n                active_users = cursor.fetchone()[0] or 0\n                \n                # 计算成功率\n                total_success = summary[2] or 0\n                total_failed = summary[3] or 0\n                total_attempts = total_success + total_failed\n                success_rate = (total_success / total_attempts * 100) if total_attempts > 0 else 0\n                \n                return {\n                    'period_days': days,\n                    'total_users': summary[0] or 0,\n                    'active_users': active_users,\n                    'total_messages': summary[1] or 0,\n                    'total_success': total_success,\n                    'total_failed': total_failed,\n                    'success_rate': round(success_rate, 2),\n                    'daily_data': [\n                        {\n                            'date': row[0], \n                            'users': row[1], \n                            'messages': row[2],\n                            'success': row[3],\n                            'failed': row[4]\n                        }\n                        for row in daily_data\n                    ]\n                }\n                \n        except Exception as e:\n            logger.error(f\"获取系统统计失败: {e}\")\n            return {}\n    \n    def get_user_ranking(self, period_days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:\n        \"\"\"获取用户排行榜\"\"\"\n        try:\n            end_date = datetime.now()\n            start_date = end_date - timedelta(days=period_days)\n            \n            with sqlite3.connect(self.db_file) as conn:\n                cursor = conn.cursor()\n                \n                cursor.execute('''\n                    SELECT \n                        user_id,\n                        SUM(total_sent) as total_sent,\n                        SUM(total_failed) as total_failed,\n                        SUM(total_templates_used) as templates_used\n                    FROM user_statistics\n                    WHERE date BETWEEN ? AND ?\n                    GROUP BY user_id\n                    ORDER BY total_sent DESC\n                    LIMIT ?\n                ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), limit))\n                \n                ranking = []\n                for i, row in enumerate(cursor.fetchall(), 1):\n                    total_attempts = (row[1] or 0) + (row[2] or 0)\n                    success_rate = ((row[1] or 0) / total_attempts * 100) if total_attempts > 0 else 0\n                    \n                    ranking.append({\n                        'rank': i,\n                        'user_id': row[0],\n                        'total_sent': row[1] or 0,\n                        'total_failed': row[2] or 0,\n                        'success_rate': round(success_rate, 2),\n                        'templates_used': row[3] or 0\n                    })\n                \n                return ranking\n                \n        except Exception as e:\n            logger.error(f\"获取用户排行榜失败: {e}\")\n            return []\n    \n    def export_statistics(self, file_path: str, user_id: Optional[int] = None, days: int = 30) -> bool:\n        \"\"\"导出统计数据\"\"\"\n        try:\n            end_date = datetime.now()\n            start_date = end_date - timedelta(days=days)\n            \n            data = {\n                'exported_at': datetime.now().isoformat(),\n                'period_days': days,\n                'start_date': start_date.strftime('%Y-%m-%d'),\n                'end_date': end_date.strftime('%Y-%m-%d')\n            }\n            \n            if user_id:\n                data['user_statistics'] = self.get_user_statistics(user_id, days)\n            else:\n                data['system_statistics'] = self.get_system_statistics(days)\n                data['user_ranking'] = self.get_user_ranking(days)\n            \n            with open(file_path, 'w', encoding='utf-8') as f:\n                json.dump(data, f, ensure_ascii=False, indent=2)\n            \n            return True\n            \n        except Exception as e:\n            logger.error(f\"导出统计数据失败: {e}\")\n            return False\n\n\n# 全局统计管理器实例\nstats_manager = StatisticsManager()
\ No newline at end of file
+            return True
+            
+        except Exception as e:
+            logger.error(f"导出统计数据失败: {e}")
+            return False
+
+
+# 全局统计管理器实例
+stats_manager = StatisticsManager()
\ No newline at end of file
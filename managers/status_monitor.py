@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+from loguru import logger
+from config import config
+
+
+class ServerStatusMonitor:
+    """服务器状态监控器
+    
+    后台任务按固定节奏刷新服务器状态快照，/status 等读取方直接返回内存中的快照，
+    不再每次点击都请求服务器。请求失败或响应过慢时刷新间隔按倍数延长（不超过 max_interval），
+    恢复正常后回到 poll_interval。
+    """
+    
+    def __init__(self, poll_interval: float = 10.0, max_interval: float = 120.0, slow_threshold: float = 3.0):
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.slow_threshold = slow_threshold  # 响应超过该秒数视为服务器繁忙
+        self._client = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self._current_interval = poll_interval
+        self._data: Optional[Dict[str, Any]] = None   # 最近一次成功获取的状态
+        self._data_at: Optional[float] = None         # 成功获取的时间（monotonic）
+        self._checked_at: Optional[float] = None      # 最近一次刷新的时间（monotonic）
+        self._last_error: Optional[str] = None
+        self._consecutive_failures = 0
+        self.stats = {'polls': 0, 'failures': 0, 'reads': 0}
+    
+    def start(self, danmaku_client):
+        """启动后台刷新任务"""
+        self._client = danmaku_client
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+            logger.info(f"启动服务器状态监控（间隔: {self.poll_interval}s）")
+    
+    async def stop(self):
+        """停止后台刷新任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def refresh(self):
+        """立即刷新一次快照（并发调用只请求一次）"""
+        checked_before = self._checked_at
+        async with self._refresh_lock:
+            # 等锁期间已有其他调用完成刷新
+            if self._checked_at != checked_before:
+                return
+            
+            start = time.monotonic()
+            try:
+                async with self._client as client:
+                    result = await client.get_status(use_cache=False)
+            except Exception as e:
+                result = {'success': False, 'data': None, 'message': str(e)}
+            elapsed = time.monotonic() - start
+            
+            self.stats['polls'] += 1
+            self._checked_at = time.monotonic()
+            
+            if result['success']:
+                self._data = result['data']
+                self._data_at = self._checked_at
+                self._last_error = None
+                self._consecutive_failures = 0
+            else:
+                self._last_error = result['message']
+                self._consecutive_failures += 1
+                self.stats['failures'] += 1
+                logger.warning(f"刷新服务器状态失败: {result['message']}")
+            
+            self._current_interval = self._next_interval(result['success'], elapsed)
+    
+    def _next_interval(self, success: bool, elapsed: float) -> float:
+        """根据本次结果计算下一次刷新间隔"""
+        if not success:
+            return min(self.max_interval, self.poll_interval * (2 ** self._consecutive_failures))
+        if elapsed > self.slow_threshold:
+            return min(self.max_interval, self._current_interval * 2)
+        return self.poll_interval
+    
+    async def _poll_loop(self):
+        """后台刷新循环"""
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"服务器状态监控出错: {e}")
+            await asyncio.sleep(self._current_interval)
+    
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """获取状态快照
+        
+        返回 {'success', 'data', 'message', 'age', 'error'}，age 为数据距今秒数；
+        刷新失败但有旧数据时仍返回旧数据，并在 error 中给出最近一次的错误。
+        """
+        self.stats['reads'] += 1
+        
+        # 尚无任何数据时（如刚启动）同步刷新一次
+        if self._checked_at is None and self._client is not None:
+            await self.refresh()
+        
+        now = time.monotonic()
+        if self._data is None:
+            return {
+                'success': False,
+                'data': None,
+                'message': self._last_error or '暂无服务器状态数据',
+                'age': None,
+                'error': self._last_error
+            }
+        
+        return {
+            'success': True,
+            'data': self._data,
+            'message': '状态获取成功',
+            'age': now - self._data_at,
+            'error': self._last_error
+        }
+    
+    @staticmethod
+    def format_age(age: Optional[float]) -> str:
+        """将数据年龄格式化为可读文本"""
+        if age is None:
+            return '未知'
+        if age < 5:
+            return '刚刚'
+        if age < 60:
+            return f'{int(age)} 秒前'
+        if age < 3600:
+            return f'{int(age // 60)} 分钟前'
+        return f'{int(age // 3600)} 小时前'
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监控统计"""
+        stats = self.stats.copy()
+        stats['current_interval'] = self._current_interval
+        stats['consecutive_failures'] = self._consecutive_failures
+        stats['is_running'] = self._task is not None and not self._task.done()
+        return stats
+
+
+# 全局状态监控实例
+status_monitor = ServerStatusMonitor(
+    poll_interval=config.STATUS_POLL_INTERVAL,
+    max_interval=config.STATUS_POLL_MAX_INTERVAL
+)
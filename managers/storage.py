@@ -0,0 +1,293 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
+from loguru import logger
+from config import config
+
+T = TypeVar('T')
+
+# (版本号, 迁移函数)；迁移函数接收写连接，按版本号升序执行
+Migration = Tuple[int, Callable[[sqlite3.Connection], None]]
+
+
+def configure_connection(conn: sqlite3.Connection, busy_timeout: float = 5.0):
+    """对连接应用统一的 PRAGMA 设置"""
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={int(busy_timeout * 1000)}')
+    conn.execute(f'PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={config.DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+
+def rows_to_dicts(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+    """将查询结果转换为字典列表"""
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class StorageExecutor:
+    """SQLite 存储执行器
+    
+    每个数据库文件一个写线程（所有写操作串行、各自一个事务），读操作在有界线程池中执行，
+    每个线程持有自己的长连接。数据库使用 WAL 模式，读写互不阻塞；协程通过 await 等待结果，
+    磁盘 fsync 只占用后台线程，不会卡住事件循环。
+    """
+    
+    def __init__(self, db_file: Union[str, Path], readers: int = 4, busy_timeout: float = 5.0):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        
+        name = self.db_file.stem
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'db-{name}-writer')
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix=f'db-{name}-reader')
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._closed = False
+        
+        self.stats = {'reads': 0, 'writes': 0, 'write_errors': 0}
+        self._stats_lock = threading.Lock()  # 写线程和各读线程都会计数
+        
+        # 在写线程中打开连接并切换到 WAL
+        self._writer.submit(self._connection).result()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接（首次使用时创建）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, check_same_thread=False)
+            configure_connection(conn, self.busy_timeout)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _count(self, key: str):
+        """统计计数加一（在写线程或读线程中调用）"""
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _run_write(self, fn: Callable[..., T], *args) -> T:
+        """在写线程中以单个事务执行 fn(conn, *args)"""
+        conn = self._connection()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            self._count('writes')
+            return result
+        except Exception:
+            conn.rollback()
+            self._count('write_errors')
+            raise
+    
+    def _run_read(self, fn: Callable[..., T], *args) -> T:
+        """在读线程中执行 fn(conn, *args)"""
+        conn = self._connection()
+        try:
+            return fn(conn, *args)
+        finally:
+            # 结束隐式读事务，避免长期持有旧快照阻止 WAL 检查点
+            if conn.in_transaction:
+                conn.rollback()
+            self._count('reads')
+    
+    def _run_migrations(self, conn: sqlite3.Connection, migrations: Sequence[Migration]) -> List[int]:
+        """执行版本号高于 user_version 的迁移，每个版本单独提交"""
+        current = conn.execute('PRAGMA user_version').fetchone()[0]
+        applied = []
+        for version, migrate in sorted(migrations, key=lambda item: item[0]):
+            if version <= current:
+                continue
+            migrate(conn)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+            applied.append(version)
+        
+        if applied:
+            logger.info(f"数据库 {self.db_file.name} 已迁移到版本 {applied[-1]}")
+        return applied
+    
+    async def write(self, fn: Callable[..., T], *args) -> T:
+        """在写线程中执行写操作，fn 的第一个参数为连接"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_write, fn, *args)
+    
+    async def read(self, fn: Callable[..., T], *args) -> T:
+        """在读线程池中执行只读操作，fn 的第一个参数为连接"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn, *args)
+    
+    async def migrate(self, migrations: Sequence[Migration]) -> List[int]:
+        """在写线程中执行尚未应用的迁移，返回本次应用的版本号"""
+        return await self.write(self._run_migrations, migrations)
+    
+    def write_sync(self, fn: Callable[..., T], *args) -> T:
+        """同步执行写操作（用于初始化等尚无事件循环的场景）"""
+        return self._writer.submit(self._run_write, fn, *args).result()
+    
+    def read_sync(self, fn: Callable[..., T], *args) -> T:
+        """同步执行只读操作（用于初始化等尚无事件循环的场景）"""
+        return self._readers.submit(self._run_read, fn, *args).result()
+    
+    def migrate_sync(self, migrations: Sequence[Migration]) -> List[int]:
+        """同步执行尚未应用的迁移"""
+        return self.write_sync(self._run_migrations, migrations)
+    
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        """执行单条写语句，返回影响行数"""
+        return await self.write(lambda conn: conn.execute(sql, params).rowcount)
+    
+    async def executemany(self, sql: str, rows: Sequence[Sequence]) -> int:
+        """批量执行写语句，返回影响行数"""
+        return await self.write(lambda conn: conn.executemany(sql, rows).rowcount)
+    
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """执行查询并返回全部行"""
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+    
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        """执行查询并返回第一行"""
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+    
+    async def fetch_dicts(self, sql: str, params: Sequence = ()) -> List[Dict[str, Any]]:
+        """执行查询并以字典列表返回"""
+        return await self.read(lambda conn: rows_to_dicts(conn.execute(sql, params)))
+    
+    async def fetch_dict(self, sql: str, params: Sequence = ()) -> Optional[Dict[str, Any]]:
+        """执行查询并以字典返回第一行"""
+        rows = await self.fetch_dicts(sql, params)
+        return rows[0] if rows else None
+    
+    def close(self):
+        """等待进行中的操作完成并关闭全部连接"""
+        if self._closed:
+            return
+        self._closed = True
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"关闭数据库连接失败: {e}")
+            self._connections.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行统计"""
+        with self._stats_lock:
+            stats = self.stats.copy()
+        stats['db_file'] = str(self.db_file)
+        stats['connections'] = len(self._connections)
+        return stats
+
+
+class Storage:
+    """进程级存储层
+    
+    统一管理所有 SQLite 数据库：每个文件一个 StorageExecutor，打开时按版本执行迁移，
+    进程退出时统一关闭。数据库以文件名（不含扩展名）为别名登记，query() 在附加了全部
+    已登记数据库的只读连接上执行，可直接跨库 JOIN，例如
+    bot.operation_logs JOIN content_filter.audit_records。
+    """
+    
+    def __init__(self, readers: int = 4, cross_readers: int = 2):
+        self.readers = readers
+        self.cross_readers = cross_readers
+        self._databases: Dict[str, StorageExecutor] = {}
+        self._lock = threading.Lock()
+        self._cross_readers = self._new_cross_pool()
+        self._cross_local = threading.local()
+        self._cross_connections: List[sqlite3.Connection] = []
+    
+    def _new_cross_pool(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=self.cross_readers, thread_name_prefix='db-cross-reader')
+    
+    def open(self, db_file: Union[str, Path], migrations: Sequence[Migration] = ()) -> StorageExecutor:
+        """打开（或返回已打开的）数据库，并执行尚未应用的迁移"""
+        db_file = Path(db_file)
+        alias = db_file.stem
+        with self._lock:
+            executor = self._databases.get(alias)
+            if executor is not None and executor.db_file.resolve() != db_file.resolve():
+                raise ValueError(f"数据库别名冲突: {alias} ({executor.db_file} / {db_file})")
+            if executor is None or executor._closed:
+                executor = StorageExecutor(db_file, readers=self.readers)
+                self._databases[alias] = executor
+        
+        if migrations:
+            executor.migrate_sync(migrations)
+        return executor
+    
+    def get(self, alias: str) -> Optional[StorageExecutor]:
+        """按别名获取已打开的数据库"""
+        return self._databases.get(alias)
+    
+    def _cross_connection(self) -> sqlite3.Connection:
+        """获取当前线程的跨库查询连接，并附加尚未附加的数据库"""
+        conn = getattr(self._cross_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+            conn.execute('PRAGMA query_only=ON')
+            self._cross_local.conn = conn
+            self._cross_local.attached = set()
+            with self._lock:
+                self._cross_connections.append(conn)
+        
+        attached = self._cross_local.attached
+        for alias, executor in list(self._databases.items()):
+            if alias not in attached:
+                conn.execute('ATTACH DATABASE ? AS ?', (str(executor.db_file), alias))
+                conn.execute(f'PRAGMA {alias}.cache_size=-{config.DB_CACHE_SIZE_KB}')
+                conn.execute(f'PRAGMA {alias}.mmap_size={config.DB_MMAP_SIZE}')
+                attached.add(alias)
+        return conn
+    
+    def _run_query(self, sql: str, params: Sequence) -> List[Dict[str, Any]]:
+        """在跨库连接上执行只读查询"""
+        conn = self._cross_connection()
+        try:
+            return rows_to_dicts(conn.execute(sql, params))
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+    
+    async def query(self, sql: str, params: Sequence = ()) -> List[Dict[str, Any]]:
+        """跨库只读查询，表名需带数据库别名前缀"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._cross_readers, self._run_query, sql, params)
+    
+    def close(self):
+        """关闭全部数据库"""
+        self._cross_readers.shutdown(wait=True)
+        with self._lock:
+            databases = list(self._databases.values())
+            self._databases.clear()
+            for conn in self._cross_connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"关闭跨库查询连接失败: {e}")
+            self._cross_connections.clear()
+        
+        for executor in databases:
+            executor.close()
+        if databases:
+            logger.info(f"已关闭 {len(databases)} 个数据库")
+        
+        # 允许之后重新打开（如测试或重启流程）
+        self._cross_readers = self._new_cross_pool()
+        self._cross_local = threading.local()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各数据库的执行统计"""
+        return {alias: executor.get_stats() for alias, executor in self._databases.items()}
+
+
+# 全局存储层实例
+storage = Storage(readers=config.DB_READER_THREADS)
@@ -1,62 +1,238 @@
-import aiosqlite
 import asyncio
+import sqlite3
+import time
+from collections import OrderedDict
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 from loguru import logger
 from config import config
 
+from .storage import storage
+
+
+class UserCache:
+    """用户记录缓存（TTL + LRU）
+    
+    以 Telegram ID 为键缓存用户记录（包括不存在的用户），
+    权限检查在常见情况下无需访问数据库。
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, ttl: float = 300, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def get(self, telegram_id: int):
+        """返回缓存的记录（可能为 None），未命中时返回 UserCache._MISSING"""
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.stats['misses'] += 1
+            return self._MISSING
+        
+        user, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[telegram_id]
+            self.stats['misses'] += 1
+            return self._MISSING
+        
+        self._entries.move_to_end(telegram_id)
+        self.stats['hits'] += 1
+        return user
+    
+    def set(self, telegram_id: int, user: Optional[Dict[str, Any]]):
+        """写入缓存"""
+        self._entries[telegram_id] = (user, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+    
+    def update(self, telegram_id: int, **fields):
+        """就地更新已缓存记录的字段（未缓存或用户不存在时忽略）"""
+        entry = self._entries.get(telegram_id)
+        if entry and entry[0] is not None:
+            entry[0].update(fields)
+    
+    def record_activity(self, telegram_id: int, last_active: str, count: int = 1):
+        """同步已缓存记录的活跃时间和使用次数"""
+        entry = self._entries.get(telegram_id)
+        if entry and entry[0] is not None:
+            user = entry[0]
+            user['last_active'] = last_active
+            user['usage_count'] = (user.get('usage_count') or 0) + count
+    
+    def invalidate(self, telegram_id: Optional[int] = None):
+        """使单个用户或全部缓存失效"""
+        if telegram_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(telegram_id, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = self.stats.copy()
+        stats['size'] = len(self._entries)
+        return stats
+
 
 class UserManager:
     """用户权限管理器"""
     
-    def __init__(self, db_path: str = "data/bot.db"):
+    def __init__(
+        self,
+        db_path: str = "data/bot.db",
+        cache_ttl: float = 300,
+        cache_size: int = 10000,
+        activity_flush_interval: float = 5.0
+    ):
         self.db_path = db_path
+        self._db = storage.open(db_path)
+        self._user_cache = UserCache(ttl=cache_ttl, max_size=cache_size)
+        
+        # 活跃度累加器: telegram_id -> [累计次数, 最近活跃时间]
+        self._pending_activity: Dict[int, List[Any]] = {}
+        self._flushing_activity: Dict[int, List[Any]] = {}   # 正在写入数据库的一批
+        self._activity_generation = 0                         # 每成功写入一批加一
+        self._activity_flush_interval = activity_flush_interval
+        self._activity_lock = asyncio.Lock()
+        self._activity_task: Optional[asyncio.Task] = None
     
-    async def init_database(self):
-        """初始化数据库"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # 创建用户表
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY,
-                    telegram_id BIGINT UNIQUE NOT NULL,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    role TEXT DEFAULT 'user',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_active TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    usage_count INTEGER DEFAULT 0
-                )
-            """)
+    async def close(self):
+        """写入累计的活跃度（连接由存储层统一关闭）"""
+        if self._activity_task and not self._activity_task.done():
+            self._activity_task.cancel()
+            try:
+                await self._activity_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush_activity()
+    
+    def _ensure_activity_flusher(self):
+        """启动活跃度定时写入任务"""
+        if self._activity_task is None or self._activity_task.done():
+            self._activity_task = asyncio.create_task(self._activity_flush_loop())
+    
+    async def _activity_flush_loop(self):
+        """定时批量写入活跃度"""
+        while True:
+            await asyncio.sleep(self._activity_flush_interval)
+            try:
+                await self.flush_activity()
+            except Exception as e:
+                logger.error(f"写入用户活跃度失败: {e}")
+    
+    async def flush_activity(self):
+        """将累计的活跃时间和使用次数在一个事务中写入数据库"""
+        async with self._activity_lock:
+            if not self._pending_activity:
+                return
             
-            # 创建操作日志表
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS operation_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id BIGINT NOT NULL,
-                    operation TEXT NOT NULL,
-                    parameters TEXT,
-                    result TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(telegram_id)
-                )
-            """)
+            pending, self._pending_activity = self._pending_activity, {}
+            self._flushing_activity = pending
+            rows = [
+                (last_active, count, telegram_id)
+                for telegram_id, (count, last_active) in pending.items()
+            ]
             
-            await db.commit()
-            logger.info("数据库初始化完成")
+            try:
+                await self._db.executemany("""
+                    UPDATE users 
+                    SET last_active = ?, usage_count = usage_count + ?
+                    WHERE telegram_id = ?
+                """, rows)
+                self._activity_generation += 1
+                logger.debug(f"写入 {len(rows)} 个用户的活跃度")
+            except Exception:
+                # 写入失败时合并回累加器，下次再试
+                for telegram_id, (count, last_active) in pending.items():
+                    entry = self._pending_activity.setdefault(telegram_id, [0, last_active])
+                    entry[0] += count
+                    entry[1] = max(entry[1], last_active)
+                raise
+            finally:
+                self._flushing_activity = {}
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取用户缓存统计"""
+        return self._user_cache.get_stats()
+    
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        """创建用户表和操作日志表"""
+        # 创建用户表
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                telegram_id BIGINT UNIQUE NOT NULL,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                role TEXT DEFAULT 'user',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_active TIMESTAMP,
+                is_active BOOLEAN DEFAULT TRUE,
+                usage_count INTEGER DEFAULT 0
+            )
+        """)
+        
+        # 创建操作日志表
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS operation_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id BIGINT NOT NULL,
+                operation TEXT NOT NULL,
+                parameters TEXT,
+                result TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(telegram_id)
+            )
+        """)
+    
+    async def init_database(self):
+        """初始化数据库（按版本执行迁移）"""
+        await self._db.migrate([(1, self._create_schema)])
+        logger.info("数据库初始化完成")
+    
+    def _copy_pending_activity(self, telegram_id: int) -> Optional[List[Any]]:
+        """合并累加器与正在写入的一批中该用户尚未落库的 [次数, 最近活跃时间]"""
+        entries = [
+            entry for entry in (
+                self._flushing_activity.get(telegram_id),
+                self._pending_activity.get(telegram_id)
+            ) if entry
+        ]
+        if not entries:
+            return None
+        return [sum(entry[0] for entry in entries), max(entry[1] for entry in entries)]
     
     async def get_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """获取用户信息"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
+        cached = self._user_cache.get(telegram_id)
+        if cached is not UserCache._MISSING:
+            return dict(cached) if cached else None
+        
+        while True:
+            # 先复制尚未落库的活跃度（含正在写入的一批），读库时不持有活跃度锁；
+            # 读库期间若有一批写入完成，数据库可能已包含这部分累计值，重新读取一次
+            generation = self._activity_generation
+            pending = self._copy_pending_activity(telegram_id)
+            user = await self._db.fetch_dict(
                 "SELECT * FROM users WHERE telegram_id = ?", 
                 (telegram_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+            )
+            if generation == self._activity_generation:
+                break
+            
+        # 叠加尚未写入的活跃度
+        if user and pending:
+            user['usage_count'] = (user.get('usage_count') or 0) + pending[0]
+            user['last_active'] = pending[1].isoformat(' ')
+        
+        self._user_cache.set(telegram_id, user)
+        return dict(user) if user else None
     
     async def create_user(
         self, 
@@ -70,17 +246,16 @@ class UserManager:
             # 检查是否为管理员
             role = 'admin' if telegram_id in config.ADMIN_USER_IDS else 'user'
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO users 
-                    (telegram_id, username, first_name, last_name, role, created_at, last_active)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    telegram_id, username, first_name, last_name, 
-                    role, datetime.now(), datetime.now()
-                ))
-                await db.commit()
-                
+            await self._db.execute("""
+                INSERT INTO users 
+                (telegram_id, username, first_name, last_name, role, created_at, last_active)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                telegram_id, username, first_name, last_name, 
+                role, datetime.now(), datetime.now()
+            ))
+            
+            self._user_cache.invalidate(telegram_id)
             logger.info(f"用户创建成功: {telegram_id} ({username}) - {role}")
             return True
         except Exception as e:
@@ -88,14 +263,18 @@ class UserManager:
             return False
     
     async def update_user_activity(self, telegram_id: int):
-        """更新用户活跃时间和使用次数"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE users 
-                SET last_active = ?, usage_count = usage_count + 1
-                WHERE telegram_id = ?
-            """, (datetime.now(), telegram_id))
-            await db.commit()
+        """更新用户活跃时间和使用次数（累计后定时批量写入）"""
+        now = datetime.now()
+        entry = self._pending_activity.get(telegram_id)
+        if entry:
+            entry[0] += 1
+            entry[1] = now
+        else:
+            self._pending_activity[telegram_id] = [1, now]
+        
+        # 同步更新缓存，避免每次交互后缓存失效
+        self._user_cache.record_activity(telegram_id, now.isoformat(' '))
+        self._ensure_activity_flusher()
     
     async def is_admin(self, telegram_id: int) -> bool:
         """检查用户是否为管理员"""
@@ -110,52 +289,49 @@ class UserManager:
     async def set_user_status(self, telegram_id: int, is_active: bool) -> bool:
         """设置用户状态"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
-                    "UPDATE users SET is_active = ? WHERE telegram_id = ?",
-                    (is_active, telegram_id)
-                )
-                await db.commit()
-                return True
+            await self._db.execute(
+                "UPDATE users SET is_active = ? WHERE telegram_id = ?",
+                (is_active, telegram_id)
+            )
+            
+            self._user_cache.update(telegram_id, is_active=int(is_active))
+            return True
         except Exception as e:
             logger.error(f"设置用户状态失败: {e}")
             return False
     
     async def get_all_users(self) -> List[Dict[str, Any]]:
         """获取所有用户"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM users ORDER BY created_at DESC"
-            ) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        await self.flush_activity()
+        
+        return await self._db.fetch_dicts(
+            "SELECT * FROM users ORDER BY created_at DESC"
+        )
     
     async def get_user_stats(self) -> Dict[str, Any]:
         """获取用户统计信息"""
-        async with aiosqlite.connect(self.db_path) as db:
+        # 先写入累计的活跃度，保证今日活跃数准确
+        await self.flush_activity()
+        
+        def query(conn):
             # 总用户数
-            async with db.execute("SELECT COUNT(*) FROM users") as cursor:
-                total_users = (await cursor.fetchone())[0]
+            total_users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
             
             # 活跃用户数
-            async with db.execute(
+            active_users = conn.execute(
                 "SELECT COUNT(*) FROM users WHERE is_active = TRUE"
-            ) as cursor:
-                active_users = (await cursor.fetchone())[0]
+            ).fetchone()[0]
             
             # 管理员数
-            async with db.execute(
+            admin_users = conn.execute(
                 "SELECT COUNT(*) FROM users WHERE role = 'admin'"
-            ) as cursor:
-                admin_users = (await cursor.fetchone())[0]
+            ).fetchone()[0]
             
             # 今日活跃用户
-            async with db.execute("""
+            today_active = conn.execute("""
                 SELECT COUNT(*) FROM users 
                 WHERE date(last_active) = date('now')
-            """) as cursor:
-                today_active = (await cursor.fetchone())[0]
+            """).fetchone()[0]
             
             return {
                 'total_users': total_users,
@@ -163,6 +339,8 @@ class UserManager:
                 'admin_users': admin_users,
                 'today_active': today_active
             }
+        
+        return await self._db.read(query)
     
     async def log_operation(
         self, 
@@ -173,13 +351,11 @@ class UserManager:
     ):
         """记录用户操作日志"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT INTO operation_logs 
-                    (user_id, operation, parameters, result, timestamp)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (user_id, operation, parameters, result, datetime.now()))
-                await db.commit()
+            await self._db.execute("""
+                INSERT INTO operation_logs 
+                (user_id, operation, parameters, result, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, (user_id, operation, parameters, result, datetime.now()))
         except Exception as e:
             logger.error(f"记录操作日志失败: {e}")
     
@@ -189,32 +365,55 @@ class UserManager:
         limit: int = 100
     ) -> List[Dict[str, Any]]:
         """获取用户操作日志"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
-            if user_id:
-                query = """
-                    SELECT ol.*, u.username, u.first_name 
-                    FROM operation_logs ol
-                    JOIN users u ON ol.user_id = u.telegram_id
-                    WHERE ol.user_id = ?
-                    ORDER BY ol.timestamp DESC
-                    LIMIT ?
-                """
-                params = (user_id, limit)
-            else:
-                query = """
-                    SELECT ol.*, u.username, u.first_name 
-                    FROM operation_logs ol
-                    JOIN users u ON ol.user_id = u.telegram_id
-                    ORDER BY ol.timestamp DESC
-                    LIMIT ?
-                """
-                params = (limit,)
+        if user_id:
+            query = """
+                SELECT ol.*, u.username, u.first_name 
+                FROM operation_logs ol
+                JOIN users u ON ol.user_id = u.telegram_id
+                WHERE ol.user_id = ?
+                ORDER BY ol.timestamp DESC
+                LIMIT ?
+            """
+            params = (user_id, limit)
+        else:
+            query = """
+                SELECT ol.*, u.username, u.first_name 
+                FROM operation_logs ol
+                JOIN users u ON ol.user_id = u.telegram_id
+                ORDER BY ol.timestamp DESC
+                LIMIT ?
+            """
+            params = (limit,)
             
-            async with db.execute(query, params) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        return await self._db.fetch_dicts(query, params)
+    
+    async def get_activity_overview(self, days: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+        """按用户汇总操作次数与内容审核结果（跨 bot / content_filter 两个库查询）"""
+        since = datetime.now() - timedelta(days=days)
+        return await storage.query("""
+            SELECT
+                u.telegram_id, u.username, u.first_name,
+                COALESCE(ol.operations, 0) AS operations,
+                COALESCE(ar.audited, 0) AS audited,
+                COALESCE(ar.blocked, 0) AS blocked
+            FROM bot.users u
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS operations
+                FROM bot.operation_logs
+                WHERE timestamp >= ?
+                GROUP BY user_id
+            ) ol ON ol.user_id = u.telegram_id
+            LEFT JOIN (
+                SELECT user_id, COUNT(*) AS audited,
+                       SUM(CASE WHEN action = 'block' THEN 1 ELSE 0 END) AS blocked
+                FROM content_filter.audit_records
+                WHERE created_at >= ?
+                GROUP BY user_id
+            ) ar ON ar.user_id = u.telegram_id
+            WHERE ol.operations IS NOT NULL OR ar.audited IS NOT NULL
+            ORDER BY operations DESC
+            LIMIT ?
+        """, (since, since, limit))
     
     async def register_or_update_user(self, user) -> Dict[str, Any]:
         """注册或更新用户信息"""
@@ -229,14 +428,13 @@ class UserManager:
         if existing_user:
             # 更新用户信息
             try:
-                async with aiosqlite.connect(self.db_path) as db:
-                    await db.execute("""
-                        UPDATE users 
-                        SET username = ?, first_name = ?, last_name = ?, last_active = ?
-                        WHERE telegram_id = ?
-                    """, (username, first_name, last_name, datetime.now(), telegram_id))
-                    await db.commit()
+                await self._db.execute("""
+                    UPDATE users 
+                    SET username = ?, first_name = ?, last_name = ?, last_active = ?
+                    WHERE telegram_id = ?
+                """, (username, first_name, last_name, datetime.now(), telegram_id))
                 
+                self._user_cache.invalidate(telegram_id)
                 await self.update_user_activity(telegram_id)
                 
                 return {
@@ -71,6 +71,343 @@ async def test_handlers():
         print(f"❌ 处理器测试失败: {e}")
         return False
 
+async def test_queue_retry():
+    """测试多发送任务时失败消息的延迟重试"""
+    print("🔁 测试队列重试...")
+    import tempfile
+    from managers.queue_manager import DanmakuQueue, DanmakuStatus
+    
+    class FlakyClient:
+        """首次发送失败、之后成功的模拟客户端，每次发送耗时 0.5 秒"""
+        def __init__(self):
+            self.attempts = 0
+        
+        async def __aenter__(self):
+            return self
+        
+        async def __aexit__(self, *args):
+            pass
+        
+        async def send_danmaku(self, **kwargs):
+            self.attempts += 1
+            await asyncio.sleep(0.5)
+            if self.attempts == 1:
+                return {'success': False, 'message': '模拟发送失败'}
+            return {'success': True, 'message': '弹幕发送成功'}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = DanmakuQueue(queue_file=f"{tmp_dir}/queue.json")
+        client = FlakyClient()
+        try:
+            await queue.start_processing(client, interval=0.01, workers=2)
+            message_id = await queue.add_message("重试测试", user_id=1, skip_filter=True)
+            
+            # 首次失败后延迟 5 秒重试，应在约 5.5 秒时发送成功
+            message = queue._scheduler.get(message_id)
+            for _ in range(80):
+                if message.status == DanmakuStatus.SUCCESS:
+                    break
+                await asyncio.sleep(0.1)
+            
+            assert message.status == DanmakuStatus.SUCCESS, f"重试未执行，状态: {message.status.value}"
+            assert client.attempts == 2
+            print("✅ 队列重试测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 队列重试测试失败: {e}")
+            return False
+        finally:
+            await queue.stop_processing()
+            queue.close()
+
+async def test_queue_journal():
+    """测试队列日志重放（含崩溃时写了一半的最后一行）"""
+    print("📒 测试队列日志...")
+    import tempfile
+    from managers.queue_manager import DanmakuQueue
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue_file = f"{tmp_dir}/queue.json"
+        try:
+            queue = DanmakuQueue(queue_file=queue_file, fsync_policy="always")
+            first_id = await queue.add_message("第一条", user_id=1, skip_filter=True)
+            queue._journal_io.shutdown(wait=True)  # 模拟崩溃：不合并快照
+            
+            # 崩溃时只写了一半的记录
+            with open(f"{tmp_dir}/queue.journal", 'a', encoding='utf-8') as f:
+                f.write('{"op":"put","message":{"id":"dm_torn"')
+            
+            queue = DanmakuQueue(queue_file=queue_file, fsync_policy="always")
+            assert [msg.id for msg in queue.queue] == [first_id]
+            second_id = await queue.add_message("第二条", user_id=1, skip_filter=True)
+            queue._journal_io.shutdown(wait=True)
+            
+            # 残行被清掉后，新记录不会与其粘连
+            queue = DanmakuQueue(queue_file=queue_file, fsync_policy="always")
+            assert [msg.id for msg in queue.queue] == [first_id, second_id]
+            queue.close()
+            print("✅ 队列日志测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 队列日志测试失败: {e}")
+            return False
+
+async def test_keyword_matcher():
+    """测试 Aho-Corasick 匹配结果与逐个关键词查找一致"""
+    print("🔎 测试关键词匹配...")
+    import random
+    from managers.content_filter import AhoCorasickMatcher
+    
+    try:
+        rng = random.Random(1)
+        alphabet = "abAB傻逼群"
+        # 含互为前缀/后缀、重叠的模式
+        patterns = {"he", "she", "his", "hers", "傻逼", "逼群", "加群"}
+        patterns.update("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(40))
+        
+        matcher = AhoCorasickMatcher()
+        for pattern in patterns:
+            matcher.add(pattern, pattern)
+        
+        texts = ["ushers", "他是傻逼群主", "HeRs"]
+        texts += ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))) for _ in range(300)]
+        for text in texts:
+            expected = {pattern for pattern in patterns if pattern.lower() in text.lower()}
+            found = matcher.search(text)
+            assert len(found) == len(set(found)), f"重复返回: {text}"
+            assert set(found) == expected, f"匹配不一致: {text}"
+        
+        print("✅ 关键词匹配测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 关键词匹配测试失败: {e}")
+        return False
+
+def _make_test_filter(tmp_dir: str, name: str):
+    """在临时目录中创建独立的内容过滤器（数据库别名取文件名，需各不相同）"""
+    from managers.content_filter import DanmakuContentFilter
+    return DanmakuContentFilter(db_file=f"{tmp_dir}/{name}.db")
+
+async def _close_test_filter(content_filter):
+    """关闭测试用过滤器及其数据库"""
+    await content_filter.close()
+    content_filter._db.close()
+
+async def test_rule_plan():
+    """测试规则计划（合并正则、长度阈值二分）与逐条规则检查一致"""
+    print("📐 测试规则计划...")
+    import random
+    import re
+    import tempfile
+    from managers.content_filter import FilterRule, FilterType, FilterAction, RiskLevel
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        content_filter = _make_test_filter(tmp_dir, "filter_plan")
+        try:
+            extra_rules = [
+                ('regex_ab', FilterType.REGEX, r'ab'),
+                ('regex_bc', FilterType.REGEX, r'b+c'),          # 与 regex_ab 重叠
+                ('regex_group', FilterType.REGEX, r'(a)(b)?x'),  # 自带分组
+                ('regex_backref', FilterType.REGEX, r'(c)\1'),   # 反向引用，单独匹配
+                ('length_5', FilterType.LENGTH, '5'),
+                ('length_10', FilterType.LENGTH, '10'),
+                ('keyword_ax', FilterType.KEYWORD, 'ax, 群主'),
+            ]
+            for rule_id, filter_type, pattern in extra_rules:
+                assert await content_filter.add_rule(FilterRule(
+                    id=rule_id, name=rule_id, filter_type=filter_type, pattern=pattern,
+                    action=FilterAction.WARNING, risk_level=RiskLevel.LOW
+                ))
+            
+            def linear_match(text):
+                """逐条规则检查（规则计划之前的做法）"""
+                matched = set()
+                for rule in content_filter.rules:
+                    if rule.filter_type == FilterType.KEYWORD:
+                        keywords = [kw.strip().lower() for kw in rule.pattern.split(',') if kw.strip()]
+                        hit = any(kw in text.lower() for kw in keywords)
+                    elif rule.filter_type == FilterType.REGEX:
+                        hit = re.search(rule.pattern, text, re.IGNORECASE) is not None
+                    elif rule.filter_type == FilterType.LENGTH:
+                        hit = len(text) > int(rule.pattern)
+                    else:
+                        continue
+                    if hit:
+                        matched.add(rule.id)
+                return matched
+            
+            plan = content_filter._get_rule_plan()
+            assert plan.separate_regex_rules and plan.combined_regex is not None
+            
+            rng = random.Random(2)
+            texts = ["abc", "ccx", "加群主", "傻逼", "a" * 6, "a" * 11, "ABCC"]
+            texts += ["".join(rng.choice("abcx群主加 ") for _ in range(rng.randint(0, 14))) for _ in range(500)]
+            for text in texts:
+                matched_ids, _ = content_filter._match_stateless_rules(text, plan)
+                assert matched_ids == linear_match(text), f"命中规则不一致: {text!r}"
+            
+            print("✅ 规则计划测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 规则计划测试失败: {e}")
+            return False
+        finally:
+            await _close_test_filter(content_filter)
+
+async def test_audit_sink():
+    """测试审核记录分批写入与缓冲区满时的背压"""
+    print("🧾 测试审核记录写入...")
+    import tempfile
+    from managers.content_filter import AuditSink, FilterResult
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        content_filter = _make_test_filter(tmp_dir, "filter_audit")
+        try:
+            sink = AuditSink(content_filter._db, batch_size=10, flush_interval=60, max_pending=20)
+            batch_sizes = []
+            
+            def insert_rows(conn, rows):
+                batch_sizes.append(len(rows))
+                AuditSink._insert_rows(conn, rows)
+            sink._insert_rows = insert_rows
+            
+            # 提交循环本身不让出事件循环，缓冲区满 20 条时只能靠背压等待写入
+            for i in range(25):
+                await sink.submit(1, FilterResult(original_text=f"审核{i}", filtered_text=f"审核{i}"))
+            assert sink.stats['backpressure_waits'] >= 1
+            assert len(sink._buffer) < 20
+            
+            await sink.close()
+            await sink.submit(1, FilterResult(original_text="关闭后", filtered_text="关闭后"))
+            
+            count = (await content_filter._db.fetchone('SELECT COUNT(*) FROM audit_records'))[0]
+            assert count == 26, f"写入 {count} 条"
+            assert sum(batch_sizes) == 26 and max(batch_sizes) <= 10 and len(batch_sizes) <= 4
+            assert sink.stats['written'] == 25 and sink.stats['failed'] == 0
+            
+            print("✅ 审核记录写入测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 审核记录写入测试失败: {e}")
+            return False
+        finally:
+            await _close_test_filter(content_filter)
+
+async def test_rate_limiter():
+    """测试滑动窗口限流的窗口过期、键数上限和空闲清理"""
+    print("⏱️  测试频率限制...")
+    from managers.content_filter import SlidingWindowRateLimiter
+    
+    try:
+        limiter = SlidingWindowRateLimiter(max_keys=3)
+        
+        # 窗口内最多 2 次，超限的请求不计入窗口
+        assert not limiter.is_limited('user', 2, 0.2)
+        assert not limiter.is_limited('user', 2, 0.2)
+        assert limiter.is_limited('user', 2, 0.2)
+        assert limiter.acquire('user', 2, 0.2, count=3) == 0
+        
+        # 最早的记录滑出窗口后恢复放行
+        await asyncio.sleep(0.25)
+        assert limiter.acquire('user', 2, 0.2, count=3) == 2
+        
+        # 键数达到上限时淘汰最久未访问的键
+        for key in ('a', 'b', 'c'):
+            limiter.is_limited(key, 2, 0.2)
+        stats = limiter.get_stats()
+        assert stats['tracked_keys'] == 3 and stats['capacity_evictions'] == 1
+        assert 'user' not in limiter._entries
+        
+        # 超过窗口未活动的键被清理（新加入 d 时 a 已按容量淘汰）
+        await asyncio.sleep(0.25)
+        limiter.is_limited('d', 2, 60)
+        assert limiter.sweep() == 2
+        assert list(limiter._entries) == ['d']
+        
+        print("✅ 频率限制测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 频率限制测试失败: {e}")
+        return False
+
+async def test_verdict_cache():
+    """测试过滤结论缓存在规则变化后失效"""
+    print("🗃️  测试过滤结论缓存...")
+    import tempfile
+    from managers.content_filter import FilterRule, FilterType, FilterAction, RiskLevel
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        content_filter = _make_test_filter(tmp_dir, "filter_verdict")
+        try:
+            # 每次用不同用户，避免触发默认的刷屏规则
+            result = await content_filter.filter_content("缓存测试 XYZ", user_id=1)
+            assert not result.is_blocked
+            result = await content_filter.filter_content("缓存测试 xyz", user_id=2)
+            assert not result.is_blocked
+            assert content_filter._verdict_cache.stats['hits'] == 1   # 大小写规范化后命中
+            
+            # 新增规则后旧结论不再使用
+            assert await content_filter.add_rule(FilterRule(
+                id='block_xyz', name='屏蔽xyz', filter_type=FilterType.KEYWORD, pattern='xyz',
+                action=FilterAction.BLOCK, risk_level=RiskLevel.HIGH
+            ))
+            result = await content_filter.filter_content("缓存测试 XYZ", user_id=3)
+            assert result.is_blocked and 'block_xyz' in result.matched_rules
+            
+            assert await content_filter.add_sensitive_word("缓存")
+            result = await content_filter.filter_content("缓存测试 XYZ", user_id=4)
+            assert "包含敏感词: 缓存" in result.warnings
+            
+            assert await content_filter.remove_rule('block_xyz')
+            result = await content_filter.filter_content("缓存测试 XYZ", user_id=5)
+            assert not result.is_blocked and "包含敏感词: 缓存" in result.warnings
+            
+            print("✅ 过滤结论缓存测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 过滤结论缓存测试失败: {e}")
+            return False
+        finally:
+            await _close_test_filter(content_filter)
+
+async def test_filter_many():
+    """测试批量过滤与逐条过滤结果一致（含频率限制）"""
+    print("📦 测试批量过滤...")
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        content_filter = _make_test_filter(tmp_dir, "filter_many")
+        try:
+            # 默认规则：长度、广告正则、脏话替换，以及 60 秒 5 条的刷屏警告
+            texts = ["你好", "加群领福利", "你是智障吗", "x" * 201, "你好", "666", "777", "再来一条"]
+            
+            batch = await content_filter.filter_many(texts, user_id=1)
+            single = [await content_filter.filter_content(text, user_id=2) for text in texts]
+            
+            def summary(result):
+                return (
+                    result.is_blocked, result.action, result.risk_level,
+                    result.matched_rules, result.filtered_text, result.warnings
+                )
+            assert [summary(r) for r in batch] == [summary(r) for r in single]
+            assert 'spam_prevention' in batch[-1].matched_rules
+            assert batch[2].filtered_text == "你是***吗"
+            
+            # 整批的审核记录已在一个事务中写入
+            count = (await content_filter._db.fetchone(
+                'SELECT COUNT(*) FROM audit_records WHERE user_id = ?', (1,)
+            ))[0]
+            assert count == len(texts), f"写入 {count} 条审核记录"
+            assert await content_filter.filter_many([], user_id=1) == []
+            
+            print("✅ 批量过滤测试通过")
+            return True
+        except Exception as e:
+            print(f"❌ 批量过滤测试失败: {e}")
+            return False
+        finally:
+            await _close_test_filter(content_filter)
+
 async def main():
     """主测试函数"""
     print("🧪 开始项目测试")
@@ -80,7 +417,15 @@ async def main():
         test_config,
         test_database,
         test_api_clients,
-        test_handlers
+        test_handlers,
+        test_queue_retry,
+        test_queue_journal,
+        test_keyword_matcher,
+        test_rule_plan,
+        test_audit_sink,
+        test_rate_limiter,
+        test_verdict_cache,
+        test_filter_many
     ]
     
     results = []